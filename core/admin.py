@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Venta, Cisterna, Delivery, Promocion, TasaCambio, PagoVenta, Producto, ItemVenta, MetodoDePago
+from .models import User, Venta, Cisterna, Delivery, Promocion, TasaCambio, PagoVenta, Producto, ItemVenta, MetodoDePago, ResumenDiario, NivelAgua, ExportacionVentas, ImportacionVentas, ArchivoVentas, RedencionPromocion
 
 # ----------------- Inline classes for a cleaner admin interface -----------------
 
@@ -53,6 +53,10 @@ class VentaAdmin(admin.ModelAdmin):
 class CisternaAdmin(admin.ModelAdmin):
     list_display = ('fecha', 'hora', 'volumen', 'litros_disponibles', 'usuario')
 
+@admin.register(NivelAgua)
+class NivelAguaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'litros')
+
 @admin.register(Delivery)
 class DeliveryAdmin(admin.ModelAdmin):
     list_display = ('direccion', 'litros_entregados', 'fecha', 'hora', 'encargado')
@@ -78,4 +82,37 @@ class ProductoAdmin(admin.ModelAdmin):
 
 @admin.register(MetodoDePago)
 class MetodoDePagoAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'es_bolivares')
\ No newline at end of file
+    list_display = ('nombre', 'es_bolivares')
+
+@admin.register(ResumenDiario)
+class ResumenDiarioAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'cantidad_ventas', 'total_divisa', 'total_bs', 'litros_vendidos')
+    list_filter = ('fecha',)
+    readonly_fields = ('fecha', 'cantidad_ventas', 'total_divisa', 'total_bs', 'litros_vendidos')
+
+@admin.register(ExportacionVentas)
+class ExportacionVentasAdmin(admin.ModelAdmin):
+    list_display = ('id', 'usuario', 'formato', 'fecha_inicio', 'fecha_fin', 'estado', 'meses_procesados', 'meses_totales', 'fecha_creacion')
+    list_filter = ('estado', 'formato')
+    readonly_fields = ('meses_totales', 'meses_procesados', 'archivo', 'error', 'fecha_fin_proceso')
+
+
+@admin.register(ImportacionVentas)
+class ImportacionVentasAdmin(admin.ModelAdmin):
+    list_display = ('id', 'archivo', 'filas_procesadas', 'ventas_creadas', 'fecha_desde', 'fecha_hasta', 'completada', 'ultima_actualizacion')
+    list_filter = ('completada',)
+    readonly_fields = ('tamano', 'filas_procesadas', 'ventas_creadas', 'fecha_desde', 'fecha_hasta', 'completada')
+
+
+@admin.register(ArchivoVentas)
+class ArchivoVentasAdmin(admin.ModelAdmin):
+    list_display = ('mes', 'cantidad_ventas', 'cantidad_items', 'cantidad_pagos', 'total_divisa', 'archivo', 'fecha_creacion')
+    readonly_fields = ('mes', 'archivo', 'cantidad_ventas', 'cantidad_items', 'cantidad_pagos', 'total_divisa')
+
+
+@admin.register(RedencionPromocion)
+class RedencionPromocionAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'promocion', 'tipo', 'botellas', 'litros', 'usuario')
+    list_filter = ('tipo', 'fecha')
+    list_select_related = ('promocion', 'usuario')
+    date_hierarchy = 'fecha'
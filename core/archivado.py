@@ -0,0 +1,203 @@
+"""
+Archivo de ventas antiguas: cada mes se guarda en un .jsonl.gz en ARCHIVO_VENTAS_DIR
+(una venta por línea, con sus ítems y pagos) y se borra de las tablas de ventas.
+
+Los resúmenes diarios del mes no se tocan, así que el control manual y las
+exportaciones de totales siguen viendo los meses archivados; además se guardan
+totales por producto y por método de pago del mes. restaurar_mes devuelve las
+ventas a las tablas con sus ids originales.
+"""
+import gzip
+import json
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    ArchivoVentas, ItemVenta, PagoVenta, ResumenMensualMetodo, ResumenMensualProducto, Venta
+)
+from .resumenes import reconstruir_resumenes
+from .utils import inicio_del_dia, primer_dia_mes_siguiente
+
+# Ventas leídas o insertadas por viaje a la base
+TAMANO_LOTE = 2000
+CAMPOS_VENTA = ['id', 'usuario_id', 'fecha', 'total_venta_divisa', 'total_venta_bs', 'tasa_cambio_usada', 'tipo_venta']
+CAMPOS_ITEM = ['id', 'venta_id', 'producto_id', 'cantidad', 'subtotal_divisa', 'subtotal_bs']
+CAMPOS_PAGO = ['id', 'venta_id', 'metodo_pago_id', 'monto_recibido']
+
+
+class ErrorArchivo(ValueError):
+    pass
+
+
+def ruta_archivo(mes):
+    return Path(settings.ARCHIVO_VENTAS_DIR) / f"ventas_{mes:%Y-%m}.jsonl.gz"
+
+
+def _ventas_del_mes(mes):
+    return Venta.objects.filter(
+        fecha__gte=inicio_del_dia(mes), fecha__lt=inicio_del_dia(primer_dia_mes_siguiente(mes))
+    )
+
+
+def meses_por_archivar(meses=None):
+    """
+    Meses sin archivar cuyas ventas son anteriores al horizonte: los `meses` meses
+    completos más recientes y el mes en curso se quedan en las tablas.
+    """
+    meses = settings.ARCHIVO_VENTAS_MESES if meses is None else meses
+    actual = timezone.localdate().replace(day=1)
+    indice = actual.year * 12 + actual.month - 1 - meses
+    limite = actual.replace(year=indice // 12, month=indice % 12 + 1)
+
+    primera = Venta.objects.filter(fecha__lt=inicio_del_dia(limite)).order_by('fecha').values_list('fecha', flat=True).first()
+    if primera is None:
+        return []
+    archivados = set(ArchivoVentas.objects.values_list('mes', flat=True))
+    pendientes = []
+    mes = timezone.localdate(primera).replace(day=1)
+    while mes < limite:
+        if mes not in archivados and _ventas_del_mes(mes).exists():
+            pendientes.append(mes)
+        mes = primer_dia_mes_siguiente(mes)
+    return pendientes
+
+
+def _lotes(ventas):
+    """Ventas por lotes de ids crecientes, cada una con sus listas de ítems y pagos."""
+    ultimo_id = 0
+    while True:
+        lote = list(ventas.filter(pk__gt=ultimo_id).order_by('pk').values(*CAMPOS_VENTA)[:TAMANO_LOTE])
+        if not lote:
+            return
+        ids = [venta['id'] for venta in lote]
+        items, pagos = defaultdict(list), defaultdict(list)
+        for item in ItemVenta.objects.filter(venta_id__in=ids).order_by('pk').values(*CAMPOS_ITEM):
+            items[item.pop('venta_id')].append(item)
+        for pago in PagoVenta.objects.filter(venta_id__in=ids).order_by('pk').values(*CAMPOS_PAGO):
+            pagos[pago.pop('venta_id')].append(pago)
+        for venta in lote:
+            venta['items'] = items[venta['id']]
+            venta['pagos'] = pagos[venta['id']]
+        yield lote
+        ultimo_id = ids[-1]
+
+
+@transaction.atomic
+def archivar_mes(mes):
+    """
+    Escribe las ventas del mes local `mes` en su archivo, guarda los resúmenes
+    mensuales y borra las ventas. Todo ocurre en una transacción: si algo falla,
+    las ventas siguen en las tablas y el archivo se descarta.
+    """
+    mes = mes.replace(day=1)
+    if mes >= timezone.localdate().replace(day=1):
+        raise ErrorArchivo("Solo se pueden archivar meses ya cerrados.")
+    if ArchivoVentas.objects.filter(mes=mes).exists():
+        raise ErrorArchivo(f"El mes {mes:%Y-%m} ya está archivado.")
+
+    ruta = ruta_archivo(mes)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    archivo = ArchivoVentas(mes=mes, archivo=ruta.name)
+    por_producto = defaultdict(lambda: [Decimal('0'), Decimal('0'), Decimal('0')])
+    por_metodo = defaultdict(lambda: [0, Decimal('0')])
+
+    try:
+        with gzip.open(ruta, 'wt', encoding='utf-8') as salida:
+            for lote in _lotes(_ventas_del_mes(mes)):
+                for venta in lote:
+                    # default=str conserva las fechas con microsegundos y zona, y los Decimal exactos
+                    salida.write(json.dumps(venta, default=str, separators=(',', ':')) + '\n')
+                    archivo.cantidad_ventas += 1
+                    archivo.total_divisa += venta['total_venta_divisa']
+                    for item in venta['items']:
+                        totales = por_producto[item['producto_id']]
+                        totales[0] += item['cantidad']
+                        totales[1] += item['subtotal_divisa']
+                        totales[2] += item['subtotal_bs']
+                        archivo.cantidad_items += 1
+                    for pago in venta['pagos']:
+                        por_metodo[pago['metodo_pago_id']][0] += 1
+                        por_metodo[pago['metodo_pago_id']][1] += pago['monto_recibido']
+                        archivo.cantidad_pagos += 1
+
+                # Se borra exactamente lo escrito, aunque entren ventas del mes mientras tanto
+                ids = [venta['id'] for venta in lote]
+                ItemVenta.objects.filter(venta_id__in=ids).delete()
+                PagoVenta.objects.filter(venta_id__in=ids).delete()
+                Venta.objects.filter(pk__in=ids).delete()
+
+        if not archivo.cantidad_ventas:
+            raise ErrorArchivo(f"El mes {mes:%Y-%m} no tiene ventas para archivar.")
+        archivo.save()
+        ResumenMensualProducto.objects.bulk_create([
+            ResumenMensualProducto(mes=mes, producto_id=producto_id, cantidad=cantidad, total_divisa=divisa, total_bs=bs)
+            for producto_id, (cantidad, divisa, bs) in por_producto.items()
+        ])
+        ResumenMensualMetodo.objects.bulk_create([
+            ResumenMensualMetodo(mes=mes, metodo_pago_id=metodo_pago_id, cantidad_pagos=cantidad, total=total)
+            for metodo_pago_id, (cantidad, total) in por_metodo.items()
+        ])
+    except BaseException:
+        ruta.unlink(missing_ok=True)
+        raise
+    return archivo
+
+
+def _leer_archivo(ruta):
+    with gzip.open(ruta, 'rt', encoding='utf-8') as entrada:
+        for linea in entrada:
+            yield json.loads(linea)
+
+
+def _insertar(ventas, items, pagos):
+    Venta.objects.bulk_create(ventas)
+    ItemVenta.objects.bulk_create(items, batch_size=TAMANO_LOTE)
+    PagoVenta.objects.bulk_create(pagos, batch_size=TAMANO_LOTE)
+
+
+@transaction.atomic
+def restaurar_mes(mes):
+    """
+    Devuelve a las tablas las ventas archivadas de `mes` con sus ids originales,
+    recalcula los resúmenes diarios del mes (si se archivó antes de existir
+    ResumenDiarioProducto, no tiene los de producto) y borra el archivo (al
+    confirmar la transacción) y los resúmenes mensuales. Devuelve la cantidad de
+    ventas restauradas.
+    """
+    mes = mes.replace(day=1)
+    archivo = ArchivoVentas.objects.select_for_update().filter(mes=mes).first()
+    if archivo is None:
+        raise ErrorArchivo(f"El mes {mes:%Y-%m} no está archivado.")
+    ruta = Path(settings.ARCHIVO_VENTAS_DIR) / archivo.archivo
+    if not ruta.is_file():
+        raise ErrorArchivo(f"No se encuentra el archivo {ruta}.")
+
+    cantidad = 0
+    ventas, items, pagos = [], [], []
+    for datos in _leer_archivo(ruta):
+        items += [ItemVenta(venta_id=datos['id'], **item) for item in datos.pop('items')]
+        pagos += [PagoVenta(venta_id=datos['id'], **pago) for pago in datos.pop('pagos')]
+        ventas.append(Venta(**datos))
+        if len(ventas) >= TAMANO_LOTE:
+            _insertar(ventas, items, pagos)
+            cantidad += len(ventas)
+            ventas, items, pagos = [], [], []
+    _insertar(ventas, items, pagos)
+    cantidad += len(ventas)
+
+    if cantidad != archivo.cantidad_ventas:
+        raise ErrorArchivo(
+            f"El archivo {ruta.name} tiene {cantidad} ventas y se archivaron {archivo.cantidad_ventas}."
+        )
+    ResumenMensualProducto.objects.filter(mes=mes).delete()
+    ResumenMensualMetodo.objects.filter(mes=mes).delete()
+    archivo.delete()
+    reconstruir_resumenes(mes, primer_dia_mes_siguiente(mes) - timedelta(days=1))
+    transaction.on_commit(lambda: ruta.unlink(missing_ok=True))
+    return cantidad
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import router
+from django.db.models import DEFERRED
+
+# Red de seguridad por si un cambio no pasa por el ORM (las señales invalidan al guardar)
+DURACION = 900
+
+# El hash de la contraseña no sale de la base: la caché está en archivos del servidor
+CAMPOS_EXCLUIDOS = ('password',)
+
+
+def clave_usuario(user_id):
+    return f'core:usuario:{user_id}'
+
+
+def invalidar_usuario(user_id):
+    cache.delete(clave_usuario(user_id))
+
+
+def _a_cache(usuario):
+    campos = {
+        campo.attname: getattr(usuario, campo.attname)
+        for campo in usuario._meta.concrete_fields if campo.attname not in CAMPOS_EXCLUIDOS
+    }
+    return {'campos': campos, 'hash_sesion': usuario.get_session_auth_hash()}
+
+
+def _desde_cache(datos):
+    """Usuario con la contraseña diferida: guardarlo no la toca y leerla consulta la base."""
+    modelo = get_user_model()
+    nombres = [campo.attname for campo in modelo._meta.concrete_fields]
+    usuario = modelo.from_db(
+        router.db_for_read(modelo), nombres, [datos['campos'].get(nombre, DEFERRED) for nombre in nombres]
+    )
+    usuario._hash_sesion = datos['hash_sesion']
+    return usuario
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend que guarda en caché el usuario de la sesión.
+
+    Así las solicitudes autenticadas no consultan core_user. Se guardan los campos
+    del usuario sin la contraseña, más el hash de sesión que Django compara en cada
+    solicitud; la entrada se borra al guardar o eliminar el usuario desde cualquier
+    instancia (ver core.signals), y un cambio de contraseña cambia ese hash.
+    """
+
+    def get_user(self, user_id):
+        datos = cache.get(clave_usuario(user_id))
+        if datos is None:
+            usuario = super().get_user(user_id)
+            if usuario is None:
+                return None
+            cache.set(clave_usuario(user_id), _a_cache(usuario), DURACION)
+        else:
+            usuario = _desde_cache(datos)
+        return usuario if self.user_can_authenticate(usuario) else None
@@ -0,0 +1,171 @@
+"""
+Búsqueda de clientes por nombre, teléfono o dirección en Promocion y Delivery.
+
+Usa los índices de texto de la migración 0016: en SQLite, tablas FTS5 que los
+triggers mantienen al día (sin distinguir mayúsculas ni acentos); en PostgreSQL,
+el índice GIN sobre tsvector más trigramas, que también encuentran nombres mal
+escritos. Cada palabra coincide por prefijo y el teléfono se compara sin espacios
+ni guiones, así "0414-123" encuentra "04141234567". Otras bases usan icontains.
+
+En SQLite, alterar una columna de core_promocion o core_delivery reconstruye la
+tabla y borra sus triggers; reparar_indices_sqlite (que corre después de cada
+migrate, ver core.signals) los vuelve a crear y llena de nuevo el índice.
+"""
+import re
+
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Delivery, Promocion
+
+# Búsquedas más cortas coincidirían con casi todas las filas
+MINIMO_CARACTERES = 2
+
+
+class _Indice:
+    def __init__(self, tabla, columnas, documento, trigramas, telefono=None):
+        self.tabla = tabla
+        self.columnas = columnas
+        # Debe ser la misma expresión del índice GIN de la migración 0016
+        self.documento = documento
+        self.trigramas = trigramas
+        self.telefono = telefono
+
+
+INDICES = {
+    Promocion: _Indice(
+        'core_promocion', ('nombre',),
+        "coalesce(nombre, '') || ' ' || replace(replace(telefono, '-', ''), ' ', '')",
+        ('nombre',), telefono='telefono',
+    ),
+    Delivery: _Indice(
+        'core_delivery', ('nombre_cliente', 'direccion'),
+        "coalesce(nombre_cliente, '') || ' ' || coalesce(direccion, '')",
+        ('nombre_cliente', 'direccion'),
+    ),
+}
+
+
+def _palabras(busqueda):
+    return re.findall(r'\w+', busqueda.lower())
+
+
+def _telefono(busqueda):
+    """Dígitos de la búsqueda si parece un teléfono, o None."""
+    telefono = re.sub(r'[\s-]', '', busqueda)
+    return telefono if telefono.isdigit() else None
+
+
+def _columnas_fts(indice, fila):
+    """(columna, expresión sobre `fila`) de la tabla FTS5; el teléfono va normalizado."""
+    columnas = [(columna, f'{fila}.{columna}') for columna in indice.columnas]
+    if indice.telefono:
+        columnas.append((indice.telefono, f"replace(replace({fila}.{indice.telefono}, '-', ''), ' ', '')"))
+    return columnas
+
+
+def _triggers_sqlite(indice):
+    fts = f'{indice.tabla}_fts'
+    nombres = ', '.join(columna for columna, _ in _columnas_fts(indice, 'new'))
+
+    def valores(fila):
+        return ', '.join(expresion for _, expresion in _columnas_fts(indice, fila))
+
+    insertar = f"INSERT INTO {fts}(rowid, {nombres}) VALUES (new.id, {valores('new')});"
+    # En una tabla sin contenido se borra repitiendo los valores indexados
+    borrar = f"INSERT INTO {fts}({fts}, rowid, {nombres}) VALUES ('delete', old.id, {valores('old')});"
+    cambio = ' OR '.join(f'old.{columna} IS NOT new.{columna}' for columna, _ in _columnas_fts(indice, 'new'))
+    return {
+        f'{fts}_ai': f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {indice.tabla} BEGIN {insertar} END",
+        f'{fts}_ad': f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {indice.tabla} BEGIN {borrar} END",
+        # Solo si cambian los campos indexados: retirar botellas no toca el índice
+        f'{fts}_au': (
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {nombres} ON {indice.tabla} WHEN {cambio} "
+            f"BEGIN {borrar} {insertar} END"
+        ),
+    }
+
+
+def reparar_indices_sqlite(using='default'):
+    """
+    Vuelve a crear los triggers de cada tabla FTS5 si falta alguno y la llena de
+    nuevo desde la tabla base, porque mientras no había triggers el índice pudo
+    quedar desactualizado. Sin la tabla FTS5 (migración 0016 sin aplicar) no hace
+    nada. Devuelve las tablas reparadas.
+    """
+    conexion = connections[using]
+    if conexion.vendor != 'sqlite':
+        return []
+    with conexion.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existentes = {nombre for nombre, in cursor.fetchall()}
+
+    reparadas = []
+    for indice in INDICES.values():
+        fts = f'{indice.tabla}_fts'
+        triggers = _triggers_sqlite(indice)
+        if fts not in existentes or set(triggers) <= existentes:
+            continue
+        nombres = ', '.join(columna for columna, _ in _columnas_fts(indice, indice.tabla))
+        valores = ', '.join(expresion for _, expresion in _columnas_fts(indice, indice.tabla))
+        with transaction.atomic(using=using), conexion.cursor() as cursor:
+            for nombre, sentencia in triggers.items():
+                cursor.execute(f'DROP TRIGGER IF EXISTS {nombre}')
+                cursor.execute(sentencia)
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('delete-all')")
+            cursor.execute(f'INSERT INTO {fts}(rowid, {nombres}) SELECT id, {valores} FROM {indice.tabla}')
+        reparadas.append(indice.tabla)
+    return reparadas
+
+
+def _sqlite(indice, palabras, telefono):
+    fts = f'{indice.tabla}_fts'
+    # \w no incluye comillas, así que cada palabra va segura entre comillas dobles
+    consulta = ' '.join(f'"{palabra}"*' for palabra in palabras)
+    if telefono and indice.telefono:
+        consulta = f'({consulta}) OR ({indice.telefono} : "{telefono}"*)'
+    return f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [consulta]
+
+
+def _postgresql(indice, palabras, telefono):
+    terminos = [f"'{palabra}':*" for palabra in palabras]
+    consulta = ' & '.join(terminos)
+    if telefono and indice.telefono:
+        consulta = f"({consulta}) | '{telefono}':*"
+    texto = ' '.join(palabras)
+    condiciones = [f"to_tsvector('simple', {indice.documento}) @@ to_tsquery('simple', %s)"]
+    # word_similarity(búsqueda, columna) sobre pg_trgm.word_similarity_threshold
+    condiciones += [f'%s <%% {columna}' for columna in indice.trigramas]
+    sql = f"SELECT id FROM {indice.tabla} WHERE {' OR '.join(condiciones)}"
+    return sql, [consulta] + [texto] * len(indice.trigramas)
+
+
+def _icontains(indice, palabras, telefono):
+    condicion = Q()
+    for palabra in palabras:
+        condicion &= Q(*[Q(**{f'{columna}__icontains': palabra}) for columna in indice.columnas], _connector=Q.OR)
+    if telefono and indice.telefono:
+        condicion |= Q(**{f'{indice.telefono}__startswith': telefono})
+    return condicion
+
+
+def buscar(queryset, busqueda):
+    """
+    Filtra `queryset` (de Promocion o Delivery) por la búsqueda de texto; una búsqueda
+    sin palabras devuelve el queryset sin filtrar. El orden no cambia, así que se
+    puede paginar igual que el listado completo.
+    """
+    palabras = _palabras(busqueda)
+    if not palabras:
+        return queryset
+    indice = INDICES[queryset.model]
+    telefono = _telefono(busqueda)
+
+    if connection.vendor == 'sqlite':
+        sql, parametros = _sqlite(indice, palabras, telefono)
+    elif connection.vendor == 'postgresql':
+        sql, parametros = _postgresql(indice, palabras, telefono)
+    else:
+        return queryset.filter(_icontains(indice, palabras, telefono))
+    return queryset.filter(pk__in=RawSQL(sql, parametros))
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import MetodoDePago, Producto, TasaCambio
+
+CLAVE_TASA = 'core:tasa_actual'
+CLAVE_METODOS = 'core:metodos_pago'
+# Red de seguridad: las señales invalidan al guardar, pero los cambios hechos fuera del
+# ORM (SQL directo, otra aplicación) no las disparan, así que los valores expiran igual.
+DURACION = 300
+
+_SIN_VALOR = object()
+
+
+def obtener_tasa_actual():
+    """Devuelve la TasaCambio más reciente, o None si no hay ninguna registrada."""
+    tasa = cache.get(CLAVE_TASA, _SIN_VALOR)
+    if tasa is _SIN_VALOR:
+        tasa = TasaCambio.objects.order_by('-fecha').first()
+        cache.set(CLAVE_TASA, tasa, DURACION)
+    return tasa
+
+
+def obtener_metodos_pago():
+    """Devuelve el catálogo de métodos de pago ordenado por nombre."""
+    metodos = cache.get(CLAVE_METODOS)
+    if metodos is None:
+        metodos = list(MetodoDePago.objects.order_by('nombre'))
+        cache.set(CLAVE_METODOS, metodos, DURACION)
+    return metodos
+
+
+def invalidar_tasa():
+    cache.delete(CLAVE_TASA)
+
+
+def invalidar_metodos_pago():
+    cache.delete(CLAVE_METODOS)
+
+
+def version_catalogo_productos():
+    """
+    Versión del catálogo de productos: cambia al crear, editar o eliminar un producto.
+
+    Se combina la última fecha de actualización con la cantidad de productos para
+    detectar también las eliminaciones.
+    """
+    datos = Producto.objects.aggregate(total=Count('id'), ultima=Max('ultima_actualizacion'))
+    ultima = datos['ultima'].timestamp() if datos['ultima'] else 0
+    return f"{datos['total']}-{ultima:.6f}"
+
+
+def catalogo_productos():
+    """Lista de productos serializable a JSON para el punto de venta."""
+    return [
+        {**p, 'precio_divisa': str(p['precio_divisa']), 'precio_bolivares': str(p['precio_bolivares'])}
+        for p in Producto.objects.order_by('codigo').values(
+            'id', 'codigo', 'nombre', 'precio_divisa', 'precio_bolivares', 'tipo'
+        )
+    ]
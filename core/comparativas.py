@@ -0,0 +1,174 @@
+"""
+Comparación del rango del control manual con el periodo anterior equivalente y con
+el mismo periodo del año anterior.
+
+Cada dimensión (totales, métodos de pago, productos) se resuelve con una sola
+consulta agrupada sobre los resúmenes diarios: se filtra por la unión de los tres
+periodos y cada periodo es una suma condicional, así que los periodos pueden
+solaparse (rangos de más de un año) sin contar dos veces la misma fila.
+
+Los meses archivados antes de que existiera ResumenDiarioProducto no tienen
+resúmenes diarios por producto: para ellos se usa el total mensual
+(ResumenMensualProducto), que solo se puede sumar a los periodos que cubren el
+mes completo.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Exists, OuterRef, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import ResumenDiario, ResumenDiarioMetodo, ResumenDiarioProducto, ResumenMensualProducto
+from .utils import primer_dia_mes_siguiente
+
+CERO = Decimal('0.00')
+
+ACTUAL = 'actual'
+ANTERIOR = 'anterior'
+ANIO_ANTERIOR = 'anio_anterior'
+PERIODOS = (
+    (ACTUAL, 'Periodo seleccionado'),
+    (ANTERIOR, 'Periodo anterior'),
+    (ANIO_ANTERIOR, 'Mismo periodo del año anterior'),
+)
+
+
+def _restar_anio(fecha):
+    try:
+        return fecha.replace(year=fecha.year - 1)
+    except ValueError:
+        # 29 de febrero
+        return fecha.replace(year=fecha.year - 1, day=28)
+
+
+def _restar_mes(fecha):
+    fin_mes_anterior = fecha.replace(day=1) - timedelta(days=1)
+    return fin_mes_anterior.replace(day=min(fecha.day, fin_mes_anterior.day))
+
+
+def periodos_de_comparacion(start_date, end_date, rango):
+    """
+    Devuelve {periodo: (inicio, fin)} para ACTUAL, ANTERIOR y ANIO_ANTERIOR.
+
+    El periodo anterior del rango mensual es el mismo tramo del mes anterior y el
+    del anual, el mismo tramo del año anterior; los demás rangos se comparan con
+    los días inmediatamente anteriores de igual duración.
+    """
+    if rango == 'mensual':
+        anterior = (_restar_mes(start_date), _restar_mes(end_date))
+    elif rango == 'anual':
+        anterior = (_restar_anio(start_date), _restar_anio(end_date))
+    else:
+        dias = end_date - start_date + timedelta(days=1)
+        anterior = (start_date - dias, start_date - timedelta(days=1))
+    return {
+        ACTUAL: (start_date, end_date),
+        ANTERIOR: anterior,
+        ANIO_ANTERIOR: (_restar_anio(start_date), _restar_anio(end_date)),
+    }
+
+
+def _en(periodo):
+    return Q(fecha__range=periodo)
+
+
+def _union(periodos):
+    union = Q()
+    for periodo in periodos.values():
+        union |= _en(periodo)
+    return union
+
+
+def _sumas(periodos, campos):
+    """Anotaciones {f'{campo}_{periodo}': Sum(campo, filter=periodo)}."""
+    return {
+        f'{campo}_{clave}': Sum(campo, filter=_en(periodo))
+        for campo in campos for clave, periodo in periodos.items()
+    }
+
+
+def variacion(actual, referencia):
+    """Variación porcentual de `actual` respecto de `referencia` (None si no hay referencia)."""
+    if not referencia:
+        return None
+    return float((actual - referencia) * 100 / referencia)
+
+
+def _comparar(fila, campo, periodos):
+    valores = {clave: fila[f'{campo}_{clave}'] or CERO for clave in periodos}
+    valores['variacion_anterior'] = variacion(valores[ACTUAL], valores[ANTERIOR])
+    valores['variacion_anio_anterior'] = variacion(valores[ACTUAL], valores[ANIO_ANTERIOR])
+    return valores
+
+
+def totales_comparados(periodos):
+    """{'divisa'|'bs'|'litros'|'ventas': {periodo: valor, 'variacion_…': %}} en una consulta."""
+    campos = {
+        'divisa': 'total_divisa', 'bs': 'total_bs', 'litros': 'litros_vendidos', 'ventas': 'cantidad_ventas',
+    }
+    fila = ResumenDiario.objects.filter(_union(periodos)).aggregate(**_sumas(periodos, campos.values()))
+    return {nombre: _comparar(fila, campo, periodos) for nombre, campo in campos.items()}
+
+
+def metodos_comparados(periodos):
+    """Total por método de pago en cada periodo, ordenado por el total del periodo actual."""
+    filas = ResumenDiarioMetodo.objects.filter(_union(periodos)).values('metodo_pago__nombre').annotate(
+        **_sumas(periodos, ['total'])
+    ).order_by()
+    comparados = [
+        {'nombre': fila['metodo_pago__nombre'], **_comparar(fila, 'total', periodos)} for fila in filas
+    ]
+    return sorted(comparados, key=lambda fila: (-fila[ACTUAL], fila['nombre']))
+
+
+def _meses_completos(periodo):
+    """
+    Q de los meses (primer día, como ResumenMensualProducto.mes) que caen enteros
+    dentro de `periodo`; si no hay ninguno, el rango queda vacío.
+    """
+    inicio, fin = periodo
+    primero = inicio if inicio.day == 1 else primer_dia_mes_siguiente(inicio)
+    siguiente = primer_dia_mes_siguiente(fin)
+    ultimo = fin.replace(day=1) if fin == siguiente - timedelta(days=1) else _restar_mes(fin.replace(day=1))
+    return Q(mes__range=(primero, ultimo))
+
+
+def _mensuales_sin_detalle(periodos, campos):
+    """
+    Totales de ResumenMensualProducto por producto en cada periodo, con las mismas
+    columnas que _sumas, de los meses sin resúmenes diarios por producto.
+    """
+    union = Q()
+    for periodo in periodos.values():
+        union |= _meses_completos(periodo)
+    con_detalle = ResumenDiarioProducto.objects.annotate(mes=TruncMonth('fecha')).filter(mes=OuterRef('mes'))
+    return ResumenMensualProducto.objects.filter(union).filter(~Exists(con_detalle)).values(
+        'producto__nombre'
+    ).annotate(**{
+        f'{campo}_{clave}': Sum(campo, filter=_meses_completos(periodo))
+        for campo in campos for clave, periodo in periodos.items()
+    }).order_by()
+
+
+def productos_comparados(periodos):
+    """Cantidad y total en divisa por producto en cada periodo, ordenado por el total actual."""
+    campos = ['cantidad', 'total_divisa']
+    diarios = ResumenDiarioProducto.objects.filter(_union(periodos)).values('producto__nombre').annotate(
+        **_sumas(periodos, campos)
+    ).order_by()
+    # Una sola consulta (UNION ALL): cada producto puede traer una fila diaria y otra mensual
+    filas = {}
+    for fila in diarios.union(_mensuales_sin_detalle(periodos, campos), all=True):
+        acumulada = filas.setdefault(fila.pop('producto__nombre'), dict.fromkeys(fila))
+        for columna, valor in fila.items():
+            if valor is not None:
+                acumulada[columna] = (acumulada[columna] or CERO) + valor
+    comparados = [
+        {
+            'nombre': nombre,
+            'cantidad': _comparar(fila, 'cantidad', periodos),
+            'total_divisa': _comparar(fila, 'total_divisa', periodos),
+        }
+        for nombre, fila in filas.items()
+    ]
+    return sorted(comparados, key=lambda fila: (-fila['total_divisa'][ACTUAL], fila['nombre']))
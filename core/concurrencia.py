@@ -0,0 +1,45 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connection
+
+from .instrumentacion import medir_consultas
+
+# Hilos (y por lo tanto conexiones a la base) dedicados a las consultas en paralelo
+HILOS_CONSULTAS = 4
+_pool = ThreadPoolExecutor(max_workers=HILOS_CONSULTAS, thread_name_prefix='wtp-consultas')
+
+
+def _como_solicitud(funcion):
+    # Cada hilo del pool tiene su propia conexión: se abre y se cierra igual que en
+    # una solicitud (respetando CONN_MAX_AGE) para no dejar conexiones obsoletas.
+    # Sus consultas se suman a las de la solicitud que las pidió.
+    def ejecutar():
+        close_old_connections()
+        try:
+            with medir_consultas():
+                return funcion()
+        finally:
+            close_old_connections()
+    return ejecutar
+
+
+def _en_transaccion():
+    return connection.in_atomic_block
+
+
+async def en_paralelo(*funciones):
+    """
+    Ejecuta funciones síncronas independientes (consultas del ORM) al mismo tiempo,
+    cada una en su propio hilo y conexión. Devuelve los resultados en el mismo orden.
+
+    Si la solicitud tiene una transacción abierta, otra conexión no vería lo escrito
+    en ella: en ese caso se ejecutan en orden sobre la conexión actual.
+    """
+    if await sync_to_async(_en_transaccion)():
+        return [await sync_to_async(funcion)() for funcion in funciones]
+    return await asyncio.gather(*(
+        sync_to_async(_como_solicitud(funcion), thread_sensitive=False, executor=_pool)()
+        for funcion in funciones
+    ))
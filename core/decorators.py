@@ -1,14 +1,65 @@
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
 from django.shortcuts import redirect
 
-def role_required(allowed_roles=[]):
+# El dueño (y los superusuarios) pueden entrar a cualquier sección
+ROL_DUENO = 'dueno'
+
+
+def rol_del_usuario(request):
+    """
+    Rol del usuario de la solicitud tomado de User.rol, o None si no inició sesión.
+
+    El rol viene en la misma fila que carga la autenticación, así que no cuesta
+    consultas adicionales; se resuelve una sola vez y se guarda en la solicitud.
+    """
+    if not hasattr(request, '_rol_usuario'):
+        usuario = request.user
+        if not usuario.is_authenticated:
+            rol = None
+        elif usuario.is_superuser:
+            rol = ROL_DUENO
+        else:
+            rol = usuario.rol
+        request._rol_usuario = rol
+    return request._rol_usuario
+
+
+def role_required(*allowed_roles):
+    """
+    Restringe una vista a usuarios con alguno de los roles indicados.
+
+    Sin roles basta con haber iniciado sesión (como login_required). Los roles
+    se pueden pasar sueltos o en una lista: role_required('dueno') o
+    role_required(['trabajador', 'encargada']).
+    """
+    roles = set()
+    for rol in allowed_roles:
+        roles.update([rol] if isinstance(rol, str) else rol)
+
+    def rechazo(request, rol):
+        """Respuesta si el rol no alcanza, o None si la vista puede ejecutarse."""
+        if rol is None:
+            return redirect_to_login(request.get_full_path())
+        if not roles or rol == ROL_DUENO or rol in roles:
+            return None
+        messages.error(request, "No tienes permiso para acceder a esta sección.")
+        return redirect('dashboard')
+
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper_func(request, *args, **kwargs):
+                # Cargar el usuario consulta la base (o la caché): se hace fuera del bucle de eventos
+                respuesta = rechazo(request, await sync_to_async(rol_del_usuario)(request))
+                return respuesta or await view_func(request, *args, **kwargs)
+            return wrapper_func
+
+        @wraps(view_func)
         def wrapper_func(request, *args, **kwargs):
-            if hasattr(request.user, 'groups'):
-                group = None
-                if request.user.groups.exists():
-                    group = request.user.groups.all()[0].name
-                if group in allowed_roles:
-                    return view_func(request, *args, **kwargs)
-            return redirect('dashboard')
+            return rechazo(request, rol_del_usuario(request)) or view_func(request, *args, **kwargs)
         return wrapper_func
     return decorator
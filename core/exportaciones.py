@@ -0,0 +1,252 @@
+import csv
+import os
+import shutil
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+from .models import ExportacionVentas, ItemVenta, ResumenDiario, ResumenDiarioMetodo
+from .utils import rango_de_dias
+
+COLUMNAS_DETALLE = [
+    'ID Venta', 'Fecha', 'Usuario', 'Total $', 'Total Bs',
+    'Tasa Cambio', 'Producto', 'Cantidad', 'Subtotal $'
+]
+COLUMNAS_METODOS = ['Método de Pago', 'Moneda', 'Total']
+COLUMNAS_DIARIAS = ['Fecha', 'Ventas', 'Total $', 'Total Bs', 'Litros Vendidos']
+FORMATO_FECHA_HORA = 'yyyy-mm-dd hh:mm'
+FORMATO_FECHA = 'yyyy-mm-dd'
+FORMATO_MONTO = '#,##0.00'
+# Filas leídas de la base de datos por viaje
+TAMANO_LOTE = 2000
+# Filas CSV agrupadas en cada fragmento enviado al cliente
+FILAS_POR_FRAGMENTO = 500
+
+
+def filas_detalle(start_date, end_date):
+    """
+    Recorre los ítems vendidos entre start_date y end_date (días locales, inclusive)
+    sin cargar el rango completo en memoria.
+
+    Cada fila es una tupla en el orden de COLUMNAS_DETALLE, con la fecha en hora local.
+    """
+    inicio, fin = rango_de_dias(start_date, end_date)
+    filas = ItemVenta.objects.filter(
+        venta__fecha__gte=inicio,
+        venta__fecha__lt=fin
+    ).order_by('venta__fecha', 'venta_id', 'id').values_list(
+        'venta_id', 'venta__fecha', 'venta__usuario__username', 'venta__total_venta_divisa',
+        'venta__total_venta_bs', 'venta__tasa_cambio_usada', 'producto__nombre', 'cantidad',
+        'subtotal_divisa',
+    ).iterator(chunk_size=TAMANO_LOTE)
+
+    zona = timezone.get_current_timezone()
+    for venta_id, fecha, *resto in filas:
+        yield (venta_id, fecha.astimezone(zona), *resto)
+
+
+class _Eco:
+    """Pseudo-archivo que devuelve lo escrito en lugar de guardarlo."""
+
+    def write(self, valor):
+        return valor
+
+
+def csv_en_fragmentos(filas, encabezado=True):
+    """Genera el CSV en fragmentos de texto a partir de `filas`."""
+    escritor = csv.writer(_Eco())
+    fragmento = [escritor.writerow(COLUMNAS_DETALLE)] if encabezado else []
+    for venta_id, fecha, *resto in filas:
+        fragmento.append(escritor.writerow([venta_id, fecha.strftime('%Y-%m-%d %H:%M'), *resto]))
+        if len(fragmento) >= FILAS_POR_FRAGMENTO:
+            yield ''.join(fragmento)
+            fragmento = []
+    if fragmento:
+        yield ''.join(fragmento)
+
+
+def totales_por_metodo(start_date, end_date):
+    """Total recibido por método de pago en el rango, tomado de los resúmenes diarios."""
+    return ResumenDiarioMetodo.objects.filter(
+        fecha__gte=start_date,
+        fecha__lte=end_date
+    ).values_list('metodo_pago__nombre', 'metodo_pago__es_bolivares').annotate(
+        total_monto=Sum('total')
+    ).order_by('metodo_pago__nombre')
+
+
+def totales_diarios(start_date, end_date):
+    """Resumen de cada día del rango con ventas registradas."""
+    return ResumenDiario.objects.filter(
+        fecha__gte=start_date,
+        fecha__lte=end_date
+    ).order_by('fecha').values_list(
+        'fecha', 'cantidad_ventas', 'total_divisa', 'total_bs', 'litros_vendidos'
+    )
+
+
+def _celda(hoja, valor, formato):
+    celda = WriteOnlyCell(hoja, value=valor)
+    celda.number_format = formato
+    return celda
+
+
+def escribir_xlsx(destino, start_date, end_date, filas=None):
+    """
+    Escribe en `destino` (ruta o archivo binario) un libro con las hojas Detalle,
+    Métodos de Pago y Totales Diarios del rango.
+
+    `filas` reemplaza la consulta de detalle (por ejemplo, con las partes ya
+    generadas por una exportación en segundo plano).
+
+    El libro se crea en modo de solo escritura: cada fila pasa directo al archivo,
+    así la memoria usada no depende de la cantidad de ítems.
+    """
+    libro = Workbook(write_only=True)
+
+    # 1. Detalle por ítem
+    hoja = libro.create_sheet('Detalle')
+    hoja.append(COLUMNAS_DETALLE)
+    if filas is None:
+        filas = filas_detalle(start_date, end_date)
+    for venta_id, fecha, usuario, total_divisa, total_bs, tasa, producto, cantidad, subtotal in filas:
+        hoja.append([
+            venta_id,
+            # Excel no maneja zonas horarias: se guarda la hora local
+            _celda(hoja, fecha.replace(tzinfo=None), FORMATO_FECHA_HORA),
+            usuario,
+            _celda(hoja, total_divisa, FORMATO_MONTO),
+            _celda(hoja, total_bs, FORMATO_MONTO),
+            _celda(hoja, tasa, FORMATO_MONTO),
+            producto,
+            _celda(hoja, cantidad, FORMATO_MONTO),
+            _celda(hoja, subtotal, FORMATO_MONTO),
+        ])
+
+    # 2. Totales por método de pago
+    hoja = libro.create_sheet('Métodos de Pago')
+    hoja.append(COLUMNAS_METODOS)
+    for nombre, es_bolivares, total in totales_por_metodo(start_date, end_date):
+        hoja.append([nombre, 'Bs' if es_bolivares else '$', _celda(hoja, total, FORMATO_MONTO)])
+
+    # 3. Totales diarios
+    hoja = libro.create_sheet('Totales Diarios')
+    hoja.append(COLUMNAS_DIARIAS)
+    for fecha, cantidad, total_divisa, total_bs, litros in totales_diarios(start_date, end_date):
+        hoja.append([
+            _celda(hoja, fecha, FORMATO_FECHA),
+            cantidad,
+            _celda(hoja, total_divisa, FORMATO_MONTO),
+            _celda(hoja, total_bs, FORMATO_MONTO),
+            _celda(hoja, litros, FORMATO_MONTO),
+        ])
+
+    libro.save(destino)
+
+
+# =========================================================
+# EXPORTACIONES EN SEGUNDO PLANO
+# =========================================================
+# Cada mes del rango se escribe en su propia parte dentro de EXPORTACIONES_DIR/<id>/.
+# Una parte solo aparece con su nombre final cuando está completa, así un worker
+# reiniciado retoma desde el primer mes que falta.
+
+def meses_del_rango(start_date, end_date):
+    """Lista de pares (primer_dia, ultimo_dia) de cada mes tocado por el rango."""
+    meses = []
+    inicio = start_date
+    while inicio <= end_date:
+        siguiente = (inicio.replace(day=1) + timedelta(days=32)).replace(day=1)
+        meses.append((inicio, min(siguiente - timedelta(days=1), end_date)))
+        inicio = siguiente
+    return meses
+
+
+def carpeta_exportacion(exportacion):
+    return Path(settings.EXPORTACIONES_DIR) / str(exportacion.pk)
+
+
+def _ruta_parte(carpeta, indice):
+    return carpeta / f"parte_{indice:03d}.csv"
+
+
+def _escribir_parte(ruta, filas):
+    # La fecha se guarda en ISO para no perder segundos ni la zona al reensamblar
+    temporal = ruta.with_suffix('.tmp')
+    with open(temporal, 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.writer(archivo)
+        for venta_id, fecha, *resto in filas:
+            escritor.writerow([venta_id, fecha.isoformat(), *resto])
+    os.replace(temporal, ruta)
+
+
+def _leer_partes(rutas):
+    """Devuelve las filas de las partes con los mismos tipos que filas_detalle."""
+    for ruta in rutas:
+        with open(ruta, newline='', encoding='utf-8') as archivo:
+            for venta_id, fecha, usuario, total_divisa, total_bs, tasa, producto, cantidad, subtotal in csv.reader(
+                archivo
+            ):
+                yield (
+                    int(venta_id), datetime.fromisoformat(fecha), usuario, Decimal(total_divisa),
+                    Decimal(total_bs), Decimal(tasa), producto, Decimal(cantidad), Decimal(subtotal),
+                )
+
+
+def procesar_exportacion(exportacion, al_avanzar=None):
+    """
+    Genera el archivo de una exportación mes a mes y lo deja listo para descargar.
+
+    Los meses que ya tienen su parte en disco se saltan. `al_avanzar` se llama
+    después de cada mes con la exportación actualizada.
+    """
+    meses = meses_del_rango(exportacion.fecha_inicio, exportacion.fecha_fin)
+    carpeta = carpeta_exportacion(exportacion)
+    carpeta.mkdir(parents=True, exist_ok=True)
+
+    ExportacionVentas.objects.filter(pk=exportacion.pk).update(
+        estado=ExportacionVentas.PROCESANDO, meses_totales=len(meses), error=''
+    )
+    exportacion.estado = ExportacionVentas.PROCESANDO
+    exportacion.meses_totales = len(meses)
+
+    # 1. Una parte por mes (las ya escritas se conservan)
+    partes = []
+    for indice, (inicio, fin) in enumerate(meses):
+        ruta = _ruta_parte(carpeta, indice)
+        if not ruta.exists():
+            _escribir_parte(ruta, filas_detalle(inicio, fin))
+        partes.append(ruta)
+        exportacion.meses_procesados = indice + 1
+        ExportacionVentas.objects.filter(pk=exportacion.pk).update(meses_procesados=exportacion.meses_procesados)
+        if al_avanzar:
+            al_avanzar(exportacion)
+
+    # 2. Ensamblar el archivo final a partir de las partes
+    nombre = f"reporte_ventas_{exportacion.fecha_inicio}_{exportacion.fecha_fin}.{exportacion.formato}"
+    temporal = carpeta / f"{nombre}.tmp"
+    filas = _leer_partes(partes)
+    if exportacion.formato == 'xlsx':
+        escribir_xlsx(temporal, exportacion.fecha_inicio, exportacion.fecha_fin, filas=filas)
+    else:
+        with open(temporal, 'w', newline='', encoding='utf-8') as archivo:
+            archivo.writelines(csv_en_fragmentos(filas))
+    os.replace(temporal, carpeta / nombre)
+    for ruta in partes:
+        ruta.unlink()
+
+    exportacion.estado = ExportacionVentas.COMPLETADA
+    exportacion.archivo = f"{exportacion.pk}/{nombre}"
+    exportacion.fecha_fin_proceso = timezone.now()
+    exportacion.save(update_fields=['estado', 'archivo', 'fecha_fin_proceso'])
+    return exportacion
+
+
+def borrar_archivos_exportacion(exportacion):
+    shutil.rmtree(carpeta_exportacion(exportacion), ignore_errors=True)
@@ -0,0 +1,289 @@
+"""
+Importación de ventas históricas desde un CSV con las columnas de la exportación.
+
+El archivo se lee fila a fila y las ventas se insertan por lotes, cada lote en su
+propia transacción junto con el avance de la importación: si el proceso se
+interrumpe, la siguiente ejecución continúa en la fila siguiente al último lote
+guardado.
+"""
+import csv
+import os
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .exportaciones import COLUMNAS_DETALLE
+from .models import ImportacionVentas, ItemVenta, MetodoDePago, PagoVenta, Producto, User, Venta
+from .resumenes import CENTAVOS, CERO, acumular_dias
+
+# Columna opcional al final del CSV con el método con que se pagó cada venta
+COLUMNA_METODO = 'Método de Pago'
+# Filas del CSV por transacción (un lote nunca parte una venta)
+FILAS_POR_LOTE = 20000
+# Filas por sentencia INSERT (el motor puede limitarlo más por su máximo de parámetros)
+FILAS_POR_SENTENCIA = 500
+
+
+class ErrorImportacion(ValueError):
+    pass
+
+
+def iniciar_importacion(ruta, reiniciar=False):
+    """
+    Importación registrada para `ruta`, creada si no existe.
+
+    Si el archivo cambió de tamaño desde que empezó, retomarla mezclaría datos de
+    dos archivos distintos: hay que reiniciarla de forma explícita.
+    """
+    ruta = os.path.abspath(ruta)
+    tamano = os.path.getsize(ruta)
+    importacion, creada = ImportacionVentas.objects.get_or_create(archivo=ruta, defaults={'tamano': tamano})
+    if reiniciar and not creada:
+        importacion.tamano = tamano
+        importacion.filas_procesadas = 0
+        importacion.ventas_creadas = 0
+        importacion.fecha_desde = importacion.fecha_hasta = None
+        importacion.completada = False
+        importacion.save()
+    elif importacion.tamano != tamano:
+        raise ErrorImportacion(
+            "El archivo cambió desde que comenzó su importación. Use --reiniciar para importarlo desde el inicio."
+        )
+    return importacion
+
+
+def _leer_encabezado(encabezado):
+    """Valida las columnas del CSV. Devuelve True si trae la columna del método de pago."""
+    if encabezado == COLUMNAS_DETALLE:
+        return False
+    if encabezado == COLUMNAS_DETALLE + [COLUMNA_METODO]:
+        return True
+    raise ErrorImportacion(
+        f"Columnas inesperadas. Se esperaba: {', '.join(COLUMNAS_DETALLE)} [, {COLUMNA_METODO}]."
+    )
+
+
+def _decimal(texto, columna, linea):
+    try:
+        return Decimal(texto)
+    except InvalidOperation:
+        raise ErrorImportacion(f"Línea {linea}: '{texto}' no es un número válido en '{columna}'.") from None
+
+
+class _Resumen:
+    """Totales de un día dentro de un lote, para sumarlos al resumen diario de una vez."""
+
+    def __init__(self):
+        self.ventas = 0
+        self.divisa = CERO
+        self.bs = CERO
+        self.litros = CERO
+        self.por_metodo = defaultdict(Decimal)
+        self.por_producto = defaultdict(lambda: [CERO, CERO, CERO])
+
+
+class _Lote:
+    def __init__(self):
+        # Las ventas son tuplas (usuario_id, fecha, total $, total Bs, tasa); los ítems y
+        # pagos apuntan a su venta por la posición que esta ocupa en el lote.
+        self.ventas = []
+        self.items = []
+        self.pagos = []
+        self.filas = 0
+        self.resumenes = defaultdict(_Resumen)
+
+
+def _insertar(modelo, campos, filas):
+    """
+    INSERT de muchas filas, varias por sentencia como hace bulk_create, pero sin
+    crear una instancia del modelo por fila: eso costaría más que leer el CSV y
+    escribir en la base juntos.
+    """
+    quote = connection.ops.quote_name
+    campos = [modelo._meta.get_field(campo) for campo in campos]
+    por_sentencia = min(connection.ops.bulk_batch_size(campos, filas), FILAS_POR_SENTENCIA)
+    encabezado = 'INSERT INTO {} ({}) VALUES '.format(
+        quote(modelo._meta.db_table), ', '.join(quote(campo.column) for campo in campos)
+    )
+    marcadores = '({})'.format(', '.join(['%s'] * len(campos)))
+
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(filas), por_sentencia):
+            parte = filas[inicio:inicio + por_sentencia]
+            cursor.execute(
+                encabezado + ', '.join([marcadores] * len(parte)),
+                [valor for fila in parte for valor in fila],
+            )
+
+
+def _siguiente_id_sqlite(modelo):
+    tabla = modelo._meta.db_table
+    with connection.cursor() as cursor:
+        # AUTOINCREMENT no reutiliza los id de filas borradas: se respeta sqlite_sequence
+        cursor.execute(
+            f"SELECT MAX(COALESCE((SELECT MAX(id) FROM {connection.ops.quote_name(tabla)}), 0), "
+            f"COALESCE((SELECT seq FROM sqlite_sequence WHERE name = %s), 0))",
+            [tabla],
+        )
+        return cursor.fetchone()[0] + 1
+
+
+CAMPOS_VENTA = ['usuario', 'fecha', 'total_venta_divisa', 'total_venta_bs', 'tasa_cambio_usada']
+
+
+def _guardar_ventas(ventas):
+    """Inserta las ventas del lote y devuelve sus id en el mismo orden."""
+    if connection.vendor == 'sqlite':
+        # La transacción de SQLite toma el bloqueo de escritura al empezar (IMMEDIATE):
+        # nadie más inserta ventas hasta el commit, así los id se pueden asignar aquí.
+        # Si aun así chocaran, el lote se revierte completo y se reintenta al retomar.
+        primero = _siguiente_id_sqlite(Venta)
+        ids = range(primero, primero + len(ventas))
+        _insertar(Venta, ['id', *CAMPOS_VENTA, 'tipo_venta'], [
+            (pk, *venta, 'Normal') for pk, venta in zip(ids, ventas)
+        ])
+        return ids
+
+    # bulk_create obtiene los id con RETURNING en los motores que lo permiten
+    creadas = Venta.objects.bulk_create([
+        Venta(**dict(zip([f'{CAMPOS_VENTA[0]}_id', *CAMPOS_VENTA[1:]], venta))) for venta in ventas
+    ])
+    return [venta.pk for venta in creadas]
+
+
+@transaction.atomic
+def _guardar_lote(importacion, lote):
+    ids = _guardar_ventas(lote.ventas)
+    _insertar(
+        ItemVenta, ['venta', 'producto', 'cantidad', 'subtotal_divisa', 'subtotal_bs'],
+        [(ids[indice], *valores) for indice, *valores in lote.items],
+    )
+    _insertar(
+        PagoVenta, ['venta', 'metodo_pago', 'monto_recibido'],
+        [(ids[indice], *valores) for indice, *valores in lote.pagos],
+    )
+    acumular_dias({
+        dia: (resumen.ventas, resumen.divisa, resumen.bs, resumen.litros, resumen.por_metodo, resumen.por_producto)
+        for dia, resumen in lote.resumenes.items()
+    })
+
+    importacion.filas_procesadas += lote.filas
+    importacion.ventas_creadas += len(lote.ventas)
+    importacion.fecha_desde = min(filter(None, [importacion.fecha_desde, *lote.resumenes]))
+    importacion.fecha_hasta = max(filter(None, [importacion.fecha_hasta, *lote.resumenes]))
+    importacion.save(update_fields=[
+        'filas_procesadas', 'ventas_creadas', 'fecha_desde', 'fecha_hasta', 'ultima_actualizacion'
+    ])
+
+
+def importar_ventas(importacion, usuario_por_defecto=None, metodo_por_defecto=None,
+                    filas_por_lote=FILAS_POR_LOTE, al_avanzar=None):
+    """
+    Importa las filas pendientes de `importacion` y suma las ventas a los
+    resúmenes diarios en la misma transacción de cada lote.
+
+    Las filas consecutivas con el mismo 'ID Venta' forman una venta; su pago es el
+    total de la venta con el método de la columna COLUMNA_METODO o, si el archivo
+    no la trae, con `metodo_por_defecto`. Los usuarios que no existan se
+    reemplazan por `usuario_por_defecto` (si se indicó).
+    """
+    # Catálogos en memoria: ninguna fila consulta la base
+    productos = {nombre: (pk, tipo == 'agua_litros') for pk, nombre, tipo in
+                 Producto.objects.values_list('id', 'nombre', 'tipo')}
+    usuarios = dict(User.objects.values_list('username', 'id'))
+    metodos = {nombre: (pk, es_bolivares) for pk, nombre, es_bolivares in
+               MetodoDePago.objects.values_list('id', 'nombre', 'es_bolivares')}
+    if usuario_por_defecto is not None and usuario_por_defecto not in usuarios:
+        raise ErrorImportacion(f"El usuario '{usuario_por_defecto}' no existe.")
+    if metodo_por_defecto is not None and metodo_por_defecto not in metodos:
+        raise ErrorImportacion(f"El método de pago '{metodo_por_defecto}' no existe.")
+
+    zona = timezone.get_current_timezone()
+    adaptar_fecha = connection.ops.adapt_datetimefield_value
+
+    def fecha_venta(texto, linea):
+        """(valor para la base, día local) de una fecha del CSV."""
+        try:
+            fecha = datetime.fromisoformat(texto)
+        except ValueError:
+            raise ErrorImportacion(f"Línea {linea}: fecha inválida '{texto}'.") from None
+        fecha = fecha.replace(tzinfo=zona) if fecha.tzinfo is None else fecha.astimezone(zona)
+        return adaptar_fecha(fecha), fecha.date()
+
+    with open(importacion.archivo, newline='', encoding='utf-8-sig') as archivo:
+        lector = csv.reader(archivo)
+        con_metodo = _leer_encabezado(next(lector, None))
+        if not con_metodo and metodo_por_defecto is None:
+            raise ErrorImportacion(
+                f"El archivo no tiene la columna '{COLUMNA_METODO}': indique el método de pago por defecto."
+            )
+        columnas = len(COLUMNAS_DETALLE) + con_metodo
+
+        linea = 1 + importacion.filas_procesadas
+        lote = _Lote()
+        venta_actual = None
+        for fila in islice(lector, importacion.filas_procesadas, None):
+            linea += 1
+            if len(fila) != columnas:
+                raise ErrorImportacion(f"Línea {linea}: cantidad de columnas incorrecta.")
+            id_venta, fecha, username, total_divisa, total_bs, tasa, producto, cantidad, subtotal = fila[:9]
+
+            if id_venta != venta_actual:
+                # Una venta nueva: es el único punto donde se puede cerrar el lote
+                if lote.filas >= filas_por_lote:
+                    _guardar_lote(importacion, lote)
+                    if al_avanzar:
+                        al_avanzar(importacion)
+                    lote = _Lote()
+                venta_actual = id_venta
+
+                usuario_id = usuarios.get(username) or usuarios.get(usuario_por_defecto)
+                if usuario_id is None:
+                    raise ErrorImportacion(f"Línea {linea}: el usuario '{username}' no existe.")
+                nombre_metodo = fila[9] if con_metodo and fila[9] else metodo_por_defecto
+                if nombre_metodo not in metodos:
+                    raise ErrorImportacion(f"Línea {linea}: el método de pago '{nombre_metodo}' no existe.")
+                metodo_id, es_bolivares = metodos[nombre_metodo]
+
+                valor_fecha, dia = fecha_venta(fecha, linea)
+                total_divisa = _decimal(total_divisa, 'Total $', linea)
+                total_bs = _decimal(total_bs, 'Total Bs', linea)
+                tasa_venta = _decimal(tasa, 'Tasa Cambio', linea)
+                monto = total_bs if es_bolivares else total_divisa
+
+                indice = len(lote.ventas)
+                lote.ventas.append((usuario_id, valor_fecha, total_divisa, total_bs, tasa_venta))
+                lote.pagos.append((indice, metodo_id, monto))
+                resumen = lote.resumenes[dia]
+                resumen.ventas += 1
+                resumen.divisa += total_divisa
+                resumen.bs += total_bs
+                resumen.por_metodo[metodo_id] += monto
+
+            if producto not in productos:
+                raise ErrorImportacion(f"Línea {linea}: el producto '{producto}' no existe.")
+            producto_id, es_agua = productos[producto]
+            cantidad = _decimal(cantidad, 'Cantidad', linea)
+            subtotal_divisa = _decimal(subtotal, 'Subtotal $', linea)
+            subtotal_bs = (subtotal_divisa * tasa_venta).quantize(CENTAVOS)
+            lote.items.append((indice, producto_id, cantidad, subtotal_divisa, subtotal_bs))
+            totales = resumen.por_producto[producto_id]
+            totales[0] += cantidad
+            totales[1] += subtotal_divisa
+            totales[2] += subtotal_bs
+            if es_agua:
+                resumen.litros += cantidad
+            lote.filas += 1
+
+        if lote.filas:
+            _guardar_lote(importacion, lote)
+            if al_avanzar:
+                al_avanzar(importacion)
+
+    importacion.completada = True
+    importacion.save(update_fields=['completada', 'ultima_actualizacion'])
+    return importacion
@@ -0,0 +1,179 @@
+"""
+Medición por solicitud: consultas SQL, tiempo en la base y tiempo de plantillas.
+
+El middleware publica los tiempos en la cabecera Server-Timing (solo para staff),
+los suma a los histogramas de core.metricas y registra en el logger
+'core.rendimiento' las solicitudes que superan settings.SOLICITUD_LENTA_MS, con
+las sentencias más repetidas para detectar N+1.
+
+Las respuestas en streaming (exportaciones) generan su contenido después de salir
+de la vista: se siguen midiendo mientras se envían y se registran al terminar el
+envío. Sus cabeceras ya salieron, así que no llevan Server-Timing.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+from . import metricas
+
+logger = logging.getLogger('core.rendimiento')
+
+# Sentencias repetidas que se incluyen en el registro de solicitudes lentas
+SENTENCIAS_EN_REGISTRO = 5
+LARGO_MAXIMO_SQL = 300
+
+_medicion_actual = ContextVar('medicion_solicitud', default=None)
+
+
+class Medicion:
+    """Acumula lo medido durante una solicitud; sirve de execute_wrapper."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.tiempo_plantillas = 0.0
+        self.sentencias = Counter()
+        # Las vistas asíncronas consultan desde varios hilos a la vez (core.concurrencia)
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            with self._lock:
+                self.consultas += 1
+                self.tiempo_sql += duracion
+                self.sentencias[sql] += 1
+
+    def sumar_plantilla(self, duracion):
+        with self._lock:
+            self.tiempo_plantillas += duracion
+
+    def sentencias_repetidas(self, cantidad=SENTENCIAS_EN_REGISTRO):
+        return [
+            {'sql': sql[:LARGO_MAXIMO_SQL], 'veces': veces}
+            for sql, veces in self.sentencias.most_common(cantidad) if veces > 1
+        ]
+
+    def server_timing(self, total):
+        return (
+            f'db;desc="{self.consultas} consultas";dur={self.tiempo_sql * 1000:.1f}, '
+            f'tpl;desc="Plantillas";dur={self.tiempo_plantillas * 1000:.1f}, '
+            f'total;dur={total * 1000:.1f}'
+        )
+
+
+def medir_consultas():
+    """
+    Context manager que cuenta en la solicitud actual las consultas de otra conexión,
+    como las de los hilos de core.concurrencia. Sin solicitud medida no hace nada.
+    """
+    medicion = _medicion_actual.get()
+    return connection.execute_wrapper(medicion) if medicion else nullcontext()
+
+
+class _PlantillaMedida(Template):
+    def render(self, context=None, request=None):
+        medicion = _medicion_actual.get()
+        if medicion is None:
+            return super().render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            medicion.sumar_plantilla(time.perf_counter() - inicio)
+
+
+class PlantillasMedidas(DjangoTemplates):
+    """Motor de plantillas de Django que suma el tiempo de render a la solicitud actual."""
+
+    def from_string(self, template_code):
+        return _PlantillaMedida(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return _PlantillaMedida(super().get_template(template_name).template, self)
+
+
+@contextmanager
+def _midiendo(medicion):
+    token = _medicion_actual.set(medicion)
+    try:
+        with connection.execute_wrapper(medicion):
+            yield
+    finally:
+        _medicion_actual.reset(token)
+
+
+class MedicionSolicitudMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicion = Medicion()
+        inicio = time.perf_counter()
+        with _midiendo(medicion):
+            response = self.get_response(request)
+
+        # Los archivos (FileResponse) y el contenido asíncrono no consultan la base:
+        # se miden hasta que la vista devuelve la respuesta, como las demás
+        if response.streaming and not response.is_async and not isinstance(response, FileResponse):
+            response.streaming_content = self.contenido_medido(
+                request, response, response.streaming_content, medicion, inicio
+            )
+            return response
+
+        total = time.perf_counter() - inicio
+        usuario = getattr(request, 'user', None)
+        if usuario is not None and usuario.is_staff:
+            response['Server-Timing'] = medicion.server_timing(total)
+        self.registrar(request, response, medicion, total)
+        return response
+
+    def contenido_medido(self, request, response, contenido, medicion, inicio):
+        """
+        Entrega el contenido de una respuesta en streaming midiendo lo que consulta
+        cada fragmento; el total se registra cuando el servidor cierra la respuesta
+        (al terminar el envío o si el cliente se desconecta).
+        """
+        contenido = iter(contenido)
+        try:
+            while True:
+                with _midiendo(medicion):
+                    fragmento = next(contenido, None)
+                if fragmento is None:
+                    return
+                yield fragmento
+        finally:
+            self.registrar(request, response, medicion, time.perf_counter() - inicio)
+
+    def registrar(self, request, response, medicion, total):
+        metricas.observar_solicitud(
+            getattr(request.resolver_match, 'url_name', None), request.method, total, medicion.consultas
+        )
+        if total * 1000 >= settings.SOLICITUD_LENTA_MS:
+            self.registrar_lenta(request, response, medicion, total)
+
+    def registrar_lenta(self, request, response, medicion, total):
+        datos = {
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': getattr(request.resolver_match, 'view_name', None),
+            'estado': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'sql_ms': round(medicion.tiempo_sql * 1000, 1),
+            'consultas': medicion.consultas,
+            'plantillas_ms': round(medicion.tiempo_plantillas * 1000, 1),
+            'sentencias_repetidas': medicion.sentencias_repetidas(),
+        }
+        logger.warning("Solicitud lenta %s", json.dumps(datos, ensure_ascii=False), extra={'solicitud': datos})
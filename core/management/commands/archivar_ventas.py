@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.archivado import ErrorArchivo, archivar_mes, meses_por_archivar, restaurar_mes
+
+
+def _parsear_mes(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f"Mes inválido '{valor}'. Use el formato AAAA-MM.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve las ventas antiguas a un archivo comprimido por mes en ARCHIVO_VENTAS_DIR, "
+        "conservando los resúmenes diarios y guardando totales mensuales por producto y método de pago. "
+        "Con --restaurar devuelve un mes archivado a las tablas de ventas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses', type=int, default=settings.ARCHIVO_VENTAS_MESES,
+            help=f"Meses completos que se conservan en las tablas (por defecto {settings.ARCHIVO_VENTAS_MESES}).",
+        )
+        parser.add_argument('--mes', help="Archiva solo este mes (AAAA-MM).")
+        parser.add_argument('--restaurar', metavar='MES', help="Restaura el mes archivado indicado (AAAA-MM).")
+
+    def handle(self, *args, **options):
+        try:
+            if options['restaurar']:
+                mes = _parsear_mes(options['restaurar'])
+                cantidad = restaurar_mes(mes)
+                self.stdout.write(self.style.SUCCESS(f"{mes:%Y-%m}: {cantidad} ventas restauradas."))
+                return
+
+            meses = [_parsear_mes(options['mes'])] if options['mes'] else meses_por_archivar(options['meses'])
+            if not meses:
+                self.stdout.write("No hay meses para archivar.")
+            for mes in meses:
+                archivo = archivar_mes(mes)
+                self.stdout.write(
+                    f"{mes:%Y-%m}: {archivo.cantidad_ventas} ventas, {archivo.cantidad_items} ítems "
+                    f"y {archivo.cantidad_pagos} pagos en {archivo.archivo}"
+                )
+        except (OSError, ErrorArchivo) as error:
+            raise CommandError(str(error))
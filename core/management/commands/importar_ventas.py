@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importaciones import ErrorImportacion, FILAS_POR_LOTE, importar_ventas, iniciar_importacion
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa ventas históricas desde un CSV con las columnas de la exportación de ventas "
+        "(más una columna opcional 'Método de Pago'). Si se interrumpe, al ejecutarlo de nuevo "
+        "continúa desde el último lote guardado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo CSV.")
+        parser.add_argument('--usuario', help="Usuario asignado a las ventas cuyo usuario no existe.")
+        parser.add_argument('--metodo-pago', help="Método de pago de las ventas sin la columna 'Método de Pago'.")
+        parser.add_argument('--lote', type=int, default=FILAS_POR_LOTE, help=f"Filas por transacción (por defecto {FILAS_POR_LOTE}).")
+        parser.add_argument(
+            '--reiniciar', action='store_true',
+            help="Vuelve a leer el archivo desde el inicio (no borra las ventas ya importadas).",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            importacion = iniciar_importacion(options['archivo'], reiniciar=options['reiniciar'])
+            if importacion.filas_procesadas:
+                self.stdout.write(f"Retomando desde la fila {importacion.filas_procesadas + 1}...")
+            filas_previas = importacion.filas_procesadas
+            importar_ventas(
+                importacion,
+                usuario_por_defecto=options['usuario'],
+                metodo_por_defecto=options['metodo_pago'],
+                filas_por_lote=options['lote'],
+                al_avanzar=lambda i: self.stdout.write(f"  {i.filas_procesadas} filas, {i.ventas_creadas} ventas"),
+            )
+        except (OSError, ErrorImportacion) as error:
+            raise CommandError(str(error))
+
+        segundos = time.perf_counter() - inicio
+        filas = importacion.filas_procesadas - filas_previas
+        self.stdout.write(self.style.SUCCESS(
+            f"Importación completa: {filas} filas en {segundos:.1f} s ({filas / max(segundos, 1e-9):,.0f} filas/s), "
+            f"{importacion.ventas_creadas} ventas en total."
+        ))
@@ -0,0 +1,66 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.exportaciones import procesar_exportacion
+from core.models import ExportacionVentas
+
+
+class Command(BaseCommand):
+    help = (
+        "Procesa las exportaciones de ventas solicitadas desde el control manual. "
+        "Las exportaciones interrumpidas se retoman desde el último mes completo. "
+        "Se pueden correr varios workers a la vez, pero conviene arrancarlos juntos: al "
+        "arrancar, cada uno devuelve a la cola las exportaciones que quedaron a medias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help="Procesa las exportaciones en cola y termina.")
+        parser.add_argument('--intervalo', type=float, default=5, help="Segundos de espera cuando no hay trabajo (por defecto 5).")
+
+    def reclamar(self):
+        """
+        Toma la exportación pendiente más antigua y la marca 'procesando' con un UPDATE
+        condicional: si otro worker la tomó antes, no cambia ninguna fila y se prueba
+        con la siguiente. Devuelve None si no hay ninguna pendiente.
+        """
+        pendientes = ExportacionVentas.objects.filter(estado=ExportacionVentas.PENDIENTE).order_by('id')
+        for pk in pendientes.values_list('id', flat=True):
+            tomada = ExportacionVentas.objects.filter(pk=pk, estado=ExportacionVentas.PENDIENTE).update(
+                estado=ExportacionVentas.PROCESANDO
+            )
+            if tomada:
+                return ExportacionVentas.objects.get(pk=pk)
+        return None
+
+    def handle(self, *args, **options):
+        # Las que quedaron 'procesando' son de un worker detenido: vuelven a la cola y,
+        # al ser las más antiguas, se retoman primero
+        ExportacionVentas.objects.filter(estado=ExportacionVentas.PROCESANDO).update(
+            estado=ExportacionVentas.PENDIENTE
+        )
+        while True:
+            # Como en cada solicitud: descarta la conexión si se cortó o superó CONN_MAX_AGE
+            close_old_connections()
+            exportacion = self.reclamar()
+
+            if exportacion is None:
+                if options['una_vez']:
+                    return
+                time.sleep(options['intervalo'])
+                continue
+
+            self.stdout.write(f"Procesando {exportacion}...")
+            try:
+                procesar_exportacion(
+                    exportacion,
+                    al_avanzar=lambda e: self.stdout.write(f"  {e.meses_procesados}/{e.meses_totales} meses"),
+                )
+            except Exception as error:
+                ExportacionVentas.objects.filter(pk=exportacion.pk).update(
+                    estado=ExportacionVentas.FALLIDA, error=str(error)
+                )
+                self.stderr.write(self.style.ERROR(f"Exportación {exportacion.pk} fallida: {error}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Exportación {exportacion.pk} completada."))
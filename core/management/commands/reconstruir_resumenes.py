@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.resumenes import reconstruir_resumenes
+
+
+def _parsear_fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Fecha inválida '{valor}'. Use el formato AAAA-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los resúmenes diarios de ventas a partir de las tablas de Venta, ItemVenta y PagoVenta."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Primer día a reconstruir (AAAA-MM-DD). Por defecto, todo el histórico.")
+        parser.add_argument('--hasta', help="Último día a reconstruir (AAAA-MM-DD). Por defecto, todo el histórico.")
+
+    def handle(self, *args, **options):
+        desde = _parsear_fecha(options['desde']) if options['desde'] else None
+        hasta = _parsear_fecha(options['hasta']) if options['hasta'] else None
+        if desde and hasta and desde > hasta:
+            raise CommandError("La fecha de inicio no puede ser posterior a la fecha de fin.")
+
+        dias = reconstruir_resumenes(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(f"Resúmenes reconstruidos: {dias} día(s) con ventas."))
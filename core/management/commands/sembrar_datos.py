@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sintetico import sembrar
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos (ventas, ítems, pagos, tasas, cisternas, deliveries y promociones) "
+        "con volúmenes realistas para medir el rendimiento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=730, help="Días de operación a generar (por defecto 730).")
+        parser.add_argument('--ventas-por-dia', type=int, default=120, help="Promedio de ventas por día (por defecto 120).")
+        parser.add_argument('--semilla', type=int, default=2020, help="Semilla para obtener siempre los mismos datos.")
+        parser.add_argument('--forzar', action='store_true', help="Permite ejecutarlo con DEBUG=False.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['forzar']:
+            raise CommandError("Este comando agrega datos falsos. Con DEBUG=False use --forzar si está seguro.")
+        if options['dias'] < 1 or options['ventas_por_dia'] < 1:
+            raise CommandError("--dias y --ventas-por-dia deben ser mayores que cero.")
+
+        creados = sembrar(options['dias'], options['ventas_por_dia'], options['semilla'])
+        resumen = ', '.join(f"{cantidad} {modelo}" for modelo, cantidad in creados.items())
+        self.stdout.write(self.style.SUCCESS(f"Datos sintéticos creados: {resumen}."))
@@ -0,0 +1,80 @@
+"""
+Métricas en formato Prometheus para el endpoint /metrics.
+
+Con la variable PROMETHEUS_MULTIPROC_DIR definida (gunicorn.conf.py la define),
+cada worker escribe sus valores en esa carpeta y /metrics devuelve la suma de
+todos; sin ella (runserver, pruebas) se usan los valores del propio proceso.
+"""
+import os
+
+from django.db import transaction
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+
+SOLICITUD_DURACION = Histogram(
+    'wtp_solicitud_duracion_segundos', "Duración de las solicitudes por nombre de URL.",
+    ['vista', 'metodo'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+SOLICITUD_CONSULTAS = Histogram(
+    'wtp_solicitud_consultas', "Consultas SQL por solicitud según el nombre de URL.",
+    ['vista'],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 200),
+)
+VENTAS_REGISTRADAS = Counter('wtp_ventas_registradas', "Ventas registradas en el punto de venta.")
+LITROS_DESPACHADOS = Counter(
+    'wtp_litros_despachados', "Litros descontados de la cisterna.", ['origen'],
+)
+BOTELLAS_CANJEADAS = Counter('wtp_botellas_canjeadas', "Botellas retiradas de promociones.")
+VENTAS_FALLIDAS = Counter(
+    'wtp_ventas_fallidas', "Ventas rechazadas en el punto de venta, por motivo.", ['motivo'],
+)
+
+# Motivos de VENTAS_FALLIDAS
+SIN_PRODUCTOS = 'sin_productos'
+SIN_PAGOS = 'sin_pagos'
+SIN_TASA = 'sin_tasa'
+PRODUCTO_DESCONOCIDO = 'producto_desconocido'
+METODO_DESCONOCIDO = 'metodo_desconocido'
+PAGO_NO_COINCIDE = 'pago_no_coincide'
+LITROS_INSUFICIENTES = 'litros_insuficientes'
+DATOS_INVALIDOS = 'datos_invalidos'
+
+SIN_RUTA = 'sin_ruta'
+
+
+def observar_solicitud(vista, metodo, segundos, consultas):
+    vista = vista or SIN_RUTA
+    SOLICITUD_DURACION.labels(vista, metodo).observe(segundos)
+    SOLICITUD_CONSULTAS.labels(vista).observe(consultas)
+
+
+def venta_registrada(litros):
+    # Se cuenta al confirmar la transacción: una venta revertida no suma
+    def contar():
+        VENTAS_REGISTRADAS.inc()
+        if litros:
+            LITROS_DESPACHADOS.labels('venta').inc(float(litros))
+    transaction.on_commit(contar)
+
+
+def botella_canjeada(litros, botellas=1):
+    def contar():
+        BOTELLAS_CANJEADAS.inc(botellas)
+        LITROS_DESPACHADOS.labels('promocion').inc(float(litros))
+    transaction.on_commit(contar)
+
+
+def venta_fallida(motivo):
+    VENTAS_FALLIDAS.labels(motivo).inc()
+
+
+def exposicion():
+    """Texto de /metrics con los valores de todos los workers (o del proceso actual)."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 15:26
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_producto_tipo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Día de negocio en la zona horaria local', unique=True)),
+                ('cantidad_ventas', models.PositiveIntegerField(default=0)),
+                ('total_divisa', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_bs', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('litros_vendidos', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenDiarioMetodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('metodo_pago', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='resumenes_diarios', to='core.metododepago')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'metodo_pago'), name='resumen_diario_metodo_unico')],
+            },
+        ),
+    ]
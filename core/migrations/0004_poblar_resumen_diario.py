@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Calcula los resúmenes diarios de todas las ventas existentes."""
+    Venta = apps.get_model('core', 'Venta')
+    ItemVenta = apps.get_model('core', 'ItemVenta')
+    PagoVenta = apps.get_model('core', 'PagoVenta')
+    ResumenDiario = apps.get_model('core', 'ResumenDiario')
+    ResumenDiarioMetodo = apps.get_model('core', 'ResumenDiarioMetodo')
+
+    zona = timezone.get_current_timezone()
+    por_dia = {
+        fila['dia']: ResumenDiario(
+            fecha=fila['dia'],
+            cantidad_ventas=fila['cantidad'],
+            total_divisa=fila['divisa'] or Decimal('0.00'),
+            total_bs=fila['bs'] or Decimal('0.00'),
+        )
+        for fila in Venta.objects.annotate(dia=TruncDate('fecha', tzinfo=zona)).values('dia').annotate(
+            cantidad=Count('id'), divisa=Sum('total_venta_divisa'), bs=Sum('total_venta_bs'),
+        ).order_by()
+    }
+    litros = ItemVenta.objects.filter(producto__tipo='agua_litros').annotate(
+        dia=TruncDate('venta__fecha', tzinfo=zona)
+    ).values('dia').annotate(litros=Sum('cantidad')).order_by()
+    for fila in litros:
+        if fila['dia'] in por_dia:
+            por_dia[fila['dia']].litros_vendidos = fila['litros'] or Decimal('0.00')
+    ResumenDiario.objects.bulk_create(por_dia.values(), batch_size=500)
+
+    pagos = PagoVenta.objects.annotate(
+        dia=TruncDate('venta__fecha', tzinfo=zona)
+    ).values('dia', 'metodo_pago').annotate(total=Sum('monto_recibido')).order_by()
+    ResumenDiarioMetodo.objects.bulk_create(
+        [ResumenDiarioMetodo(fecha=f['dia'], metodo_pago_id=f['metodo_pago'], total=f['total'] or Decimal('0.00')) for f in pagos],
+        batch_size=500,
+    )
+
+
+def vaciar_resumenes(apps, schema_editor):
+    apps.get_model('core', 'ResumenDiarioMetodo').objects.all().delete()
+    apps.get_model('core', 'ResumenDiario').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_resumen_diario'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_resumenes, vaciar_resumenes),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 15:29
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def inicializar_nivel(apps, schema_editor):
+    """Toma el nivel de la última cisterna registrada como nivel inicial."""
+    Cisterna = apps.get_model('core', 'Cisterna')
+    NivelAgua = apps.get_model('core', 'NivelAgua')
+    ultima = Cisterna.objects.order_by('-fecha', '-hora', '-id').first()
+    NivelAgua.objects.create(pk=1, litros=ultima.litros_disponibles if ultima else Decimal('0.00'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_poblar_resumen_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NivelAgua',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('litros', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Litros disponibles actualmente en la cisterna', max_digits=12)),
+            ],
+        ),
+        migrations.RunPython(inicializar_nivel, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 15:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_nivel_agua'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='venta',
+            name='fecha',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
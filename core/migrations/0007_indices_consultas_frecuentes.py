@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_indice_fecha_venta'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cisterna',
+            index=models.Index(fields=['fecha', 'hora'], name='cisterna_fecha_hora_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['fecha', 'hora'], name='delivery_fecha_hora_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemventa',
+            index=models.Index(fields=['venta', 'producto'], name='itemventa_venta_producto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagoventa',
+            index=models.Index(fields=['venta', 'metodo_pago'], name='pagoventa_venta_metodo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='promocion',
+            index=models.Index(condition=models.Q(('botellas_pagadas__gt', models.F('botellas_retiradas'))), fields=['-id'], name='promocion_pendiente_idx'),
+        ),
+    ]
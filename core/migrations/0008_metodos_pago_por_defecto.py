@@ -0,0 +1,28 @@
+from django.db import migrations
+
+METODOS_POR_DEFECTO = [
+    ("Tarjeta de Débito BsD", True),
+    ("Tarjeta de Crédito BsD", True),
+    ("Efectivo BsD", True),
+    ("Divisa $", False),
+    ("Transferencia", True),
+    ("Pago Móvil", True),
+]
+
+
+def crear_metodos_pago(apps, schema_editor):
+    """Crea los métodos de pago por defecto que antes se creaban en cada visita a ventas."""
+    MetodoDePago = apps.get_model('core', 'MetodoDePago')
+    for nombre, es_bolivares in METODOS_POR_DEFECTO:
+        MetodoDePago.objects.get_or_create(nombre=nombre, defaults={'es_bolivares': es_bolivares})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_metodos_pago, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_exportacion_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacionVentas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.CharField(help_text='Ruta absoluta del CSV', max_length=500, unique=True)),
+                ('tamano', models.PositiveBigIntegerField(default=0, help_text='Tamaño del archivo en bytes al iniciar')),
+                ('filas_procesadas', models.PositiveBigIntegerField(default=0)),
+                ('ventas_creadas', models.PositiveIntegerField(default=0)),
+                ('fecha_desde', models.DateField(blank=True, null=True)),
+                ('fecha_hasta', models.DateField(blank=True, null=True)),
+                ('completada', models.BooleanField(default=False)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('ultima_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
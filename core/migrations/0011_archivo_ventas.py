@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-18 16:25
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_importacion_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoVentas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes archivado', unique=True)),
+                ('archivo', models.CharField(help_text='Ruta relativa a ARCHIVO_VENTAS_DIR', max_length=255)),
+                ('cantidad_ventas', models.PositiveIntegerField(default=0)),
+                ('cantidad_items', models.PositiveIntegerField(default=0)),
+                ('cantidad_pagos', models.PositiveIntegerField(default=0)),
+                ('total_divisa', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenMensualMetodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes')),
+                ('cantidad_pagos', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('metodo_pago', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='resumenes_mensuales', to='core.metododepago')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('mes', 'metodo_pago'), name='resumen_mensual_metodo_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenMensualProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes')),
+                ('cantidad', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_divisa', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_bs', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='resumenes_mensuales', to='core.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('mes', 'producto'), name='resumen_mensual_producto_unico')],
+            },
+        ),
+    ]
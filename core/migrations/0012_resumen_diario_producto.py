@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 16:28
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_archivo_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('cantidad', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_divisa', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_bs', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='resumenes_diarios', to='core.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto'), name='resumen_diario_producto_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def poblar_resumenes(apps, schema_editor):
+    """Calcula los resúmenes diarios por producto de todas las ventas existentes."""
+    ItemVenta = apps.get_model('core', 'ItemVenta')
+    ResumenDiarioProducto = apps.get_model('core', 'ResumenDiarioProducto')
+
+    filas = ItemVenta.objects.annotate(
+        dia=TruncDate('venta__fecha', tzinfo=timezone.get_current_timezone())
+    ).values('dia', 'producto').annotate(
+        cantidad=Sum('cantidad'), divisa=Sum('subtotal_divisa'), bs=Sum('subtotal_bs'),
+    ).order_by()
+    ResumenDiarioProducto.objects.bulk_create(
+        [
+            ResumenDiarioProducto(
+                fecha=f['dia'], producto_id=f['producto'], cantidad=f['cantidad'] or Decimal('0.00'),
+                total_divisa=f['divisa'] or Decimal('0.00'), total_bs=f['bs'] or Decimal('0.00'),
+            )
+            for f in filas
+        ],
+        batch_size=500,
+    )
+
+
+def vaciar_resumenes(apps, schema_editor):
+    apps.get_model('core', 'ResumenDiarioProducto').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_resumen_diario_producto'),
+    ]
+
+    operations = [
+        migrations.RunPython(poblar_resumenes, vaciar_resumenes),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 16:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_poblar_resumen_diario_producto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RedencionPromocion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('registro', 'Registro de promoción'), ('retiro', 'Retiro de botellas'), ('historico', 'Histórico (migrado de ventas)')], max_length=10)),
+                ('botellas', models.PositiveIntegerField(default=0)),
+                ('litros', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10)),
+                ('fecha', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('promocion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='redenciones', to='core.promocion')),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='redenciones_promocion', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,78 @@
+from collections import Counter
+from decimal import Decimal
+
+from django.db import migrations, transaction
+from django.db.models import F
+from django.utils import timezone
+
+# Ventas movidas por transacción: la migración no bloquea la base de una sola vez
+TAMANO_LOTE = 2000
+
+
+def _ajustar_resumen(ResumenDiario, por_dia, signo):
+    for dia, cantidad in por_dia.items():
+        ResumenDiario.objects.filter(fecha=dia).update(cantidad_ventas=F('cantidad_ventas') + signo * cantidad)
+
+
+def mover_ventas_promocion(apps, schema_editor):
+    """
+    Convierte las ventas de promoción con total 0 en filas de RedencionPromocion,
+    por lotes y cada lote en su propia transacción. Como las ventas de promoción
+    contaban en ResumenDiario.cantidad_ventas, se descuentan de su día.
+    """
+    Venta = apps.get_model('core', 'Venta')
+    ItemVenta = apps.get_model('core', 'ItemVenta')
+    PagoVenta = apps.get_model('core', 'PagoVenta')
+    RedencionPromocion = apps.get_model('core', 'RedencionPromocion')
+    ResumenDiario = apps.get_model('core', 'ResumenDiario')
+
+    ventas = Venta.objects.filter(tipo_venta='Promocion', total_venta_divisa=0, total_venta_bs=0).order_by('id')
+    while True:
+        with transaction.atomic():
+            lote = list(ventas.values_list('id', 'usuario_id', 'fecha')[:TAMANO_LOTE])
+            if not lote:
+                return
+            RedencionPromocion.objects.bulk_create([
+                RedencionPromocion(tipo='historico', usuario_id=usuario_id, fecha=fecha)
+                for _, usuario_id, fecha in lote
+            ])
+            ids = [venta_id for venta_id, _, _ in lote]
+            ItemVenta.objects.filter(venta_id__in=ids).delete()
+            PagoVenta.objects.filter(venta_id__in=ids).delete()
+            Venta.objects.filter(id__in=ids).delete()
+            _ajustar_resumen(ResumenDiario, Counter(timezone.localdate(fecha) for _, _, fecha in lote), -1)
+
+
+def devolver_ventas_promocion(apps, schema_editor):
+    Venta = apps.get_model('core', 'Venta')
+    RedencionPromocion = apps.get_model('core', 'RedencionPromocion')
+    ResumenDiario = apps.get_model('core', 'ResumenDiario')
+
+    historicas = RedencionPromocion.objects.filter(tipo='historico').order_by('id')
+    while True:
+        with transaction.atomic():
+            lote = list(historicas.values_list('id', 'usuario_id', 'fecha')[:TAMANO_LOTE])
+            if not lote:
+                return
+            Venta.objects.bulk_create([
+                Venta(usuario_id=usuario_id, fecha=fecha, total_venta_divisa=Decimal('0.00'),
+                      total_venta_bs=Decimal('0.00'), tipo_venta='Promocion')
+                for _, usuario_id, fecha in lote if usuario_id is not None
+            ])
+            RedencionPromocion.objects.filter(id__in=[pk for pk, _, _ in lote]).delete()
+            _ajustar_resumen(
+                ResumenDiario, Counter(timezone.localdate(fecha) for _, usuario_id, fecha in lote if usuario_id), 1
+            )
+
+
+class Migration(migrations.Migration):
+    # Cada lote se confirma por separado
+    atomic = False
+
+    dependencies = [
+        ('core', '0014_redencion_promocion'),
+    ]
+
+    operations = [
+        migrations.RunPython(mover_ventas_promocion, devolver_ventas_promocion),
+    ]
@@ -0,0 +1,103 @@
+"""
+Índices de texto para la búsqueda de clientes (core.busqueda).
+
+SQLite: una tabla FTS5 sin contenido por modelo (rowid = id de la fila) que se
+mantiene con triggers. El teléfono se indexa sin espacios ni guiones. Si una
+migración posterior reconstruye core_promocion o core_delivery (SQLite lo hace al
+alterar columnas), los triggers se pierden con la tabla vieja; después de cada
+migrate, core.busqueda.reparar_indices_sqlite los vuelve a crear.
+
+PostgreSQL: índices GIN sobre la misma expresión tsvector que consulta
+core.busqueda y de trigramas (pg_trgm) sobre los nombres y la dirección; la
+base los mantiene sola.
+"""
+from django.db import migrations
+
+TELEFONO = "replace(replace({fila}.telefono, '-', ''), ' ', '')"
+
+# tabla: [(columna indexada, expresión sobre la fila)]
+COLUMNAS = {
+    'core_promocion': [('nombre', '{fila}.nombre'), ('telefono', TELEFONO)],
+    'core_delivery': [('nombre_cliente', '{fila}.nombre_cliente'), ('direccion', '{fila}.direccion')],
+}
+
+DOCUMENTOS_POSTGRES = {
+    'core_promocion': "coalesce(nombre, '') || ' ' || replace(replace(telefono, '-', ''), ' ', '')",
+    'core_delivery': "coalesce(nombre_cliente, '') || ' ' || coalesce(direccion, '')",
+}
+TRIGRAMAS_POSTGRES = {
+    'core_promocion': ['nombre'],
+    'core_delivery': ['nombre_cliente', 'direccion'],
+}
+
+
+def _sentencias_sqlite(tabla, columnas):
+    fts = f'{tabla}_fts'
+    nombres = ', '.join(nombre for nombre, _ in columnas)
+
+    def valores(fila):
+        return ', '.join(expresion.format(fila=fila) for _, expresion in columnas)
+
+    insertar = f"INSERT INTO {fts}(rowid, {nombres}) VALUES (new.id, {valores('new')});"
+    # En una tabla sin contenido se borra repitiendo los valores indexados
+    borrar = f"INSERT INTO {fts}({fts}, rowid, {nombres}) VALUES ('delete', old.id, {valores('old')});"
+    cambio = ' OR '.join(f'old.{nombre} IS NOT new.{nombre}' for nombre, _ in columnas)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({nombres}, content='', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {tabla} BEGIN {insertar} END",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {tabla} BEGIN {borrar} END",
+        # Solo si cambian los campos indexados: retirar botellas no toca el índice
+        f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {nombres} ON {tabla} WHEN {cambio} "
+        f"BEGIN {borrar} {insertar} END",
+        f"INSERT INTO {fts}(rowid, {nombres}) SELECT id, {valores(tabla)} FROM {tabla}",
+    ]
+
+
+def _sentencias_postgres(tabla):
+    sentencias = [
+        f"CREATE INDEX {tabla}_busqueda_idx ON {tabla} "
+        f"USING gin (to_tsvector('simple', {DOCUMENTOS_POSTGRES[tabla]}))",
+    ]
+    for columna in TRIGRAMAS_POSTGRES[tabla]:
+        sentencias.append(f"CREATE INDEX {tabla}_{columna}_trgm_idx ON {tabla} USING gin ({columna} gin_trgm_ops)")
+    return sentencias
+
+
+def crear_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        sentencias = [s for tabla, columnas in COLUMNAS.items() for s in _sentencias_sqlite(tabla, columnas)]
+    elif vendor == 'postgresql':
+        sentencias = ['CREATE EXTENSION IF NOT EXISTS pg_trgm']
+        sentencias += [s for tabla in COLUMNAS for s in _sentencias_postgres(tabla)]
+    else:
+        # Otras bases buscan con icontains (ver core.busqueda)
+        return
+    for sentencia in sentencias:
+        schema_editor.execute(sentencia)
+
+
+def borrar_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for tabla in COLUMNAS:
+        if vendor == 'sqlite':
+            # Borrar la tabla virtual no borra los triggers de la tabla base
+            for sufijo in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {tabla}_fts_{sufijo}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {tabla}_fts')
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {tabla}_busqueda_idx')
+            for columna in TRIGRAMAS_POSTGRES[tabla]:
+                schema_editor.execute(f'DROP INDEX IF EXISTS {tabla}_{columna}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_migrar_ventas_promocion'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
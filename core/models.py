@@ -15,6 +15,13 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.get_rol_display()})"
 
+    def get_session_auth_hash(self):
+        # El usuario de la caché (core.autenticacion) trae el hash de sesión ya calculado
+        # y la contraseña diferida; tras set_password se vuelve a calcular
+        if 'password' in self.get_deferred_fields() and hasattr(self, '_hash_sesion'):
+            return self._hash_sesion
+        return super().get_session_auth_hash()
+
 # Nuevo modelo para la tasa de cambio del día
 class TasaCambio(models.Model):
     fecha = models.DateField(default=timezone.now, unique=True)
@@ -51,9 +58,28 @@ class Cisterna(models.Model):
         related_name='cisternas'
     )
 
+    class Meta:
+        indexes = [
+            # Última cisterna y listado ordenado por fecha y hora
+            models.Index(fields=['fecha', 'hora'], name='cisterna_fecha_hora_idx'),
+        ]
+
     def __str__(self):
         return f"{self.fecha} - {self.hora} - {self.volumen} L"
         
+# Nivel actual de agua disponible. Es una sola fila para poder descontar litros con
+# una única sentencia atómica en lugar de buscar la última Cisterna en cada venta.
+class NivelAgua(models.Model):
+    litros = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text="Litros disponibles actualmente en la cisterna"
+    )
+
+    def __str__(self):
+        return f"Nivel de agua: {self.litros} L"
+
 # Modelo de Delivery
 class Delivery(models.Model):
     fecha = models.DateField(auto_now_add=True)
@@ -73,6 +99,11 @@ class Delivery(models.Model):
         help_text="Usuario encargado del delivery"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha', 'hora'], name='delivery_fecha_hora_idx'),
+        ]
+
     def __str__(self):
         return f"Delivery – {self.direccion} ({self.litros_entregados} L) at {self.fecha}"
 
@@ -105,7 +136,7 @@ class Venta(models.Model):
         help_text="Usuario que registra la venta",
         related_name='ventas'
     )
-    fecha = models.DateTimeField(default=timezone.now)
+    fecha = models.DateTimeField(default=timezone.now, db_index=True)
     total_venta_divisa = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     total_venta_bs = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     tasa_cambio_usada = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
@@ -123,6 +154,12 @@ class ItemVenta(models.Model):
     subtotal_divisa = models.DecimalField(max_digits=10, decimal_places=2)
     subtotal_bs = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            # Ítems de una venta filtrados por producto (p. ej. litros de agua vendidos)
+            models.Index(fields=['venta', 'producto'], name='itemventa_venta_producto_idx'),
+        ]
+
     def __str__(self):
         return f"{self.cantidad} x {self.producto.nombre}"
 
@@ -139,6 +176,12 @@ class PagoVenta(models.Model):
     venta = models.ForeignKey(Venta, on_delete=models.CASCADE, related_name='pagos')
     monto_recibido = models.DecimalField(max_digits=10, decimal_places=2)
     metodo_pago = models.ForeignKey(MetodoDePago, on_delete=models.PROTECT, related_name='pagos_recibidos')
+
+    class Meta:
+        indexes = [
+            # Pagos de una venta agrupados por método de pago
+            models.Index(fields=['venta', 'metodo_pago'], name='pagoventa_venta_metodo_idx'),
+        ]
     
     def __str__(self):
         return f"Pago de {self.monto_recibido} con {self.metodo_pago.nombre}"
@@ -158,9 +201,202 @@ class Promocion(models.Model):
         related_name='promociones'
     )
 
+    class Meta:
+        indexes = [
+            # Índice parcial: solo las promociones con botellas pendientes, en el orden del listado.
+            # En motores sin índices parciales Django omite este índice.
+            models.Index(
+                fields=['-id'],
+                condition=models.Q(botellas_pagadas__gt=models.F('botellas_retiradas')),
+                name='promocion_pendiente_idx',
+            ),
+        ]
+
     @property
     def botellas_pendientes(self):
         return self.botellas_pagadas - self.botellas_retiradas
 
     def __str__(self):
         return f"{self.nombre} ({self.botellas_pendientes} pendientes)"
+
+# Movimientos de las promociones (registro y retiro de botellas). Reemplaza las ventas
+# con total 0 que se creaban antes, para que no pesen en los reportes de ventas.
+class RedencionPromocion(models.Model):
+    REGISTRO = 'registro'
+    RETIRO = 'retiro'
+    HISTORICO = 'historico'
+    TIPOS = (
+        (REGISTRO, 'Registro de promoción'),
+        (RETIRO, 'Retiro de botellas'),
+        (HISTORICO, 'Histórico (migrado de ventas)'),
+    )
+
+    promocion = models.ForeignKey(
+        Promocion,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='redenciones'
+    )
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    botellas = models.PositiveIntegerField(default=0)
+    litros = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='redenciones_promocion'
+    )
+    fecha = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.botellas} botellas ({self.fecha:%Y-%m-%d %H:%M})"
+
+# Resumen diario de ventas, mantenido de forma incremental al registrar cada venta
+class ResumenDiario(models.Model):
+    fecha = models.DateField(unique=True, help_text="Día de negocio en la zona horaria local")
+    cantidad_ventas = models.PositiveIntegerField(default=0)
+    total_divisa = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_bs = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    litros_vendidos = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+
+    def __str__(self):
+        return f"Resumen del {self.fecha}: ${self.total_divisa} / {self.litros_vendidos} L"
+
+# Total recaudado por método de pago en un día de negocio
+class ResumenDiarioMetodo(models.Model):
+    fecha = models.DateField()
+    metodo_pago = models.ForeignKey(MetodoDePago, on_delete=models.PROTECT, related_name='resumenes_diarios')
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'metodo_pago'], name='resumen_diario_metodo_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.metodo_pago.nombre}: {self.total}"
+
+# Cantidad vendida y total por producto en un día de negocio
+class ResumenDiarioProducto(models.Model):
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.PROTECT, related_name='resumenes_diarios')
+    cantidad = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_divisa = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_bs = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='resumen_diario_producto_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.producto.nombre}: {self.cantidad}"
+
+# Exportación de ventas solicitada desde el control manual y procesada en segundo plano
+class ExportacionVentas(models.Model):
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    COMPLETADA = 'completada'
+    FALLIDA = 'fallida'
+    ESTADOS = (
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (COMPLETADA, 'Completada'),
+        (FALLIDA, 'Fallida'),
+    )
+    FORMATOS = (
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+    )
+
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='exportaciones'
+    )
+    formato = models.CharField(max_length=4, choices=FORMATOS, default='csv')
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    meses_totales = models.PositiveIntegerField(default=0)
+    meses_procesados = models.PositiveIntegerField(default=0)
+    archivo = models.CharField(max_length=255, blank=True, help_text="Ruta relativa a EXPORTACIONES_DIR")
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_fin_proceso = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'id'], name='exportacion_estado_idx'),
+        ]
+
+    @property
+    def progreso(self):
+        if not self.meses_totales:
+            return 100 if self.estado == self.COMPLETADA else 0
+        return round(self.meses_procesados * 100 / self.meses_totales)
+
+    def __str__(self):
+        return f"Exportación {self.formato.upper()} {self.fecha_inicio} - {self.fecha_fin} ({self.get_estado_display()})"
+
+# Importación de ventas históricas desde un CSV (manage.py importar_ventas).
+# Guarda el avance en la misma transacción que cada lote para poder retomarla.
+class ImportacionVentas(models.Model):
+    archivo = models.CharField(max_length=500, unique=True, help_text="Ruta absoluta del CSV")
+    tamano = models.PositiveBigIntegerField(default=0, help_text="Tamaño del archivo en bytes al iniciar")
+    filas_procesadas = models.PositiveBigIntegerField(default=0)
+    ventas_creadas = models.PositiveIntegerField(default=0)
+    fecha_desde = models.DateField(null=True, blank=True)
+    fecha_hasta = models.DateField(null=True, blank=True)
+    completada = models.BooleanField(default=False)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    ultima_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Importación {self.archivo} ({self.filas_procesadas} filas)"
+
+# Mes de ventas sacado de Venta, ItemVenta y PagoVenta a un .jsonl.gz (manage.py archivar_ventas).
+# Los resúmenes diarios del mes se conservan, así que los reportes no cambian.
+class ArchivoVentas(models.Model):
+    mes = models.DateField(unique=True, help_text="Primer día del mes archivado")
+    archivo = models.CharField(max_length=255, help_text="Ruta relativa a ARCHIVO_VENTAS_DIR")
+    cantidad_ventas = models.PositiveIntegerField(default=0)
+    cantidad_items = models.PositiveIntegerField(default=0)
+    cantidad_pagos = models.PositiveIntegerField(default=0)
+    total_divisa = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Ventas de {self.mes:%Y-%m} ({self.cantidad_ventas} ventas)"
+
+# Totales por producto de un mes archivado
+class ResumenMensualProducto(models.Model):
+    mes = models.DateField(help_text="Primer día del mes")
+    producto = models.ForeignKey(Producto, on_delete=models.PROTECT, related_name='resumenes_mensuales')
+    cantidad = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_divisa = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'))
+    total_bs = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['mes', 'producto'], name='resumen_mensual_producto_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} - {self.producto.nombre}: {self.cantidad}"
+
+# Total recaudado por método de pago en un mes archivado
+class ResumenMensualMetodo(models.Model):
+    mes = models.DateField(help_text="Primer día del mes")
+    metodo_pago = models.ForeignKey(MetodoDePago, on_delete=models.PROTECT, related_name='resumenes_mensuales')
+    cantidad_pagos = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['mes', 'metodo_pago'], name='resumen_mensual_metodo_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} - {self.metodo_pago.nombre}: {self.total}"
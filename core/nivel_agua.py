@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+
+from .models import NivelAgua
+
+# Única fila de la tabla NivelAgua
+NIVEL_ID = 1
+CENTAVOS = Decimal('0.01')
+
+
+def _a_decimal(valor):
+    # SQLite devuelve números de punto flotante en las sentencias crudas
+    return Decimal(str(valor)).quantize(CENTAVOS)
+
+
+def _soporta_returning():
+    return connection.vendor in ('postgresql', 'sqlite')
+
+
+def _actualizar(operador, litros, solo_si_alcanza=False):
+    """
+    Ejecuta un UPDATE sobre la fila del nivel y devuelve los litros resultantes,
+    o None si la fila no existe o no cumplió la condición.
+    """
+    quote = connection.ops.quote_name
+    tabla = quote(NivelAgua._meta.db_table)
+    columna = quote('litros')
+    valor = connection.ops.adapt_decimalfield_value(litros, 12, 2)
+    sql = f"UPDATE {tabla} SET {columna} = {columna} {operador} %s WHERE {quote(NivelAgua._meta.pk.column)} = %s"
+    parametros = [valor, NIVEL_ID]
+    if solo_si_alcanza:
+        sql += f" AND {columna} >= %s"
+        parametros.append(valor)
+
+    with connection.cursor() as cursor:
+        if _soporta_returning():
+            cursor.execute(f"{sql} RETURNING {columna}", parametros)
+            fila = cursor.fetchone()
+            return _a_decimal(fila[0]) if fila else None
+
+        # Motores sin UPDATE ... RETURNING: se bloquea la fila para leer el nuevo valor
+        with transaction.atomic():
+            cursor.execute(sql, parametros)
+            if cursor.rowcount == 0:
+                return None
+            return NivelAgua.objects.select_for_update().get(pk=NIVEL_ID).litros
+
+
+def litros_disponibles():
+    """Litros disponibles en este momento."""
+    litros = NivelAgua.objects.filter(pk=NIVEL_ID).values_list('litros', flat=True).first()
+    return litros if litros is not None else Decimal('0.00')
+
+
+def descontar_litros(litros):
+    """
+    Descuenta `litros` del nivel solo si alcanzan, en una única sentencia.
+
+    Devuelve el nuevo nivel, o None si no había suficiente agua. Varias ventas
+    concurrentes nunca pueden dejar el nivel en negativo.
+    """
+    return _actualizar('-', litros, solo_si_alcanza=True)
+
+
+def reponer_litros(litros):
+    """Suma `litros` al nivel (llenado de cisterna) y devuelve el nuevo nivel."""
+    nivel = _actualizar('+', litros)
+    if nivel is not None:
+        return nivel
+    try:
+        with transaction.atomic():
+            return NivelAgua.objects.create(pk=NIVEL_ID, litros=litros).litros
+    except IntegrityError:
+        # Otro proceso creó la fila al mismo tiempo
+        return _actualizar('+', litros)
@@ -0,0 +1,116 @@
+import base64
+import binascii
+import json
+from datetime import datetime, time
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+
+# Registros por página en los listados
+TAMANO_PAGINA = 25
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class _CodificadorCursor(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder recorta las fechas con hora a milisegundos; el cursor necesita
+    los microsegundos o saltaría las filas del mismo milisegundo.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime, time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _codificar_cursor(valores):
+    texto = json.dumps(valores, cls=_CodificadorCursor, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode()
+
+
+def _decodificar_cursor(cursor, modelo, campos):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(valores, list) or len(valores) != len(campos):
+            raise CursorInvalido("El cursor no corresponde a este listado.")
+        # _codificar_cursor solo escribe textos y números; None, listas u objetos son un cursor alterado
+        if not all(isinstance(valor, (str, int, float)) and not isinstance(valor, bool) for valor in valores):
+            raise CursorInvalido("Cursor de paginación inválido.")
+        return [modelo._meta.get_field(campo).to_python(valor) for campo, valor in zip(campos, valores)]
+    except (binascii.Error, UnicodeError, ValueError, TypeError, ValidationError) as error:
+        raise CursorInvalido("Cursor de paginación inválido.") from error
+
+
+def _despues_de(campos, valores):
+    """
+    Condición "(campos) < (valores)" en orden descendente, escrita como OR anidados.
+
+    El primer campo se acota además con <= para que el motor recorra el índice
+    solo desde el cursor, sin importar cuánto histórico haya antes.
+    """
+    condicion = Q(**{f'{campos[-1]}__lt': valores[-1]})
+    for campo, valor in reversed(list(zip(campos[:-1], valores[:-1]))):
+        condicion = Q(**{f'{campo}__lt': valor}) | (Q(**{campo: valor}) & condicion)
+    return Q(**{f'{campos[0]}__lte': valores[0]}) & condicion
+
+
+def paginar(queryset, campos, cursor=None, tamano=TAMANO_PAGINA):
+    """
+    Devuelve (objetos, siguiente_cursor) de una página ordenada de forma descendente
+    por `campos`, que deben identificar cada fila (el último suele ser 'id').
+
+    Con paginación por clave el costo de cada página no depende de su posición,
+    a diferencia de OFFSET. `siguiente_cursor` es None en la última página.
+    """
+    queryset = queryset.order_by(*[f'-{campo}' for campo in campos])
+    if cursor:
+        queryset = queryset.filter(_despues_de(campos, _decodificar_cursor(cursor, queryset.model, campos)))
+
+    objetos = list(queryset[:tamano + 1])
+    siguiente = None
+    if len(objetos) > tamano:
+        objetos = objetos[:tamano]
+        siguiente = _codificar_cursor([getattr(objetos[-1], campo) for campo in campos])
+    return objetos, siguiente
+
+
+def fechas_del_filtro(request):
+    """
+    Lee fecha_inicio y fecha_fin (AAAA-MM-DD) de la solicitud. Los valores vacíos
+    o inválidos se devuelven como None (sin límite).
+    """
+    fechas = []
+    for parametro in ('fecha_inicio', 'fecha_fin'):
+        try:
+            fechas.append(datetime.strptime(request.GET.get(parametro, ''), '%Y-%m-%d').date())
+        except ValueError:
+            fechas.append(None)
+    return tuple(fechas)
+
+
+def parametros_del_filtro(request):
+    """Query string de los filtros actuales, sin el cursor, para el botón "Cargar más"."""
+    parametros = request.GET.copy()
+    parametros.pop('cursor', None)
+    return parametros.urlencode()
+
+
+def respuesta_cargar_mas(request, plantilla, nombre, paginador):
+    """
+    Respuesta JSON del botón "Cargar más": las filas de la página siguiente ya
+    renderizadas con la misma plantilla parcial de la página y el próximo cursor.
+    """
+    try:
+        objetos, siguiente = paginador(request.GET.get('cursor'))
+    except CursorInvalido as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    return JsonResponse({
+        'html': render_to_string(plantilla, {nombre: objetos}, request=request),
+        'siguiente': siguiente,
+    })
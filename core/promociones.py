@@ -0,0 +1,75 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from .models import Promocion, RedencionPromocion
+from .nivel_agua import _soporta_returning, descontar_litros
+
+LITROS_POR_BOTELLA = Decimal('20.00')
+
+
+class BotellasInsuficientes(Exception):
+    def __init__(self, pendientes):
+        self.pendientes = pendientes
+        super().__init__(
+            f"Solo quedan {pendientes} botellas pendientes." if pendientes else "No hay botellas pendientes"
+        )
+
+
+class LitrosInsuficientes(Exception):
+    pass
+
+
+def _retirar(promo_id, botellas):
+    """
+    Suma `botellas` a las retiradas solo si hay al menos esas pendientes, en una
+    única sentencia, y devuelve las que quedan pendientes (None si no se aplicó).
+    """
+    quote = connection.ops.quote_name
+    tabla = quote(Promocion._meta.db_table)
+    pagadas, retiradas = quote('botellas_pagadas'), quote('botellas_retiradas')
+    sql = (
+        f"UPDATE {tabla} SET {retiradas} = {retiradas} + %s "
+        f"WHERE {quote(Promocion._meta.pk.column)} = %s AND {pagadas} - {retiradas} >= %s"
+    )
+    parametros = [botellas, promo_id, botellas]
+
+    with connection.cursor() as cursor:
+        if _soporta_returning():
+            cursor.execute(f"{sql} RETURNING {pagadas} - {retiradas}", parametros)
+            fila = cursor.fetchone()
+            return fila[0] if fila else None
+
+        # Motores sin UPDATE ... RETURNING: se bloquea la fila para leer el nuevo valor
+        with transaction.atomic():
+            cursor.execute(sql, parametros)
+            if cursor.rowcount == 0:
+                return None
+            return Promocion.objects.select_for_update().get(pk=promo_id).botellas_pendientes
+
+
+@transaction.atomic
+def canjear_botellas(promo_id, botellas, usuario=None):
+    """
+    Retira `botellas` de la promoción y descuenta sus litros de la cisterna en la
+    misma transacción: una sentencia para la promoción, otra para el nivel y el
+    movimiento en RedencionPromocion.
+
+    Devuelve las botellas que quedan pendientes. Lanza Promocion.DoesNotExist,
+    BotellasInsuficientes o LitrosInsuficientes sin dejar cambios.
+    """
+    pendientes = _retirar(promo_id, botellas)
+    if pendientes is None:
+        # Solo el caso de error vuelve a leer la fila, para explicar el motivo
+        promocion = Promocion.objects.get(pk=promo_id)
+        raise BotellasInsuficientes(promocion.botellas_pendientes)
+
+    litros = botellas * LITROS_POR_BOTELLA
+    if descontar_litros(litros) is None:
+        # La excepción revierte también la sentencia de la promoción
+        raise LitrosInsuficientes("No hay suficientes litros disponibles en la cisterna.")
+
+    RedencionPromocion.objects.create(
+        promocion_id=promo_id, tipo=RedencionPromocion.RETIRO, botellas=botellas, litros=litros, usuario=usuario,
+    )
+    return pendientes
@@ -0,0 +1,205 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    ArchivoVentas, ItemVenta, PagoVenta, ResumenDiario, ResumenDiarioMetodo, ResumenDiarioProducto, Venta
+)
+from .utils import inicio_del_dia, primer_dia_mes_siguiente
+
+CERO = Decimal('0.00')
+CENTAVOS = Decimal('0.01')
+
+
+def acumular_venta(venta, litros=CERO, pagos=(), items=()):
+    """
+    Suma una venta recién creada al resumen de su día local.
+
+    `pagos` es una secuencia de pares (metodo_pago_id, monto) e `items` una de
+    tuplas (producto_id, cantidad, subtotal_divisa, subtotal_bs). Debe llamarse
+    dentro de la misma transacción que registra la venta para que el resumen
+    nunca se desincronice de las tablas de origen.
+    """
+    totales_por_metodo = defaultdict(Decimal)
+    for metodo_pago_id, monto in pagos:
+        totales_por_metodo[metodo_pago_id] += Decimal(str(monto))
+    totales_por_producto = defaultdict(lambda: [CERO, CERO, CERO])
+    for producto_id, cantidad, subtotal_divisa, subtotal_bs in items:
+        # Redondeados como quedan guardados en ItemVenta
+        totales = totales_por_producto[producto_id]
+        totales[0] += cantidad
+        totales[1] += subtotal_divisa.quantize(CENTAVOS)
+        totales[2] += subtotal_bs.quantize(CENTAVOS)
+
+    acumular_dia(
+        timezone.localdate(venta.fecha), 1, venta.total_venta_divisa, venta.total_venta_bs,
+        litros, totales_por_metodo, totales_por_producto,
+    )
+
+
+def acumular_dia(fecha, cantidad_ventas, total_divisa, total_bs, litros, totales_por_metodo,
+                 totales_por_producto=None):
+    """
+    Suma al resumen de `fecha` los totales de varias ventas del mismo día.
+
+    `totales_por_metodo` es un diccionario {metodo_pago_id: monto} y
+    `totales_por_producto` uno {producto_id: (cantidad, total_divisa, total_bs)}.
+    Igual que acumular_venta, debe llamarse en la transacción que guarda esas ventas.
+    """
+    acumular_dias({
+        fecha: (cantidad_ventas, total_divisa, total_bs, litros, totales_por_metodo, totales_por_producto or {})
+    })
+
+
+def _acumular(modelo, claves, campos, filas):
+    """
+    INSERT ... ON CONFLICT (claves) DO UPDATE SET campo = campo + excluded.campo
+    para muchas filas con executemany (SQLite 3.24+ y PostgreSQL comparten la sintaxis).
+
+    Cada fila trae primero los valores de `claves` y luego los de `campos`. Crear la
+    fila y sumarle en una sola sentencia evita consultas extra y no pisa ventas
+    registradas al mismo tiempo.
+    """
+    if not filas:
+        return
+    quote = connection.ops.quote_name
+    tabla = quote(modelo._meta.db_table)
+    columnas_clave = [quote(modelo._meta.get_field(clave).column) for clave in claves]
+    columnas = [quote(modelo._meta.get_field(campo).column) for campo in campos]
+    sumas = ', '.join(f"{columna} = {tabla}.{columna} + excluded.{columna}" for columna in columnas)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {tabla} ({', '.join(columnas_clave + columnas)}) "
+            f"VALUES ({', '.join(['%s'] * (len(claves) + len(campos)))}) "
+            f"ON CONFLICT ({', '.join(columnas_clave)}) DO UPDATE SET {sumas}",
+            filas,
+        )
+
+
+def acumular_dias(totales):
+    """
+    Como acumular_dia para muchos días a la vez, con una consulta por tabla de resumen.
+
+    `totales` es un diccionario {fecha: (cantidad_ventas, total_divisa, total_bs,
+    litros, {metodo_pago_id: monto}, {producto_id: (cantidad, divisa, bs)})}.
+    """
+    fecha_db = connection.ops.adapt_datefield_value
+    _acumular(
+        ResumenDiario, ['fecha'], ['cantidad_ventas', 'total_divisa', 'total_bs', 'litros_vendidos'],
+        [(fecha_db(fecha), cantidad, divisa, bs, litros)
+         for fecha, (cantidad, divisa, bs, litros, *_) in totales.items()],
+    )
+    _acumular(
+        ResumenDiarioMetodo, ['fecha', 'metodo_pago'], ['total'],
+        [(fecha_db(fecha), metodo_pago_id, monto)
+         for fecha, (*_, totales_por_metodo, _) in totales.items()
+         for metodo_pago_id, monto in totales_por_metodo.items()],
+    )
+    _acumular(
+        ResumenDiarioProducto, ['fecha', 'producto'], ['cantidad', 'total_divisa', 'total_bs'],
+        [(fecha_db(fecha), producto_id, *valores)
+         for fecha, (*_, totales_por_producto) in totales.items()
+         for producto_id, valores in totales_por_producto.items()],
+    )
+
+
+@transaction.atomic
+def reconstruir_resumenes(fecha_inicio=None, fecha_fin=None):
+    """
+    Recalcula los resúmenes diarios (totales, por método y por producto) a partir
+    de Venta, ItemVenta y PagoVenta.
+
+    Sin fechas se reconstruye todo el histórico. Los días de meses archivados
+    (core.archivado) ya no tienen ventas en las tablas, así que sus resúmenes se
+    conservan tal cual. Devuelve la cantidad de días escritos.
+    """
+    dia = TruncDate('fecha', tzinfo=timezone.get_current_timezone())
+    dia_venta = TruncDate('venta__fecha', tzinfo=timezone.get_current_timezone())
+
+    ventas = Venta.objects.all()
+    items = ItemVenta.objects.all()
+    pagos = PagoVenta.objects.all()
+    resumenes = ResumenDiario.objects.all()
+    resumenes_metodo = ResumenDiarioMetodo.objects.all()
+    resumenes_producto = ResumenDiarioProducto.objects.all()
+
+    if fecha_inicio:
+        desde = inicio_del_dia(fecha_inicio)
+        ventas = ventas.filter(fecha__gte=desde)
+        items = items.filter(venta__fecha__gte=desde)
+        pagos = pagos.filter(venta__fecha__gte=desde)
+        resumenes = resumenes.filter(fecha__gte=fecha_inicio)
+        resumenes_metodo = resumenes_metodo.filter(fecha__gte=fecha_inicio)
+        resumenes_producto = resumenes_producto.filter(fecha__gte=fecha_inicio)
+    if fecha_fin:
+        hasta = inicio_del_dia(fecha_fin + timedelta(days=1))
+        ventas = ventas.filter(fecha__lt=hasta)
+        items = items.filter(venta__fecha__lt=hasta)
+        pagos = pagos.filter(venta__fecha__lt=hasta)
+        resumenes = resumenes.filter(fecha__lte=fecha_fin)
+        resumenes_metodo = resumenes_metodo.filter(fecha__lte=fecha_fin)
+        resumenes_producto = resumenes_producto.filter(fecha__lte=fecha_fin)
+
+    archivados = ArchivoVentas.objects.all()
+    if fecha_inicio:
+        archivados = archivados.filter(mes__gte=fecha_inicio.replace(day=1))
+    if fecha_fin:
+        archivados = archivados.filter(mes__lte=fecha_fin)
+    archivados = set(archivados.values_list('mes', flat=True))
+    if archivados:
+        meses_archivados = Q()
+        for mes in archivados:
+            meses_archivados |= Q(fecha__gte=mes, fecha__lt=primer_dia_mes_siguiente(mes))
+        resumenes = resumenes.exclude(meses_archivados)
+        resumenes_metodo = resumenes_metodo.exclude(meses_archivados)
+        resumenes_producto = resumenes_producto.exclude(meses_archivados)
+
+    por_dia = {
+        fila['dia']: ResumenDiario(
+            fecha=fila['dia'],
+            cantidad_ventas=fila['cantidad'],
+            total_divisa=fila['divisa'] or CERO,
+            total_bs=fila['bs'] or CERO,
+        )
+        for fila in ventas.annotate(dia=dia).values('dia').annotate(
+            cantidad=Count('id'),
+            divisa=Sum('total_venta_divisa'),
+            bs=Sum('total_venta_bs'),
+        ).order_by()
+        if fila['dia'].replace(day=1) not in archivados
+    }
+    for fila in items.filter(producto__tipo='agua_litros').annotate(dia=dia_venta).values('dia').annotate(litros=Sum('cantidad')).order_by():
+        if fila['dia'] in por_dia:
+            por_dia[fila['dia']].litros_vendidos = fila['litros'] or CERO
+
+    por_metodo = [
+        ResumenDiarioMetodo(fecha=fila['dia'], metodo_pago_id=fila['metodo_pago'], total=fila['total'] or CERO)
+        for fila in pagos.annotate(dia=dia_venta).values('dia', 'metodo_pago').annotate(
+            total=Sum('monto_recibido')
+        ).order_by()
+        if fila['dia'].replace(day=1) not in archivados
+    ]
+
+    por_producto = [
+        ResumenDiarioProducto(
+            fecha=fila['dia'], producto_id=fila['producto'], cantidad=fila['cantidad'] or CERO,
+            total_divisa=fila['divisa'] or CERO, total_bs=fila['bs'] or CERO,
+        )
+        for fila in items.annotate(dia=dia_venta).values('dia', 'producto').annotate(
+            cantidad=Sum('cantidad'), divisa=Sum('subtotal_divisa'), bs=Sum('subtotal_bs'),
+        ).order_by()
+        if fila['dia'].replace(day=1) not in archivados
+    ]
+
+    resumenes.delete()
+    resumenes_metodo.delete()
+    resumenes_producto.delete()
+    ResumenDiario.objects.bulk_create(por_dia.values(), batch_size=500)
+    ResumenDiarioMetodo.objects.bulk_create(por_metodo, batch_size=500)
+    ResumenDiarioProducto.objects.bulk_create(por_producto, batch_size=500)
+    return len(por_dia)
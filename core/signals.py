@@ -0,0 +1,44 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .autenticacion import invalidar_usuario
+from .busqueda import reparar_indices_sqlite
+from .catalogos import invalidar_metodos_pago, invalidar_tasa
+from .exportaciones import borrar_archivos_exportacion
+from .models import ExportacionVentas, MetodoDePago, TasaCambio, User
+
+
+def _invalidar(funcion):
+    # Se invalida de inmediato y otra vez al confirmar la transacción, para que una
+    # lectura concurrente no deje en caché el valor anterior al commit.
+    funcion()
+    transaction.on_commit(funcion)
+
+
+@receiver([post_save, post_delete], sender=TasaCambio)
+def tasa_cambiada(sender, **kwargs):
+    _invalidar(invalidar_tasa)
+
+
+@receiver([post_save, post_delete], sender=MetodoDePago)
+def metodo_pago_cambiado(sender, **kwargs):
+    _invalidar(invalidar_metodos_pago)
+
+
+@receiver([post_save, post_delete], sender=User)
+def usuario_cambiado(sender, instance, **kwargs):
+    _invalidar(lambda: invalidar_usuario(instance.pk))
+
+
+@receiver(post_delete, sender=ExportacionVentas)
+def exportacion_eliminada(sender, instance, **kwargs):
+    # Los archivos se borran solo si la eliminación se confirma
+    transaction.on_commit(lambda: borrar_archivos_exportacion(instance))
+
+
+@receiver(post_migrate)
+def indices_de_busqueda(sender, using, **kwargs):
+    # Una migración que reconstruye core_promocion o core_delivery en SQLite borra sus triggers
+    if sender.name == 'core':
+        reparar_indices_sqlite(using)
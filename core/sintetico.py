@@ -0,0 +1,224 @@
+"""
+Datos sintéticos con volúmenes realistas para pruebas de rendimiento.
+
+Todo se inserta con bulk_create por lotes; al final se reconstruyen los resúmenes
+diarios y se ajusta el nivel de agua para que las vistas funcionen como en producción.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Cisterna, Delivery, ItemVenta, MetodoDePago, NivelAgua, PagoVenta, Producto, Promocion,
+    TasaCambio, User, Venta
+)
+from .nivel_agua import NIVEL_ID
+from .resumenes import reconstruir_resumenes
+
+TAMANO_LOTE = 2000
+CENTAVOS = Decimal('0.01')
+
+PRODUCTOS = [
+    # codigo, nombre, precio_divisa, tipo
+    ('001', 'Agua por litro', Decimal('0.10'), 'agua_litros'),
+    ('002', 'Botella 20L', Decimal('2.00'), 'botella_20l'),
+    ('003', 'Botella 10L', Decimal('1.20'), 'botella_10l'),
+    ('004', 'Botella 5L', Decimal('0.80'), 'botella_5l'),
+    ('005', 'Tapa', Decimal('0.25'), 'articulos_extra'),
+]
+USUARIOS = [
+    ('cajero_demo', 'trabajador'),
+    ('encargada_demo', 'encargada'),
+    ('dueno_demo', 'dueno'),
+]
+CLIENTES = ['María', 'José', 'Luis', 'Carmen', 'Ana', 'Pedro', 'Rosa', 'Carlos', 'Elena', 'Miguel']
+APELLIDOS = ['González', 'Rodríguez', 'Pérez', 'Hernández', 'García', 'Martínez', 'López', 'Díaz']
+
+
+def _usuarios():
+    usuarios = {}
+    for username, rol in USUARIOS:
+        usuario, creado = User.objects.get_or_create(username=username, defaults={'rol': rol})
+        if creado:
+            usuario.set_unusable_password()
+            usuario.save(update_fields=['password'])
+        usuarios[rol] = usuario
+    return usuarios
+
+
+def _productos():
+    for codigo, nombre, precio, tipo in PRODUCTOS:
+        Producto.objects.get_or_create(codigo=codigo, defaults={'nombre': nombre, 'precio_divisa': precio, 'tipo': tipo})
+    return list(Producto.objects.filter(codigo__in=[p[0] for p in PRODUCTOS]).order_by('codigo'))
+
+
+def _momento(dia, azar):
+    # Horario de atención de 7:00 a 19:00 (hora local)
+    segundos = azar.randrange(7 * 3600, 19 * 3600)
+    return timezone.make_aware(datetime.combine(dia, time()) + timedelta(seconds=segundos))
+
+
+def _tasas(dias, azar):
+    tasa = Decimal('36.00')
+    tasas = {}
+    for dia in dias:
+        tasa = (tasa * Decimal(str(1 + azar.uniform(-0.002, 0.006)))).quantize(CENTAVOS)
+        tasas[dia] = tasa
+    # Las fechas con tasa ya registrada se respetan
+    TasaCambio.objects.bulk_create(
+        [TasaCambio(fecha=dia, tasa_bsd=tasa) for dia, tasa in tasas.items()],
+        batch_size=TAMANO_LOTE, ignore_conflicts=True,
+    )
+    tasas.update(TasaCambio.objects.filter(fecha__in=dias).values_list('fecha', 'tasa_bsd'))
+    return tasas
+
+
+def _ventas_del_dia(dia, cantidad, tasa, cajero, productos, metodos, azar):
+    ventas, detalles = [], []
+    for _ in range(cantidad):
+        items = []
+        for producto in azar.sample(productos, azar.randint(1, 3)):
+            unidades = Decimal(azar.randint(5, 60) if producto.tipo == 'agua_litros' else azar.randint(1, 4))
+            subtotal = (producto.precio_divisa * unidades).quantize(CENTAVOS)
+            items.append((producto, unidades, subtotal))
+
+        total_divisa = sum((subtotal for _, _, subtotal in items), Decimal('0.00'))
+        total_bs = (total_divisa * tasa).quantize(CENTAVOS)
+
+        # Uno o dos pagos que cubren exactamente el total
+        primero = azar.choice(metodos)
+        if azar.random() < 0.3:
+            segundo = azar.choice([m for m in metodos if m != primero])
+            parte = (total_divisa * Decimal(str(azar.uniform(0.2, 0.8)))).quantize(CENTAVOS)
+            pagos = [(primero, parte), (segundo, total_divisa - parte)]
+        else:
+            pagos = [(primero, total_divisa)]
+        pagos = [
+            (metodo, (monto * tasa).quantize(CENTAVOS) if metodo.es_bolivares else monto)
+            for metodo, monto in pagos
+        ]
+
+        ventas.append(Venta(
+            usuario=cajero, fecha=_momento(dia, azar), total_venta_divisa=total_divisa,
+            total_venta_bs=total_bs, tasa_cambio_usada=tasa,
+        ))
+        detalles.append((items, pagos, tasa))
+    return ventas, detalles
+
+
+def _guardar_ventas(ventas, detalles):
+    Venta.objects.bulk_create(ventas, batch_size=TAMANO_LOTE)
+    items, pagos = [], []
+    for venta, (items_venta, pagos_venta, tasa) in zip(ventas, detalles):
+        for producto, unidades, subtotal in items_venta:
+            items.append(ItemVenta(
+                venta=venta, producto=producto, cantidad=unidades,
+                subtotal_divisa=subtotal, subtotal_bs=(subtotal * tasa).quantize(CENTAVOS),
+            ))
+        for metodo, monto in pagos_venta:
+            pagos.append(PagoVenta(venta=venta, metodo_pago=metodo, monto_recibido=monto))
+    ItemVenta.objects.bulk_create(items, batch_size=TAMANO_LOTE)
+    PagoVenta.objects.bulk_create(pagos, batch_size=TAMANO_LOTE)
+    return len(items), len(pagos)
+
+
+def _con_fecha_historica(modelo, objetos, campos_por_objeto):
+    """
+    Inserta objetos con campos auto_now_add y luego les asigna su fecha histórica.
+
+    bulk_create siempre guarda la fecha actual en esos campos, así que se corrige
+    con un UPDATE por cada valor distinto.
+    """
+    modelo.objects.bulk_create(objetos, batch_size=TAMANO_LOTE)
+    grupos = {}
+    for objeto, campos in zip(objetos, campos_por_objeto):
+        grupos.setdefault(tuple(sorted(campos.items())), []).append(objeto.pk)
+    for campos, ids in grupos.items():
+        for inicio in range(0, len(ids), TAMANO_LOTE):
+            modelo.objects.filter(pk__in=ids[inicio:inicio + TAMANO_LOTE]).update(**dict(campos))
+
+
+@transaction.atomic
+def sembrar(dias=730, ventas_por_dia=120, semilla=2020, hasta=None):
+    """
+    Genera `dias` días de operación terminando en `hasta` (hoy por defecto).
+
+    Devuelve un diccionario con la cantidad de filas creadas por modelo. Con la
+    misma semilla se obtienen los mismos datos.
+    """
+    azar = random.Random(semilla)
+    hasta = hasta or timezone.localdate()
+    calendario = [hasta - timedelta(days=i) for i in range(dias - 1, -1, -1)]
+
+    usuarios = _usuarios()
+    productos = _productos()
+    metodos = list(MetodoDePago.objects.order_by('nombre'))
+    tasas = _tasas(calendario, azar)
+    creados = {'ventas': 0, 'items': 0, 'pagos': 0}
+
+    # 1. Ventas, ítems y pagos, por lotes de días para acotar la memoria
+    ventas, detalles = [], []
+    for dia in calendario:
+        cantidad = max(1, int(azar.gauss(ventas_por_dia, ventas_por_dia * 0.2)))
+        ventas_dia, detalles_dia = _ventas_del_dia(
+            dia, cantidad, tasas[dia], usuarios['trabajador'], productos, metodos, azar
+        )
+        ventas += ventas_dia
+        detalles += detalles_dia
+        if len(ventas) >= TAMANO_LOTE or dia == calendario[-1]:
+            items, pagos = _guardar_ventas(ventas, detalles)
+            creados['ventas'] += len(ventas)
+            creados['items'] += items
+            creados['pagos'] += pagos
+            ventas, detalles = [], []
+
+    # 2. Cisternas: una o dos llegadas por semana
+    cisternas = [
+        Cisterna(
+            fecha=dia, hora=time(azar.randint(6, 17), azar.choice([0, 15, 30, 45])),
+            volumen=Decimal(azar.choice([8000, 10000, 12000])), litros_disponibles=Decimal('0.00'),
+            usuario=usuarios['trabajador'],
+        )
+        for dia in calendario if azar.random() < 0.25
+    ]
+    Cisterna.objects.bulk_create(cisternas, batch_size=TAMANO_LOTE)
+    creados['cisternas'] = len(cisternas)
+
+    # 3. Deliveries y promociones (fecha y hora de registro históricas)
+    deliveries, fechas_deliveries = [], []
+    for dia in calendario:
+        for _ in range(azar.randint(0, 8)):
+            deliveries.append(Delivery(
+                nombre_cliente=f"{azar.choice(CLIENTES)} {azar.choice(APELLIDOS)}",
+                direccion=f"Calle {azar.randint(1, 40)}, casa {azar.randint(1, 200)}",
+                litros_entregados=Decimal(azar.choice([20, 40, 60, 100])),
+                encargado=usuarios['encargada'],
+            ))
+            fechas_deliveries.append({'fecha': dia, 'hora': time(azar.randint(8, 18))})
+    _con_fecha_historica(Delivery, deliveries, fechas_deliveries)
+    creados['deliveries'] = len(deliveries)
+
+    promociones, fechas_promociones = [], []
+    for dia in calendario:
+        if azar.random() < 0.5:
+            pagadas = azar.choice([5, 10, 20])
+            promociones.append(Promocion(
+                nombre=f"{azar.choice(CLIENTES)} {azar.choice(APELLIDOS)}",
+                telefono=f"0414{azar.randint(1000000, 9999999)}",
+                cantidad_divisa=Decimal(pagadas) * Decimal('1.50'),
+                botellas_pagadas=pagadas,
+                # Las más antiguas suelen estar completas; las recientes tienen botellas pendientes
+                botellas_retiradas=pagadas if azar.random() < 0.8 else azar.randint(0, pagadas - 1),
+                usuario=usuarios['trabajador'],
+            ))
+            fechas_promociones.append({'fecha_creacion': _momento(dia, azar)})
+    _con_fecha_historica(Promocion, promociones, fechas_promociones)
+    creados['promociones'] = len(promociones)
+
+    # 4. Resúmenes diarios y nivel de agua coherentes con lo generado
+    reconstruir_resumenes(calendario[0], calendario[-1])
+    NivelAgua.objects.update_or_create(pk=NIVEL_ID, defaults={'litros': Decimal('100000.00')})
+    return creados
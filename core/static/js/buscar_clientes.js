@@ -0,0 +1,61 @@
+// Sugerencias del buscador de clientes (promociones y deliveries).
+// El campo indica en data-url-sugerencias el endpoint de búsqueda y en
+// data-sugerencias la lista <ul> donde mostrar los resultados.
+const MINIMO_CARACTERES = 2;
+const ESPERA_MS = 250;
+
+function itemSugerencia(texto, detalle, url) {
+  const item = document.createElement('li');
+  const enlace = document.createElement('a');
+  enlace.href = url;
+  enlace.className = 'block px-3 py-2 hover:bg-gray-100';
+  enlace.textContent = texto;
+  const extra = document.createElement('span');
+  extra.className = 'text-gray-500 text-sm ml-2';
+  extra.textContent = detalle;
+  enlace.appendChild(extra);
+  item.appendChild(enlace);
+  return item;
+}
+
+function mostrarSugerencias(lista, data) {
+  lista.replaceChildren(
+    ...data.promociones.map(p => itemSugerencia(
+      p.nombre, `Promoción · ${p.telefono} · ${p.botellas_pendientes} pendientes`, p.url
+    )),
+    ...data.deliveries.map(d => itemSugerencia(
+      d.nombre_cliente, `Delivery · ${d.direccion} · ${d.fecha}`, d.url
+    ))
+  );
+  lista.classList.toggle('hidden', lista.children.length === 0);
+}
+
+document.querySelectorAll('[data-url-sugerencias]').forEach(campo => {
+  const lista = document.querySelector(campo.dataset.sugerencias);
+  let espera = null;
+  let ultima = null;
+
+  campo.addEventListener('input', () => {
+    clearTimeout(espera);
+    const q = campo.value.trim();
+    if (q.length < MINIMO_CARACTERES) {
+      lista.classList.add('hidden');
+      return;
+    }
+    espera = setTimeout(() => {
+      ultima = q;
+      fetch(`${campo.dataset.urlSugerencias}?q=${encodeURIComponent(q)}`)
+        .then(response => response.json())
+        .then(data => {
+          // Se descartan las respuestas de búsquedas ya reemplazadas
+          if (q === ultima) mostrarSugerencias(lista, data);
+        })
+        .catch(error => console.error('Error al buscar clientes:', error));
+    }, ESPERA_MS);
+  });
+
+  campo.addEventListener('blur', () => {
+    // Se espera a que termine el clic en una sugerencia
+    setTimeout(() => lista.classList.add('hidden'), 200);
+  });
+});
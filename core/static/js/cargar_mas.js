@@ -0,0 +1,26 @@
+// Botón "Cargar más" de los listados paginados.
+// El botón indica en data-url el endpoint (con los filtros actuales), en data-cursor
+// el cursor de la página siguiente y en data-destino el <tbody> donde agregar las filas.
+document.addEventListener('click', (event) => {
+  const boton = event.target.closest('.cargar-mas');
+  if (!boton) return;
+
+  boton.disabled = true;
+  const separador = boton.dataset.url.includes('?') ? '&' : '?';
+  fetch(`${boton.dataset.url}${separador}cursor=${encodeURIComponent(boton.dataset.cursor)}`)
+    .then(response => response.json())
+    .then(data => {
+      if (data.error) {
+        console.error('Error al cargar más registros:', data.error);
+        return;
+      }
+      document.querySelector(boton.dataset.destino).insertAdjacentHTML('beforeend', data.html);
+      if (data.siguiente) {
+        boton.dataset.cursor = data.siguiente;
+      } else {
+        boton.remove();
+      }
+    })
+    .catch(error => console.error('Error en la solicitud:', error))
+    .finally(() => { boton.disabled = false; });
+});
@@ -19,6 +19,37 @@ document.addEventListener('DOMContentLoaded', function() {
         rangoSelect.addEventListener('change', toggleFechasPersonalizadas);
     } 
 
+    // =========================================================
+    // 1.1. Progreso de las exportaciones en segundo plano
+    // =========================================================
+    function actualizarExportacion(fila) {
+        fetch(fila.dataset.urlEstado)
+            .then(response => response.json())
+            .then(data => {
+                const barra = fila.querySelector('.progress-bar');
+                barra.style.width = `${data.progreso}%`;
+                barra.textContent = `${data.progreso}%`;
+                fila.querySelector('.estado-exportacion').textContent =
+                    data.error ? `${data.estado_display}: ${data.error}` : data.estado_display;
+                fila.dataset.estado = data.estado;
+
+                if (data.url_descarga) {
+                    fila.querySelector('.descarga-exportacion').innerHTML =
+                        `<a href="${data.url_descarga}" class="btn btn-sm btn-success"><i class="fas fa-download"></i> Descargar</a>`;
+                }
+                if (data.estado === 'pendiente' || data.estado === 'procesando') {
+                    setTimeout(() => actualizarExportacion(fila), 3000);
+                }
+            })
+            .catch(error => console.error('Error al consultar la exportación:', error));
+    }
+
+    document.querySelectorAll('tr.exportacion').forEach(fila => {
+        if (fila.dataset.estado === 'pendiente' || fila.dataset.estado === 'procesando') {
+            setTimeout(() => actualizarExportacion(fila), 3000);
+        }
+    });
+
     // =========================================================
     // 2. Inicialización de Gráficos (Chart.js)
     // =========================================================
@@ -1,22 +1,14 @@
 document.addEventListener('DOMContentLoaded', () => {
-  // --- Lógica existente para el filtro de búsqueda ---
-  const searchInput = document.getElementById('searchDeliveries');
-  const rows = Array.from(document.querySelectorAll('.delivery-row'));
+  // La búsqueda de clientes se hace en el servidor (parámetro q y buscar_clientes.js)
 
-  if (searchInput) {
-    searchInput.addEventListener('input', () => {
-      const q = searchInput.value.trim().toLowerCase();
-      rows.forEach(row => {
-        row.style.display = row.innerText.toLowerCase().includes(q) ? '' : 'none';
-      });
-    });
-  }
+  // --- Lógica para los botones de eliminación ---
+  // Delegación en la tabla: también cubre las filas agregadas con "Cargar más"
+  const tablaDeliveries = document.getElementById('filas-deliveries');
 
-  // --- Nueva lógica para los botones de eliminación ---
-  const deleteButtons = document.querySelectorAll('.delete-btn');
-
-  deleteButtons.forEach(button => {
-    button.addEventListener('click', (event) => {
+  if (tablaDeliveries) {
+    tablaDeliveries.addEventListener('click', (event) => {
+      const button = event.target.closest('.delete-btn');
+      if (!button) return;
       // Previene la acción por defecto del botón (por si está dentro de un formulario)
       event.preventDefault();
 
@@ -50,7 +42,7 @@ document.addEventListener('DOMContentLoaded', () => {
         console.error('Error en la solicitud:', error);
       });
     });
-  });
+  }
 
   // Función auxiliar para obtener el token CSRF del navegador
   function getCookie(name) {
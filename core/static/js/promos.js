@@ -15,28 +15,34 @@ function getCookie(name) {
 
 const csrftoken = getCookie('csrftoken');
 
-function restarBotella(promoId) {
-    fetch(`/promos/restar/${promoId}/`, {
+function canjearBotellas(promoId) {
+    const row = document.getElementById(`promo-${promoId}`);
+    const campo = row.querySelector('.botellas-a-canjear');
+    const datos = new URLSearchParams({ botellas: campo.value });
+
+    fetch(row.dataset.urlCanje, {
         method: 'POST',
         headers: {
             'X-CSRFToken': csrftoken,
-            'Content-Type': 'application/json'
-        }
+            'Content-Type': 'application/x-www-form-urlencoded'
+        },
+        body: datos
     }).then(response => response.json())
       .then(data => {
           if (data.success) {
-              const row = document.getElementById(`promo-${promoId}`);
               // Actualizamos el número de botellas pendientes
               row.querySelector('.botellas-pendientes').textContent = data.botellas_restantes;
+              campo.max = data.botellas_restantes;
+              campo.value = 1;
               // Si no quedan botellas, eliminamos la fila
               if (data.botellas_restantes === 0) {
                   row.remove();
               }
           } else {
-              alert(data.error || "Error al restar botella");
+              alert(data.error || "Error al retirar las botellas");
           }
       }).catch(error => {
           console.error('Error:', error);
           alert('Hubo un problema al conectar con el servidor.');
       });
-}
\ No newline at end of file
+}
@@ -18,19 +18,15 @@ document.addEventListener('DOMContentLoaded', function() {
     const messageContainer = document.getElementById('message-container');
     
     // --- Carga y mapeo de datos del backend ---
-    const productosDataElement = document.getElementById('productos-data');
+    const catalogoElement = document.getElementById('catalogo-productos');
     const metodosPagoDataElement = document.getElementById('metodos-pago-data');
     const tasaActualElement = document.getElementById('tasa-actual-data');
 
     // Deserialización de los datos (Asegurando la robustez)
-    let productosData = [];
     let metodosPagoData = [];
     let tasaActual = 0;
 
     try {
-        if (productosDataElement && productosDataElement.textContent) {
-            productosData = JSON.parse(productosDataElement.textContent.trim() || '[]');
-        }
         if (metodosPagoDataElement && metodosPagoDataElement.textContent) {
             metodosPagoData = JSON.parse(metodosPagoDataElement.textContent.trim() || '[]');
         }
@@ -44,8 +40,67 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 
     const productosMap = new Map();
-    if (Array.isArray(productosData)) {
-        productosData.forEach(p => productosMap.set(String(p.codigo), p));
+    let catalogoCargado = false;
+
+    function cargarProductosEnMapa(productos) {
+        productosMap.clear();
+        if (Array.isArray(productos)) {
+            productos.forEach(p => productosMap.set(String(p.codigo), p));
+        }
+        catalogoCargado = true;
+    }
+
+    // --- Catálogo de productos ---
+    // El catálogo se guarda en localStorage junto con su versión. Si la versión de la
+    // página coincide, no hace falta pedirlo; si no, se descarga (el servidor responde
+    // 304 vía ETag cuando el navegador ya tiene la última versión en su caché HTTP).
+    const CLAVE_CATALOGO = 'wtp_catalogo_productos';
+
+    function leerCatalogoLocal() {
+        try {
+            return JSON.parse(localStorage.getItem(CLAVE_CATALOGO) || 'null');
+        } catch (e) {
+            return null;
+        }
+    }
+
+    function guardarCatalogoLocal(catalogo) {
+        try {
+            localStorage.setItem(CLAVE_CATALOGO, JSON.stringify(catalogo));
+        } catch (e) {
+            console.warn('No se pudo guardar el catálogo en localStorage:', e);
+        }
+    }
+
+    function cargarCatalogo() {
+        if (!catalogoElement) return;
+        const versionActual = catalogoElement.dataset.version;
+        const local = leerCatalogoLocal();
+        if (local && local.version === versionActual) {
+            cargarProductosEnMapa(local.productos);
+            return;
+        }
+
+        fetch(catalogoElement.dataset.url, { credentials: 'same-origin' })
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(catalogo => {
+                guardarCatalogoLocal(catalogo);
+                cargarProductosEnMapa(catalogo.productos);
+                renderItems();
+                actualizarTotales();
+            })
+            .catch(error => {
+                console.error('Error al cargar el catálogo de productos:', error);
+                if (local) {
+                    // Mejor un catálogo algo desactualizado que ninguno; el servidor valida los precios.
+                    cargarProductosEnMapa(local.productos);
+                } else {
+                    showMessage('Error crítico al cargar el catálogo de productos. Recargue la página.', 'danger');
+                }
+            });
     }
     
     const metodosPagoMap = new Map();
@@ -271,6 +326,11 @@ document.addEventListener('DOMContentLoaded', function() {
                 return; 
             }
     
+            if (!catalogoCargado) {
+                showMessage('El catálogo de productos aún se está cargando. Intente de nuevo en un momento.', 'warning');
+                return;
+            }
+
             const producto = productosMap.get(String(codigo));
             if (!producto) {
                 showMessage('Producto no encontrado.', 'danger');
@@ -331,6 +391,8 @@ document.addEventListener('DOMContentLoaded', function() {
         addPagoBtn.addEventListener('click', crearCampoPago);
     }
 
+    cargarCatalogo();
+
     // Inicialización: Crear un campo de pago si no existe
     if (pagosContainer && pagosContainer.children.length === 0) {
         crearCampoPago();
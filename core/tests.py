@@ -1,7 +1,1639 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection, connections
+from django.db.backends.utils import CursorWrapper
+from django.db.models import F, QuerySet, Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings, tag
+from django.test.signals import template_rendered
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+from prometheus_client import REGISTRY
+
+from .models import (
+    ArchivoVentas, Cisterna, Delivery, ExportacionVentas, ImportacionVentas, ItemVenta, MetodoDePago, NivelAgua,
+    PagoVenta, Producto, Promocion, RedencionPromocion, ResumenDiario, ResumenDiarioMetodo, ResumenDiarioProducto, ResumenMensualMetodo,
+    ResumenMensualProducto, TasaCambio, User, Venta
+)
+from .autenticacion import clave_usuario
+from .catalogos import obtener_metodos_pago, obtener_tasa_actual, version_catalogo_productos
+from . import comparativas
+from . import exportaciones
+from . import importaciones
+from .concurrencia import en_paralelo
+from .decorators import role_required
+from . import busqueda
+from .busqueda import buscar
+from .instrumentacion import Medicion
+from .views.promos import _promociones_pendientes
+from .views_main import control_manual_async_view, control_manual_view, dashboard_async_view, dashboard_view
+from .paginacion import TAMANO_PAGINA, _codificar_cursor, _despues_de, paginar
+from .nivel_agua import descontar_litros, litros_disponibles
+from .sintetico import sembrar
+from .utils import inicio_del_dia, rango_de_dias
+
+# Las mediciones de tiempo dependen de la máquina: solo corren con WTP_BENCHMARK=1
+MEDIR_RENDIMIENTO = bool(os.environ.get('WTP_BENCHMARK'))
+solo_benchmark = skipUnless(MEDIR_RENDIMIENTO, "Medición de rendimiento: defina WTP_BENCHMARK=1 para ejecutarla.")
+
+# Las pruebas usan una caché en memoria del proceso: sus cache.clear() no borran la
+# caché ni las sesiones de la instalación local. Se activa por módulo para que valga
+# con cualquier forma de correr las pruebas (manage.py test, python -m django, pytest).
+_cache_de_pruebas = override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+
+
+# Las solicitudes lentas no se imprimen durante las pruebas (se verifican con assertLogs)
+_log_rendimiento = logging.getLogger('core.rendimiento')
+
+
+def setUpModule():
+    _cache_de_pruebas.enable()
+    _log_rendimiento.setLevel(logging.ERROR)
+
+
+def tearDownModule():
+    _cache_de_pruebas.disable()
+    _log_rendimiento.setLevel(settings.LOGGING['loggers']['core.rendimiento']['level'])
+
+
+def plan_de_consulta(queryset):
+    """
+    EXPLAIN de una consulta. En PostgreSQL se desactiva el seq scan para que las tablas
+    pequeñas de las pruebas no oculten si existe un índice utilizable.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    return queryset.explain()
+
 
 class CoreViewsTests(TestCase):
     def test_dashboard_view(self):
         response = self.client.get(reverse('dashboard'))
         self.assertEqual(response.status_code, 200)
+
+
+class VentasTestMixin:
+    """Datos mínimos para registrar ventas desde el punto de venta."""
+    ROL = 'trabajador'
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('cajero', password='clave-segura-123', rol=self.ROL)
+        self.client.force_login(self.usuario)
+        TasaCambio.objects.create(fecha=timezone.localdate(), tasa_bsd=Decimal('40.00'))
+        self.agua = Producto.objects.create(codigo='001', nombre='Agua por litro', precio_divisa=Decimal('0.10'), tipo='agua_litros')
+        self.botella = Producto.objects.create(codigo='002', nombre='Botella 20L', precio_divisa=Decimal('2.00'), tipo='botella_20l')
+        # Los métodos por defecto vienen de una migración, salvo tras el vaciado de TransactionTestCase
+        self.divisa, _ = MetodoDePago.objects.get_or_create(nombre='Divisa $', defaults={'es_bolivares': False})
+        self.pago_movil, _ = MetodoDePago.objects.get_or_create(nombre='Pago Móvil', defaults={'es_bolivares': True})
+        NivelAgua.objects.update_or_create(pk=1, defaults={'litros': Decimal('1000.00')})
+
+    def registrar_venta(self, items, pagos, client=None):
+        return (client or self.client).post(reverse('ventas'), {
+            'items': json.dumps(items),
+            'pagos': json.dumps(pagos),
+        })
+
+
+class ResumenDiarioTests(VentasTestMixin, TestCase):
+    ROL = 'dueno'
+
+    def test_venta_actualiza_resumen_del_dia(self):
+        self.registrar_venta(
+            [{'codigo': '001', 'cantidad': 40}, {'codigo': '002', 'cantidad': 1}],
+            [{'metodo_pago': 'Divisa $', 'monto': 5}, {'metodo_pago': 'Pago Móvil', 'monto': 40}],
+        )
+
+        resumen = ResumenDiario.objects.get(fecha=timezone.localdate())
+        self.assertEqual(resumen.cantidad_ventas, 1)
+        self.assertEqual(resumen.total_divisa, Decimal('6.00'))
+        self.assertEqual(resumen.total_bs, Decimal('240.00'))
+        self.assertEqual(resumen.litros_vendidos, Decimal('40.00'))
+        self.assertEqual(
+            dict(ResumenDiarioMetodo.objects.values_list('metodo_pago__nombre', 'total')),
+            {'Divisa $': Decimal('5.00'), 'Pago Móvil': Decimal('40.00')},
+        )
+
+    def test_reconstruir_resumenes_coincide_con_incremental(self):
+        self.registrar_venta([{'codigo': '001', 'cantidad': 10}], [{'metodo_pago': 'Divisa $', 'monto': 1}])
+        self.registrar_venta([{'codigo': '002', 'cantidad': 2}], [{'metodo_pago': 'Pago Móvil', 'monto': 160}])
+        incremental = list(ResumenDiario.objects.values_list('fecha', 'cantidad_ventas', 'total_divisa', 'total_bs', 'litros_vendidos'))
+        por_metodo = sorted(ResumenDiarioMetodo.objects.values_list('fecha', 'metodo_pago', 'total'))
+        por_producto = sorted(ResumenDiarioProducto.objects.values_list('fecha', 'producto', 'cantidad', 'total_divisa', 'total_bs'))
+
+        ResumenDiario.objects.all().delete()
+        ResumenDiarioMetodo.objects.all().delete()
+        ResumenDiarioProducto.objects.all().delete()
+        call_command('reconstruir_resumenes', stdout=StringIO())
+
+        self.assertEqual(
+            list(ResumenDiario.objects.values_list('fecha', 'cantidad_ventas', 'total_divisa', 'total_bs', 'litros_vendidos')),
+            incremental,
+        )
+        self.assertEqual(sorted(ResumenDiarioMetodo.objects.values_list('fecha', 'metodo_pago', 'total')), por_metodo)
+        self.assertEqual(
+            sorted(ResumenDiarioProducto.objects.values_list('fecha', 'producto', 'cantidad', 'total_divisa', 'total_bs')),
+            por_producto,
+        )
+        self.assertEqual(Venta.objects.count(), 2)
+        self.assertEqual(ItemVenta.objects.count(), 2)
+        self.assertEqual(PagoVenta.objects.count(), 2)
+
+    def test_control_manual_lee_del_resumen(self):
+        self.registrar_venta([{'codigo': '002', 'cantidad': 3}], [{'metodo_pago': 'Divisa $', 'monto': 6}])
+
+        response = self.client.get(reverse('control_manual'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_ventas_divisa'], Decimal('6.00'))
+        self.assertEqual(list(response.context['recaudacion_por_metodo']), [
+            {'metodo_pago__nombre': 'Divisa $', 'total_monto': Decimal('6.00')},
+        ])
+
+
+class ComparacionPeriodosTests(VentasTestMixin, TestCase):
+    ROL = 'dueno'
+
+    def test_periodos_equivalentes(self):
+        self.assertEqual(comparativas.periodos_de_comparacion(date(2024, 3, 1), date(2024, 3, 31), 'mensual'), {
+            comparativas.ACTUAL: (date(2024, 3, 1), date(2024, 3, 31)),
+            comparativas.ANTERIOR: (date(2024, 2, 1), date(2024, 2, 29)),
+            comparativas.ANIO_ANTERIOR: (date(2023, 3, 1), date(2023, 3, 31)),
+        })
+        semana = comparativas.periodos_de_comparacion(date(2024, 2, 23), date(2024, 2, 29), 'semanal')
+        self.assertEqual(semana[comparativas.ANTERIOR], (date(2024, 2, 16), date(2024, 2, 22)))
+        self.assertEqual(semana[comparativas.ANIO_ANTERIOR], (date(2023, 2, 23), date(2023, 2, 28)))
+
+    def test_control_manual_compara_con_periodos_anteriores(self):
+        hoy = timezone.localdate()
+        # Hoy: 2 botellas; hace 10 días: 1 botella y 10 litros; hace un año: 1 botella
+        ventas = [
+            (hoy, [{'codigo': '002', 'cantidad': 2}], 4),
+            (hoy - timedelta(days=10), [{'codigo': '002', 'cantidad': 1}, {'codigo': '001', 'cantidad': 10}], 3),
+            (comparativas._restar_anio(hoy), [{'codigo': '002', 'cantidad': 1}], 2),
+        ]
+        for dia, items, monto in ventas:
+            self.registrar_venta(items, [{'metodo_pago': 'Divisa $', 'monto': monto}])
+            Venta.objects.filter(pk=Venta.objects.latest('id').pk).update(fecha=inicio_del_dia(dia) + timedelta(hours=12))
+        call_command('reconstruir_resumenes', stdout=StringIO())
+
+        url, rango = reverse('control_manual'), {'rango': 'personalizado', 'fecha_inicio': str(hoy - timedelta(days=6)),
+                                                 'fecha_fin': str(hoy)}
+        self.client.get(url, rango)  # calienta la caché de la sesión
+        # Evolución diaria, totales, métodos, productos y exportaciones: una consulta cada uno
+        with self.assertNumQueries(5):
+            response = self.client.get(url, rango)
+
+        divisa = dict(response.context['comparacion_totales'])['Total Venta ($)']
+        self.assertEqual(
+            (divisa['actual'], divisa['anterior'], divisa['anio_anterior']),
+            (Decimal('4.00'), Decimal('3.00'), Decimal('2.00')),
+        )
+        self.assertAlmostEqual(divisa['variacion_anterior'], 100 / 3)
+        self.assertEqual(divisa['variacion_anio_anterior'], 100.0)
+        self.assertEqual(response.context['total_ventas_divisa'], Decimal('4.00'))
+
+        productos = {fila['nombre']: fila['cantidad'] for fila in response.context['comparacion_productos']}
+        self.assertEqual(productos['Botella 20L']['actual'], Decimal('2.00'))
+        self.assertEqual(productos['Agua por litro']['anterior'], Decimal('10.00'))
+        self.assertIsNone(productos['Agua por litro']['variacion_anio_anterior'])
+        self.assertEqual(
+            [(fila['nombre'], fila['actual'], fila['anterior']) for fila in response.context['comparacion_metodos']],
+            [('Divisa $', Decimal('4.00'), Decimal('3.00'))],
+        )
+
+
+class DashboardTests(VentasTestMixin, TestCase):
+    def consultas_dashboard(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(consultas)
+
+    def test_metodos_nuevos_aparecen_sin_consultas_extra(self):
+        self.registrar_venta([{'codigo': '002', 'cantidad': 1}], [{'metodo_pago': 'Pago Móvil', 'monto': 80}])
+        _, consultas_iniciales = self.consultas_dashboard()
+
+        MetodoDePago.objects.create(nombre='Zelle', es_bolivares=False)
+        MetodoDePago.objects.create(nombre='Biopago', es_bolivares=True)
+        response, consultas = self.consultas_dashboard()
+
+        self.assertEqual(consultas, consultas_iniciales)
+        totales = {m['nombre']: m['total_hoy'] for m in response.context['totales_por_metodo']}
+        self.assertEqual(totales['Pago Móvil'], Decimal('80.00'))
+        self.assertEqual(totales['Zelle'], Decimal('0.00'))
+        self.assertEqual(response.context['total_recaudado_bs'], Decimal('80.00'))
+        self.assertEqual(response.context['total_recaudado_divisa'], Decimal('0.00'))
+
+
+class RegistroVentaTests(VentasTestMixin, TestCase):
+    def consultas_venta(self, items, pagos):
+        with CaptureQueriesContext(connection) as consultas:
+            self.registrar_venta(items, pagos)
+        return len(consultas)
+
+    def test_consultas_no_dependen_del_tamano_del_carrito(self):
+        productos = [
+            Producto.objects.create(codigo=f'1{i:02d}', nombre=f'Artículo {i}', precio_divisa=Decimal('1.00'), tipo='articulos_extra')
+            for i in range(10)
+        ]
+        # La primera venta del día crea las filas del resumen diario
+        self.registrar_venta([{'codigo': '002', 'cantidad': 1}], [{'metodo_pago': 'Divisa $', 'monto': 2}])
+        pequena = self.consultas_venta(
+            [{'codigo': productos[0].codigo, 'cantidad': 1}],
+            [{'metodo_pago': 'Divisa $', 'monto': 1}],
+        )
+        grande = self.consultas_venta(
+            [{'codigo': p.codigo, 'cantidad': 1} for p in productos],
+            [{'metodo_pago': 'Divisa $', 'monto': 4}, {'metodo_pago': 'Divisa $', 'monto': 6}],
+        )
+
+        self.assertEqual(pequena, grande)
+        self.assertEqual(ItemVenta.objects.count(), 12)
+        self.assertEqual(PagoVenta.objects.count(), 4)
+
+    def test_codigos_desconocidos_se_listan_juntos(self):
+        response = self.registrar_venta(
+            [{'codigo': '002', 'cantidad': 1}, {'codigo': 'X9', 'cantidad': 1}, {'codigo': 'A1', 'cantidad': 1}],
+            [{'metodo_pago': 'Divisa $', 'monto': 2}],
+        )
+
+        self.assertRedirects(response, reverse('ventas'), fetch_redirect_response=False)
+        mensajes = [str(m) for m in get_messages(response.wsgi_request)]
+        self.assertEqual(mensajes, ['Productos no encontrados: A1, X9.'])
+        self.assertFalse(Venta.objects.exists())
+
+
+class NivelAguaTests(VentasTestMixin, TestCase):
+    def test_descuento_condicional(self):
+        self.assertEqual(descontar_litros(Decimal('999.50')), Decimal('0.50'))
+        self.assertIsNone(descontar_litros(Decimal('1.00')))
+        self.assertEqual(litros_disponibles(), Decimal('0.50'))
+
+    def test_venta_sin_agua_suficiente_no_se_registra(self):
+        NivelAgua.objects.filter(pk=1).update(litros=Decimal('5.00'))
+
+        self.registrar_venta([{'codigo': '001', 'cantidad': 10}], [{'metodo_pago': 'Divisa $', 'monto': 1}])
+
+        self.assertFalse(Venta.objects.exists())
+        self.assertEqual(litros_disponibles(), Decimal('5.00'))
+
+    def test_llenado_de_cisterna_suma_al_nivel(self):
+        self.client.post(reverse('cisternas'), {'fecha': '2025-10-01', 'hora': '07:30', 'volumen': '500'})
+
+        cisterna = Cisterna.objects.get()
+        self.assertEqual(cisterna.litros_disponibles, Decimal('1500.00'))
+        self.assertEqual(litros_disponibles(), Decimal('1500.00'))
+
+    def test_restar_botella_descuenta_del_nivel(self):
+        promo = Promocion.objects.create(nombre='Ana', telefono='0414', cantidad_divisa=Decimal('10.00'), botellas_pagadas=2)
+
+        response = self.client.post(reverse('restar_botella', args=[promo.pk]))
+
+        self.assertEqual(response.json(), {'success': True, 'botellas_restantes': 1})
+        self.assertEqual(litros_disponibles(), Decimal('980.00'))
+
+
+class PromocionesTests(VentasTestMixin, TestCase):
+    def crear(self, nombre, telefono, pagadas=2, retiradas=0):
+        return Promocion.objects.create(
+            nombre=nombre, telefono=telefono, cantidad_divisa=Decimal('10.00'),
+            botellas_pagadas=pagadas, botellas_retiradas=retiradas,
+        )
+
+    def test_busqueda_por_telefono_o_nombre(self):
+        ana = self.crear('Ana Pérez', '04141234567')
+        self.crear('Luis Díaz', '04247654321')
+        self.crear('Ana Completa', '04141230000', pagadas=1, retiradas=1)
+
+        for busqueda in ('0414-123', 'ana', 'Pérez'):
+            with self.subTest(busqueda=busqueda):
+                response = self.client.get(reverse('promos'), {'q': busqueda})
+                self.assertEqual([promo.pk for promo in response.context['promociones']], [ana.pk])
+
+        self.assertEqual(len(self.client.get(reverse('promos')).context['promociones']), 2)
+
+    def test_no_retira_mas_botellas_que_las_pagadas(self):
+        promo = self.crear('Ana', '0414', pagadas=1)
+
+        primera = self.client.post(reverse('restar_botella', args=[promo.pk]))
+        segunda = self.client.post(reverse('restar_botella', args=[promo.pk]))
+
+        self.assertEqual(primera.json(), {'success': True, 'botellas_restantes': 0})
+        self.assertEqual(segunda.json(), {'success': False, 'error': 'No hay botellas pendientes'})
+        promo.refresh_from_db()
+        self.assertEqual(promo.botellas_retiradas, 1)
+        self.assertEqual(litros_disponibles(), Decimal('980.00'))
+        self.assertEqual(self.client.post(reverse('restar_botella', args=[promo.pk + 1])).status_code, 404)
+
+    def test_canje_de_varias_botellas_en_una_sentencia(self):
+        promo = self.crear('Ana', '0414', pagadas=5)
+        url = reverse('canjear_botellas', args=[promo.pk])
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(url, {'botellas': 3})
+
+        self.assertEqual(response.json(), {'success': True, 'botellas_restantes': 2})
+        self.assertEqual(litros_disponibles(), Decimal('940.00'))
+        # La promoción se actualiza y se lee en el mismo UPDATE ... RETURNING
+        promociones = [q['sql'] for q in consultas if 'core_promocion' in q['sql']]
+        self.assertEqual(len(promociones), 1)
+        self.assertTrue(promociones[0].startswith('UPDATE'))
+
+        response = self.client.post(url, {'botellas': 3})
+        self.assertEqual(response.json(), {'success': False, 'error': 'Solo quedan 2 botellas pendientes.'})
+        self.assertEqual(self.client.post(url, {'botellas': 'x'}).status_code, 400)
+        promo.refresh_from_db()
+        self.assertEqual(promo.botellas_retiradas, 3)
+        self.assertEqual(litros_disponibles(), Decimal('940.00'))
+
+    def test_sin_litros_la_botella_sigue_pendiente(self):
+        NivelAgua.objects.filter(pk=1).update(litros=Decimal('10.00'))
+        promo = self.crear('Ana', '0414')
+
+        response = self.client.post(reverse('restar_botella', args=[promo.pk]))
+
+        self.assertFalse(response.json()['success'])
+        promo.refresh_from_db()
+        self.assertEqual(promo.botellas_retiradas, 0)
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(RedencionPromocion.objects.exists())
+
+    def test_registro_y_retiro_quedan_en_el_historial_de_la_promocion(self):
+        response = self.client.post(reverse('registrar_promocion'), {
+            'nombre': 'Ana', 'telefono': '0414', 'cantidad_divisa': '10.00', 'botellas_pagadas': 4,
+        })
+        self.assertRedirects(response, reverse('promos'))
+        promo = Promocion.objects.get()
+        self.client.post(reverse('canjear_botellas', args=[promo.pk]), {'botellas': 3})
+
+        self.assertEqual(
+            list(promo.redenciones.order_by('id').values_list('tipo', 'botellas', 'litros', 'usuario')),
+            [
+                (RedencionPromocion.REGISTRO, 4, Decimal('0.00'), self.usuario.pk),
+                (RedencionPromocion.RETIRO, 3, Decimal('60.00'), self.usuario.pk),
+            ],
+        )
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(ResumenDiario.objects.exists())
+
+    def test_migracion_mueve_las_ventas_de_promocion(self):
+        migracion = importlib.import_module('core.migrations.0015_migrar_ventas_promocion')
+        self.registrar_venta([{'codigo': '001', 'cantidad': 10}], [{'metodo_pago': 'Divisa $', 'monto': 1}])
+        for _ in range(3):
+            Venta.objects.create(usuario=self.usuario, tipo_venta='Promocion')
+        ResumenDiario.objects.update(cantidad_ventas=F('cantidad_ventas') + 3)
+
+        with mock.patch.object(migracion, 'TAMANO_LOTE', 2):
+            migracion.mover_ventas_promocion(apps, None)
+
+        self.assertEqual(Venta.objects.get().tipo_venta, 'Normal')
+        self.assertEqual(RedencionPromocion.objects.filter(tipo=RedencionPromocion.HISTORICO).count(), 3)
+        self.assertEqual(ResumenDiario.objects.get().cantidad_ventas, 1)
+
+
+class BusquedaClientesTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('encargada', password='clave-segura-123', rol='encargada')
+        self.client.force_login(self.usuario)
+        self.ana = Promocion.objects.create(
+            nombre='Ana Pérez', telefono='0414-123 4567', cantidad_divisa=Decimal('10.00'), botellas_pagadas=2,
+        )
+        self.luis = Promocion.objects.create(
+            nombre='Luis Díaz', telefono='04247654321', cantidad_divisa=Decimal('10.00'), botellas_pagadas=1,
+        )
+        self.delivery = Delivery.objects.create(
+            nombre_cliente='Ana Pérez', direccion='Avenida Bolívar 12', litros_entregados=Decimal('40.00'),
+        )
+
+    def promociones(self, busqueda):
+        return list(buscar(Promocion.objects.order_by('id'), busqueda))
+
+    def test_prefijos_sin_acentos_ni_mayusculas(self):
+        for busqueda in ('per', 'ANA PEREZ', 'pérez an', '0414123', '0414-1234', '+58 0414'):
+            with self.subTest(busqueda=busqueda):
+                esperado = [] if busqueda == '+58 0414' else [self.ana]
+                self.assertEqual(self.promociones(busqueda), esperado)
+        self.assertEqual(list(buscar(Delivery.objects.all(), 'boliv')), [self.delivery])
+        self.assertEqual(self.promociones('  '), [self.ana, self.luis])
+
+    def test_el_indice_sigue_los_cambios(self):
+        self.ana.nombre = 'Ana Gómez'
+        self.ana.save()
+        Promocion.objects.filter(pk=self.luis.pk).update(botellas_retiradas=1)
+        self.assertEqual(self.promociones('perez'), [])
+        self.assertEqual(self.promociones('gomez'), [self.ana])
+        self.assertEqual(self.promociones('luis'), [self.luis])
+
+        self.ana.delete()
+        self.assertEqual(self.promociones('ana'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', "Triggers de FTS5 solo en SQLite")
+    def test_migrate_repara_triggers_perdidos(self):
+        # Así queda la base tras una migración que reconstruye core_promocion en SQLite
+        self.assertEqual(busqueda.reparar_indices_sqlite(), [])
+        with connection.cursor() as cursor:
+            for sufijo in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER core_promocion_fts_{sufijo}')
+        Promocion.objects.filter(pk=self.luis.pk).update(nombre='Luis Gómez')
+        self.assertEqual(self.promociones('gomez'), [])
+
+        emit_post_migrate_signal(0, False, 'default')
+
+        self.assertEqual(self.promociones('gomez'), [self.luis])
+        self.assertEqual(self.promociones('diaz'), [])
+        nueva = Promocion.objects.create(nombre='Rosa', telefono='0416', cantidad_divisa=Decimal('5.00'))
+        self.assertEqual(self.promociones('rosa'), [nueva])
+
+    def test_sugerencias_de_promociones_y_deliveries(self):
+        url = reverse('buscar_clientes')
+
+        datos = self.client.get(url, {'q': 'ana'}).json()
+        self.assertEqual([p['id'] for p in datos['promociones']], [self.ana.pk])
+        self.assertEqual(datos['promociones'][0]['botellas_pendientes'], 2)
+        self.assertEqual([d['id'] for d in datos['deliveries']], [self.delivery.pk])
+        self.assertEqual(self.client.get(url, {'q': 'a'}).json(), {'promociones': [], 'deliveries': []})
+
+        # Cualquier usuario con sesión entra a deliveries, así que todos ven sus sugerencias
+        User.objects.filter(pk=self.usuario.pk).update(rol='trabajador')
+        cache.clear()
+        datos = self.client.get(url, {'q': 'ana'}).json()
+        self.assertEqual((len(datos['promociones']), len(datos['deliveries'])), (1, 1))
+
+    def test_listado_de_deliveries_filtra_por_busqueda(self):
+        Delivery.objects.create(nombre_cliente='Luis', direccion='Calle 5', litros_entregados=Decimal('20.00'))
+
+        response = self.client.get(reverse('deliveries'), {'q': 'avenida'})
+
+        self.assertEqual([d.pk for d in response.context['deliveries']], [self.delivery.pk])
+
+
+class VentasConcurrentesTests(VentasTestMixin, TransactionTestCase):
+    """Dispara muchas ventas en paralelo contra la misma cisterna."""
+
+    VENTAS = 24
+    LITROS_POR_VENTA = 10
+
+    def test_ventas_paralelas_no_sobrevenden_agua(self):
+        NivelAgua.objects.filter(pk=1).update(litros=Decimal('100.00'))
+        barrera = threading.Barrier(self.VENTAS)
+        errores = []
+
+        def vender():
+            try:
+                client = self.client_class()
+                client.force_login(self.usuario)
+                barrera.wait()
+                self.registrar_venta(
+                    [{'codigo': '001', 'cantidad': self.LITROS_POR_VENTA}],
+                    [{'metodo_pago': 'Divisa $', 'monto': 1}],
+                    client=client,
+                )
+            except Exception as exc:
+                errores.append(exc)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=vender) for _ in range(self.VENTAS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(Venta.objects.count(), 10)
+        self.assertEqual(litros_disponibles(), Decimal('0.00'))
+        self.assertEqual(ResumenDiario.objects.get().litros_vendidos, Decimal('100.00'))
+
+
+class RangoDeFechasTests(VentasTestMixin, TestCase):
+    def test_ventas_de_hoy_respetan_el_dia_local(self):
+        hoy = timezone.localdate()
+        Venta.objects.create(usuario=self.usuario, fecha=inicio_del_dia(hoy) - timedelta(minutes=1), total_venta_divisa=Decimal('7.00'))
+        Venta.objects.create(usuario=self.usuario, fecha=inicio_del_dia(hoy) + timedelta(minutes=30), total_venta_divisa=Decimal('3.00'))
+
+        response = self.client.get(reverse('ventas'))
+
+        self.assertEqual(response.context['total_divisas_hoy'], Decimal('3.00'))
+
+    def test_rango_usa_el_indice_de_fecha(self):
+        inicio, fin = rango_de_dias(timezone.localdate() - timedelta(days=365), timezone.localdate())
+        plan = plan_de_consulta(Venta.objects.filter(fecha__gte=inicio, fecha__lt=fin))
+
+        self.assertIn('core_venta_fecha', plan)
+        self.assertNotIn('SCAN core_venta', plan)
+
+
+class IndicesTests(TestCase):
+    """Cada consulta frecuente de las vistas debe resolverse con un índice (SQLite y PostgreSQL)."""
+
+    def assertUsaIndice(self, queryset, indice=None):
+        plan = plan_de_consulta(queryset)
+        if connection.vendor == 'sqlite':
+            self.assertRegex(plan, r'USING (COVERING )?INDEX|USING INTEGER PRIMARY KEY')
+        elif connection.vendor == 'postgresql':
+            self.assertRegex(plan, r'Index Scan|Index Only Scan|Bitmap Index Scan')
+        if indice:
+            self.assertIn(indice, plan)
+
+    def test_cisternas_por_fecha_y_hora(self):
+        self.assertUsaIndice(Cisterna.objects.order_by('-fecha', '-hora'), 'cisterna_fecha_hora_idx')
+
+    def test_tasa_mas_reciente(self):
+        self.assertUsaIndice(TasaCambio.objects.order_by('-fecha')[:1])
+
+    def test_items_de_venta_por_tipo_de_producto(self):
+        self.assertUsaIndice(
+            ItemVenta.objects.filter(venta_id__in=[1, 2, 3], producto__tipo='agua_litros').values('cantidad')
+        )
+
+    def test_pagos_agrupados_por_metodo(self):
+        self.assertUsaIndice(
+            PagoVenta.objects.filter(venta_id__in=[1, 2, 3]).values('venta', 'metodo_pago').annotate(total=Sum('monto_recibido')),
+            'pagoventa_venta_metodo_idx',
+        )
+
+    def test_deliveries_por_fecha(self):
+        self.assertUsaIndice(Delivery.objects.order_by('-fecha', '-hora'), 'delivery_fecha_hora_idx')
+
+    def test_pagina_siguiente_de_cisternas(self):
+        # La página que sigue al cursor se lee desde el índice, sin ordenar todo el histórico
+        cursor = _despues_de(('fecha', 'hora', 'id'), [timezone.localdate(), '09:00', 10])
+        consulta = Cisterna.objects.filter(cursor).order_by('-fecha', '-hora', '-id')[:TAMANO_PAGINA]
+        self.assertUsaIndice(consulta, 'cisterna_fecha_hora_idx')
+        self.assertNotIn('TEMP B-TREE', plan_de_consulta(consulta).upper())
+
+    def test_promociones_pendientes(self):
+        self.assertUsaIndice(
+            Promocion.objects.filter(botellas_pagadas__gt=F('botellas_retiradas')).order_by('-id'),
+            'promocion_pendiente_idx',
+        )
+
+    def indice_de_busqueda(self, tabla):
+        return f'{tabla}_fts' if connection.vendor == 'sqlite' else f'{tabla}_busqueda_idx'
+
+    def test_busqueda_de_promociones_pendientes(self):
+        # La búsqueda parte del índice de texto y lee cada promoción por su id
+        request = RequestFactory().get(reverse('promos'), {'q': 'Ana'})
+        self.assertUsaIndice(
+            _promociones_pendientes(request).order_by('-id'), self.indice_de_busqueda('core_promocion')
+        )
+
+    def test_busqueda_de_deliveries(self):
+        self.assertUsaIndice(
+            buscar(Delivery.objects.order_by('-id'), 'avenida'), self.indice_de_busqueda('core_delivery')
+        )
+
+
+class CatalogosEnCacheTests(VentasTestMixin, TestCase):
+    def test_ventas_no_consulta_tasa_ni_metodos_con_cache_caliente(self):
+        self.client.get(reverse('ventas'))
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('ventas'))
+
+        tablas = ' '.join(q['sql'] for q in consultas)
+        self.assertNotIn('core_tasacambio', tablas)
+        self.assertNotIn('core_metododepago', tablas)
+
+    def test_guardar_invalida_la_cache(self):
+        self.assertEqual(obtener_tasa_actual().tasa_bsd, Decimal('40.00'))
+        nombres = {m.nombre for m in obtener_metodos_pago()}
+
+        TasaCambio.objects.create(fecha=timezone.localdate() + timedelta(days=1), tasa_bsd=Decimal('41.50'))
+        MetodoDePago.objects.create(nombre='Zelle')
+
+        self.assertEqual(obtener_tasa_actual().tasa_bsd, Decimal('41.50'))
+        self.assertEqual({m.nombre for m in obtener_metodos_pago()} - nombres, {'Zelle'})
+
+
+class CatalogoProductosTests(VentasTestMixin, TestCase):
+    def test_etag_y_304_mientras_no_cambie(self):
+        url = reverse('catalogo_productos')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['codigo'] for p in response.json()['productos']], ['001', '002'])
+        etag = response['ETag']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.botella.precio_divisa = Decimal('2.50')
+        self.botella.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_eliminar_producto_cambia_la_version(self):
+        version = version_catalogo_productos()
+        Producto.objects.create(codigo='003', nombre='Tapa', precio_divisa=Decimal('0.50'), tipo='articulos_extra').delete()
+        self.assertEqual(version_catalogo_productos(), version)
+        self.agua.delete()
+        self.assertNotEqual(version_catalogo_productos(), version)
+
+    def test_pagina_de_ventas_no_incrusta_el_catalogo(self):
+        response = self.client.get(reverse('ventas'))
+        self.assertNotContains(response, 'Botella 20L')
+        self.assertContains(response, f'data-version="{version_catalogo_productos()}"')
+
+
+class ExportacionCsvTests(VentasTestMixin, TestCase):
+    ROL = 'dueno'
+
+    LINEAS = 500_000
+    LINEAS_POR_VENTA = 10
+    # Límite de memoria (en bytes) para generar el archivo completo
+    LIMITE_MEMORIA = 16 * 1024 * 1024
+
+    def crear_lineas(self, cantidad):
+        ahora = timezone.now()
+        Venta.objects.bulk_create(
+            [Venta(usuario=self.usuario, fecha=ahora, total_venta_divisa=Decimal('20.00'), total_venta_bs=Decimal('800.00'))
+             for _ in range(cantidad // self.LINEAS_POR_VENTA)],
+            batch_size=5000,
+        )
+        # Los ítems se copian dentro del motor (INSERT ... SELECT), una pasada por línea de cada venta
+        quote = connection.ops.quote_name
+        columnas = ', '.join(quote(c) for c in ('venta_id', 'producto_id', 'cantidad', 'subtotal_divisa', 'subtotal_bs'))
+        with connection.cursor() as cursor:
+            for _ in range(self.LINEAS_POR_VENTA):
+                cursor.execute(
+                    f"INSERT INTO {quote(ItemVenta._meta.db_table)} ({columnas}) "
+                    f"SELECT {quote('id')}, %s, 1, 2, 80 FROM {quote(Venta._meta.db_table)}",
+                    [self.botella.pk],
+                )
+
+    def exportar(self):
+        return self.client.get(reverse('exportar_ventas_a_excel'), {'rango': 'semanal'})
+
+    def test_contenido_del_csv(self):
+        self.registrar_venta([{'codigo': '002', 'cantidad': 2}], [{'metodo_pago': 'Divisa $', 'monto': 4}])
+
+        response = self.exportar()
+
+        self.assertTrue(response.streaming)
+        lineas = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lineas[0], 'ID Venta,Fecha,Usuario,Total $,Total Bs,Tasa Cambio,Producto,Cantidad,Subtotal $')
+        venta = Venta.objects.get()
+        fecha = timezone.localtime(venta.fecha).strftime('%Y-%m-%d %H:%M')
+        self.assertEqual(lineas[1:], [f'{venta.id},{fecha},cajero,4.00,160.00,40.00,Botella 20L,2.00,4.00'])
+
+    @mock.patch.object(exportaciones, 'FILAS_POR_FRAGMENTO', 10)
+    @mock.patch.object(exportaciones, 'TAMANO_LOTE', 7)
+    def test_csv_en_varios_fragmentos(self):
+        self.crear_lineas(100)
+
+        fragmentos = list(self.exportar().streaming_content)
+
+        # El encabezado va en el primer fragmento junto con nueve filas
+        self.assertEqual([f.count(b'\n') for f in fragmentos], [10] * 10 + [1])
+        ids = {int(linea.split(b',')[0]) for linea in b''.join(fragmentos).splitlines()[1:]}
+        self.assertEqual(ids, set(Venta.objects.values_list('id', flat=True)))
+
+    @tag('lento', 'benchmark')
+    @solo_benchmark
+    def test_memoria_constante_en_exportacion_grande(self):
+        self.crear_lineas(self.LINEAS)
+        response = self.exportar()
+
+        tracemalloc.start()
+        try:
+            filas = sum(fragmento.count(b'\n') for fragmento in response.streaming_content)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(filas, self.LINEAS + 1)
+        self.assertLess(pico, self.LIMITE_MEMORIA)
+
+
+class ExportacionXlsxTests(VentasTestMixin, TestCase):
+    ROL = 'dueno'
+
+    def test_libro_con_celdas_tipadas_y_tres_hojas(self):
+        self.registrar_venta(
+            [{'codigo': '001', 'cantidad': 20}, {'codigo': '002', 'cantidad': 1}],
+            [{'metodo_pago': 'Divisa $', 'monto': 3}, {'metodo_pago': 'Pago Móvil', 'monto': 40}],
+        )
+
+        response = self.client.get(reverse('exportar_ventas_a_excel'), {'formato': 'xlsx', 'rango': 'semanal'})
+
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        self.assertIn('.xlsx"', response['Content-Disposition'])
+        libro = load_workbook(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(libro.sheetnames, ['Detalle', 'Métodos de Pago', 'Totales Diarios'])
+
+        venta = Venta.objects.get()
+        detalle = list(libro['Detalle'].values)
+        self.assertEqual(len(detalle), 3)
+        venta_id, fecha, usuario, total_divisa, _, tasa, producto, cantidad, subtotal = detalle[1]
+        self.assertEqual((venta_id, usuario, producto), (venta.id, 'cajero', 'Agua por litro'))
+        # Excel guarda la hora local con precisión de milisegundos
+        self.assertAlmostEqual(fecha, timezone.localtime(venta.fecha).replace(tzinfo=None), delta=timedelta(milliseconds=1))
+        self.assertEqual((total_divisa, tasa, cantidad, subtotal), (4, 40, 20, 2))
+
+        self.assertEqual(
+            list(libro['Métodos de Pago'].values)[1:],
+            [('Divisa $', '$', 3), ('Pago Móvil', 'Bs', 40)],
+        )
+        diarios = list(libro['Totales Diarios'].values)
+        self.assertEqual(diarios[1][0].date(), timezone.localdate())
+        self.assertEqual(diarios[1][1:], (1, 4, 160, 20))
+
+
+class ExportacionEnSegundoPlanoTests(VentasTestMixin, TestCase):
+    ROL = 'dueno'
+
+    RANGO = {'rango': 'personalizado', 'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-03-31'}
+
+    def setUp(self):
+        super().setUp()
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        ajustes = override_settings(EXPORTACIONES_DIR=carpeta.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        # El worker cierra las conexiones viejas en cada vuelta; aquí cerraría la de la prueba
+        conexiones = mock.patch('core.management.commands.procesar_exportaciones.close_old_connections')
+        self.cerrar_conexiones = conexiones.start()
+        self.addCleanup(conexiones.stop)
+
+        # Ventas en enero y marzo; febrero queda vacío
+        for dia in (date(2025, 1, 15), date(2025, 3, 10)):
+            self.registrar_venta([{'codigo': '002', 'cantidad': 1}], [{'metodo_pago': 'Divisa $', 'monto': 2}])
+            Venta.objects.filter(pk=Venta.objects.latest('id').pk).update(
+                fecha=timezone.make_aware(datetime.combine(dia, datetime.min.time()).replace(hour=12, second=30))
+            )
+
+    def solicitar(self, formato):
+        url = f"{reverse('solicitar_exportacion')}?rango=personalizado&fecha_inicio=2025-01-01&fecha_fin=2025-03-31"
+        self.client.post(url, {'formato': formato})
+        return ExportacionVentas.objects.latest('id')
+
+    def test_worker_genera_el_mismo_csv_que_la_descarga_directa(self):
+        exportacion = self.solicitar('csv')
+        self.assertEqual((exportacion.estado, exportacion.meses_totales), (ExportacionVentas.PENDIENTE, 3))
+
+        call_command('procesar_exportaciones', '--una-vez', stdout=StringIO())
+
+        # Una vuelta para la exportación y otra que encuentra la cola vacía
+        self.assertEqual(self.cerrar_conexiones.call_count, 2)
+        estado = self.client.get(reverse('estado_exportacion', args=[exportacion.pk])).json()
+        self.assertEqual((estado['estado'], estado['progreso']), ('completada', 100))
+        descarga = self.client.get(estado['url_descarga'])
+        directa = self.client.get(reverse('exportar_ventas_a_excel'), self.RANGO)
+        self.assertEqual(b''.join(descarga.streaming_content), b''.join(directa.streaming_content))
+
+    def test_worker_reiniciado_retoma_desde_el_ultimo_mes(self):
+        exportacion = self.solicitar('xlsx')
+
+        def detener(exp):
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            exportaciones.procesar_exportacion(exportacion, al_avanzar=detener)
+        exportacion.refresh_from_db()
+        self.assertEqual((exportacion.estado, exportacion.meses_procesados), (ExportacionVentas.PROCESANDO, 1))
+
+        with mock.patch.object(exportaciones, 'filas_detalle', wraps=exportaciones.filas_detalle) as consulta:
+            call_command('procesar_exportaciones', '--una-vez', stdout=StringIO())
+        # Solo se consultan febrero y marzo
+        self.assertEqual([llamada.args for llamada in consulta.call_args_list],
+                         [(date(2025, 2, 1), date(2025, 2, 28)), (date(2025, 3, 1), date(2025, 3, 31))])
+
+        exportacion.refresh_from_db()
+        self.assertEqual(exportacion.estado, ExportacionVentas.COMPLETADA)
+        descarga = self.client.get(reverse('descargar_exportacion', args=[exportacion.pk]))
+        detalle = list(load_workbook(BytesIO(b''.join(descarga.streaming_content)))['Detalle'].values)
+        self.assertEqual([fila[1] for fila in detalle[1:]], [datetime(2025, 1, 15, 12, 0, 30), datetime(2025, 3, 10, 12, 0, 30)])
+        self.assertEqual(detalle[1][3], 2)
+
+    def test_dos_workers_no_toman_la_misma_exportacion(self):
+        primera, segunda = self.solicitar('csv'), self.solicitar('csv')
+        worker = importlib.import_module('core.management.commands.procesar_exportaciones').Command()
+        actualizar = QuerySet.update
+
+        def otro_worker_primero(queryset, **campos):
+            # Otro worker reclama la primera entre la lectura de pendientes y el UPDATE
+            if campos == {'estado': ExportacionVentas.PROCESANDO} and not ExportacionVentas.objects.filter(
+                pk=primera.pk, estado=ExportacionVentas.PROCESANDO
+            ).exists():
+                actualizar(ExportacionVentas.objects.filter(pk=primera.pk), **campos)
+            return actualizar(queryset, **campos)
+
+        with mock.patch.object(QuerySet, 'update', otro_worker_primero):
+            self.assertEqual(worker.reclamar(), segunda)
+        self.assertIsNone(worker.reclamar())
+
+    def test_solo_el_dueno_ve_su_exportacion(self):
+        exportacion = self.solicitar('csv')
+        otro = User.objects.create_user('otro', password='clave-segura-123', rol='dueno')
+        self.client.force_login(otro)
+
+        self.assertEqual(self.client.get(reverse('estado_exportacion', args=[exportacion.pk])).status_code, 404)
+
+
+class PaginacionTests(VentasTestMixin, TestCase):
+    def crear_cisternas(self):
+        # Varias cisternas comparten fecha y hora para probar el desempate por id
+        hoy = timezone.localdate()
+        Cisterna.objects.bulk_create([
+            Cisterna(fecha=hoy - timedelta(days=i % 3), hora=f'{8 + i % 2:02d}:00', volumen=100,
+                     litros_disponibles=100, usuario=self.usuario)
+            for i in range(TAMANO_PAGINA * 2 + 5)
+        ])
+        return list(Cisterna.objects.order_by('-fecha', '-hora', '-id').values_list('id', flat=True))
+
+    def test_paginas_recorren_cada_fila_una_vez_en_orden(self):
+        esperadas = self.crear_cisternas()
+
+        vistas, cursor = [], None
+        while True:
+            pagina, cursor = paginar(Cisterna.objects.all(), ('fecha', 'hora', 'id'), cursor, tamano=7)
+            vistas += [c.id for c in pagina]
+            if cursor is None:
+                break
+
+        self.assertEqual(vistas, esperadas)
+
+    def test_filas_del_mismo_milisegundo(self):
+        base = timezone.now().replace(microsecond=123000)
+        Venta.objects.bulk_create([
+            Venta(usuario=self.usuario, fecha=base + timedelta(microseconds=i * 100)) for i in range(4)
+        ])
+        esperadas = list(Venta.objects.order_by('-fecha', '-id').values_list('id', flat=True))
+
+        vistas, cursor = [], None
+        while True:
+            pagina, cursor = paginar(Venta.objects.all(), ('fecha', 'id'), cursor, tamano=1)
+            vistas += [v.id for v in pagina]
+            if cursor is None:
+                break
+
+        self.assertEqual(vistas, esperadas)
+
+    def test_cargar_mas_de_cisternas(self):
+        self.crear_cisternas()
+
+        response = self.client.get(reverse('cisternas'))
+        self.assertEqual(len(response.context['cisternas']), TAMANO_PAGINA)
+
+        filas = TAMANO_PAGINA
+        cursor = response.context['siguiente_cursor']
+        while cursor:
+            data = self.client.get(reverse('cisternas_mas'), {'cursor': cursor}).json()
+            filas += data['html'].count('<tr>')
+            cursor = data['siguiente']
+        self.assertEqual(filas, Cisterna.objects.count())
+
+    def test_filtro_por_fechas_y_cursor_invalido(self):
+        self.crear_cisternas()
+        hoy = timezone.localdate()
+
+        response = self.client.get(reverse('cisternas'), {'fecha_inicio': hoy.isoformat(), 'fecha_fin': hoy.isoformat()})
+        self.assertTrue(all(c.fecha == hoy for c in response.context['cisternas']))
+        self.assertEqual(response.context['filtros'], f'fecha_inicio={hoy}&fecha_fin={hoy}')
+
+        response = self.client.get(reverse('cisternas_mas'), {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_alterado_con_valores_que_no_son_texto(self):
+        self.crear_cisternas()
+        hoy = timezone.localdate().isoformat()
+        for valores in ([[hoy], '09:00', 1], [hoy, {'h': 9}, 1], [hoy, '09:00', [1]], [None, '09:00', 1], [hoy, '09:00', True]):
+            with self.subTest(valores=valores):
+                response = self.client.get(reverse('cisternas_mas'), {'cursor': _codificar_cursor(valores)})
+                self.assertEqual(response.status_code, 400)
+
+    def test_ventas_de_hoy_paginadas_y_totales_completos(self):
+        for _ in range(TAMANO_PAGINA + 1):
+            self.registrar_venta([{'codigo': '002', 'cantidad': 1}], [{'metodo_pago': 'Divisa $', 'monto': 2}])
+
+        response = self.client.get(reverse('ventas'))
+
+        self.assertEqual(len(response.context['ventas_hoy']), TAMANO_PAGINA)
+        self.assertEqual(response.context['total_divisas_hoy'], Decimal('2.00') * (TAMANO_PAGINA + 1))
+        data = self.client.get(reverse('ventas_hoy_mas'), {'cursor': response.context['siguiente_cursor']}).json()
+        self.assertEqual((data['html'].count('<tr>'), data['siguiente']), (1, None))
+
+
+class RolesTests(TestCase):
+    def entrar(self, rol, **extra):
+        usuario = User.objects.create_user(f'usuario_{rol}', password='clave-segura-123', rol=rol, **extra)
+        self.client.force_login(usuario)
+        return usuario
+
+    def test_todos_los_roles_entran_a_las_secciones(self):
+        for rol in ('trabajador', 'encargada', 'dueno'):
+            self.entrar(rol)
+            for vista in ('cisternas', 'deliveries', 'control_manual', 'ventas'):
+                with self.subTest(rol=rol, vista=vista):
+                    self.assertEqual(self.client.get(reverse(vista)).status_code, 200)
+
+    def test_rol_insuficiente_vuelve_al_dashboard(self):
+        vista = role_required('encargada')(lambda request: HttpResponse('ok'))
+        casos = {'trabajador': 302, 'encargada': 200, 'dueno': 200}
+        for rol, estado in casos.items():
+            with self.subTest(rol=rol):
+                request = RequestFactory().get('/')
+                request.user = User(username=rol, rol=rol)
+                request._messages = CookieStorage(request)
+                response = vista(request)
+                self.assertEqual(response.status_code, estado)
+                if estado == 302:
+                    self.assertEqual(response['Location'], reverse('dashboard'))
+
+    def test_superusuario_entra_a_todo_y_anonimo_va_al_login(self):
+        self.assertIn('login', self.client.get(reverse('control_manual'))['Location'])
+        self.entrar('trabajador', is_superuser=True)
+        self.assertEqual(self.client.get(reverse('control_manual')).status_code, 200)
+
+    def test_rol_sin_consultas_adicionales(self):
+        self.entrar('dueno')
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('cisternas_mas'), {'cursor': 'invalido'})
+        self.assertEqual(response.status_code, 400)
+        # Solo la carga del usuario (la sesión ya está en caché); nada de grupos ni permisos
+        self.assertEqual(len(consultas), 1)
+        self.assertFalse([q for q in consultas.captured_queries if 'group' in q['sql']])
+
+
+class ConsultasPorSolicitudTests(TestCase):
+    """
+    Consultas de una solicitud autenticada que no toca la base en la vista: antes
+    (sesión y usuario leídos de la base) y después (sesión y usuario en caché).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('dueno', password='clave-segura-123', rol='dueno')
+
+    def consultas_por_solicitud(self):
+        self.client.force_login(self.usuario)
+        url = reverse('cisternas_mas')
+        self.client.get(url, {'cursor': 'invalido'})  # calienta la caché
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, {'cursor': 'invalido'})
+        self.assertEqual(response.status_code, 400)
+        return len(consultas)
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.db',
+        AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'],
+    )
+    def test_antes_sesion_y_usuario_en_la_base(self):
+        self.assertEqual(self.consultas_por_solicitud(), 2)
+
+    def test_despues_sesion_y_usuario_en_cache(self):
+        self.assertEqual(self.consultas_por_solicitud(), 0)
+
+    def test_cambio_del_usuario_invalida_la_cache(self):
+        self.consultas_por_solicitud()
+        self.usuario.rol = 'encargada'
+        self.usuario.save()
+
+        response = self.client.get(reverse('control_manual'))
+
+        self.assertEqual(response.wsgi_request.user.rol, 'encargada')
+
+    def test_la_cache_no_guarda_la_contrasena(self):
+        self.consultas_por_solicitud()
+
+        datos = cache.get(clave_usuario(self.usuario.pk))
+        self.assertNotIn('password', datos['campos'])
+        self.assertNotIn(self.usuario.password, repr(datos))
+        self.assertEqual(datos['campos']['rol'], 'dueno')
+
+    def test_cambio_de_contrasena_desde_otra_instancia_cierra_la_sesion(self):
+        self.consultas_por_solicitud()
+        otra = User.objects.get(pk=self.usuario.pk)
+        otra.set_password('otra-clave-segura-456')
+        otra.save()
+
+        response = self.client.get(reverse('control_manual'))
+
+        self.assertIn('login', response['Location'])
+
+    def test_guardar_el_usuario_de_la_sesion_conserva_la_contrasena(self):
+        self.consultas_por_solicitud()
+        response = self.client.get(reverse('control_manual'))
+        usuario = response.wsgi_request.user
+        self.assertIn('password', usuario.get_deferred_fields())
+
+        usuario.first_name = 'Ana'
+        usuario.save()
+
+        self.assertTrue(User.objects.get(pk=self.usuario.pk).check_password('clave-segura-123'))
+
+
+class VistasAsincronasTests(VentasTestMixin, TransactionTestCase):
+    ROL = 'dueno'
+
+    def sembrar(self, dias):
+        hoy = timezone.localdate()
+        ResumenDiario.objects.bulk_create([
+            ResumenDiario(fecha=hoy - timedelta(days=i), cantidad_ventas=10, total_divisa=Decimal('25.00'),
+                          total_bs=Decimal('1000.00'), litros_vendidos=Decimal('300.00'))
+            for i in range(dias)
+        ])
+        ResumenDiarioMetodo.objects.bulk_create([
+            ResumenDiarioMetodo(fecha=hoy - timedelta(days=i), metodo_pago=metodo, total=Decimal('10.00'))
+            for i in range(dias) for metodo in (self.divisa, self.pago_movil)
+        ])
+
+    def test_consultas_independientes_en_conexiones_distintas(self):
+        conexiones = []
+        # Si las consultas corrieran una tras otra, la barrera se rompería por tiempo
+        barrera = threading.Barrier(3, timeout=10)
+
+        def consulta():
+            conexiones.append(id(connections['default']))
+            barrera.wait()
+            return ResumenDiario.objects.count()
+
+        resultados = asyncio.run(en_paralelo(consulta, consulta, consulta))
+
+        self.assertEqual(resultados, [0, 0, 0])
+        self.assertEqual(len(set(conexiones)), 3)
+        self.assertNotIn(id(connections['default']), conexiones)
+
+    def contexto(self, vista, url, parametros):
+        request = RequestFactory().get(url, parametros)
+        request.user = self.usuario
+        contextos = []
+        receptor = lambda sender, context, **kwargs: contextos.append(context)
+        template_rendered.connect(receptor)
+        try:
+            response = async_to_sync(vista)(request) if asyncio.iscoroutinefunction(vista) else vista(request)
+        finally:
+            template_rendered.disconnect(receptor)
+        self.assertEqual(response.status_code, 200)
+        return contextos[0]
+
+    def test_mismo_contexto_que_la_version_sincrona(self):
+        self.sembrar(400)
+        casos = [
+            (reverse('dashboard'), {}, dashboard_view, dashboard_async_view,
+             ['litros_vendidos_hoy', 'ventas_dia_data', 'totales_por_metodo']),
+            (reverse('control_manual'), {'rango': 'anual'}, control_manual_view, control_manual_async_view,
+             ['totales_data', 'total_ventas_divisa', 'litros_vendidos', 'recaudacion_por_metodo']),
+        ]
+        for url, parametros, vista_sincrona, vista_asincrona, claves in casos:
+            with self.subTest(url=url):
+                asincrona = self.contexto(vista_asincrona, url, parametros)
+                sincrona = self.contexto(vista_sincrona, url, parametros)
+
+                for clave in claves:
+                    self.assertEqual(asincrona[clave], sincrona[clave])
+
+    @tag('lento', 'benchmark')
+    @solo_benchmark
+    def test_latencia_sincrona_contra_asincrona(self):
+        """Mediana de 30 solicitudes del control manual (rango anual) sobre tres años de resúmenes."""
+        self.sembrar(3 * 365)
+        url, parametros = reverse('control_manual'), {'rango': 'anual'}
+
+        def mediana(funcion, veces=30):
+            funcion()  # calentamiento
+            tiempos = []
+            for _ in range(veces):
+                inicio = time.perf_counter()
+                funcion()
+                tiempos.append(time.perf_counter() - inicio)
+            return statistics.median(tiempos) * 1000
+
+        def sincrona():
+            request = RequestFactory().get(url, parametros)
+            request.user = self.usuario
+            control_manual_view(request)
+
+        def asincrona():
+            request = RequestFactory().get(url, parametros)
+            request.user = self.usuario
+            async_to_sync(control_manual_async_view)(request)
+
+        sys.stderr.write(
+            f"\nControl manual ({connection.vendor}): síncrona {mediana(sincrona):.1f} ms, "
+            f"asíncrona {mediana(asincrona):.1f} ms\n"
+        )
+
+        # Con una base remota cada consulta paga un viaje de red; se simula con 5 ms por consulta
+        ejecutar = CursorWrapper._execute
+
+        def con_latencia(cursor, *args, **kwargs):
+            time.sleep(0.005)
+            return ejecutar(cursor, *args, **kwargs)
+
+        with mock.patch.object(CursorWrapper, '_execute', con_latencia):
+            ms_sincrona, ms_asincrona = mediana(sincrona), mediana(asincrona)
+        sys.stderr.write(
+            f"Control manual con 5 ms por consulta: síncrona {ms_sincrona:.1f} ms, asíncrona {ms_asincrona:.1f} ms\n"
+        )
+        self.assertLess(ms_asincrona, ms_sincrona)
+
+
+class MedicionSolicitudesTests(VentasTestMixin, TestCase):
+    def test_server_timing_solo_para_staff(self):
+        response = self.client.get(reverse('ventas'))
+        self.assertNotIn('Server-Timing', response)
+
+        self.usuario.is_staff = True
+        self.usuario.save()
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('ventas'))
+
+        self.assertIn(f'db;desc="{len(consultas)} consultas"', response['Server-Timing'])
+        self.assertRegex(response['Server-Timing'], r'tpl;desc="Plantillas";dur=\d+\.\d, total;dur=')
+
+    @override_settings(SOLICITUD_LENTA_MS=0)
+    def test_registra_solicitudes_lentas(self):
+        with self.assertLogs('core.rendimiento', 'WARNING') as registro:
+            self.client.get(reverse('ventas'))
+
+        datos = registro.records[0].solicitud
+        self.assertEqual(datos['vista'], 'ventas')
+        self.assertEqual(datos['estado'], 200)
+        self.assertGreater(datos['consultas'], 0)
+        self.assertGreater(datos['plantillas_ms'], 0)
+
+    @override_settings(SOLICITUD_LENTA_MS=0)
+    def test_streaming_se_registra_al_terminar_el_envio(self):
+        self.registrar_venta([{'codigo': '002', 'cantidad': 1}], [{'metodo_pago': 'Divisa $', 'monto': 2}])
+
+        with self.assertLogs('core.rendimiento', 'WARNING') as registro:
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(reverse('exportar_ventas_a_excel'), {'rango': 'semanal'})
+                self.assertEqual(registro.records, [])
+                b''.join(response.streaming_content)
+
+        # Incluye la consulta del detalle, que corre mientras se envía el archivo
+        self.assertEqual(len(registro.records), 1)
+        self.assertEqual(registro.records[0].solicitud['consultas'], len(consultas))
+        self.assertNotIn('Server-Timing', response)
+
+    def test_sentencias_repetidas(self):
+        medicion = Medicion()
+        with connection.execute_wrapper(medicion):
+            for producto in Producto.objects.all():
+                list(producto.items_vendidos.all())
+            MetodoDePago.objects.count()
+
+        repetidas = medicion.sentencias_repetidas()
+        self.assertEqual(len(repetidas), 1)
+        self.assertEqual(repetidas[0]['veces'], 2)
+        self.assertIn('core_itemventa', repetidas[0]['sql'])
+
+
+class MetricasTests(VentasTestMixin, TestCase):
+    def valor(self, nombre, **etiquetas):
+        return REGISTRY.get_sample_value(nombre, etiquetas) or 0
+
+    def test_endpoint_solo_local(self):
+        self.client.get(reverse('ventas'))
+
+        response = self.client.get(reverse('metricas'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('wtp_solicitud_duracion_segundos_bucket{le="0.005",metodo="GET",vista="ventas"}',
+                      response.content.decode())
+        self.assertEqual(self.client.get(reverse('metricas'), REMOTE_ADDR='203.0.113.9').status_code, 404)
+
+    @override_settings(METRICAS_TOKEN='secreto-de-prueba')
+    def test_token_detras_de_un_proxy(self):
+        url = reverse('metricas')
+        # Detrás del proxy REMOTE_ADDR es la del proxy: sin el token no basta con ser local
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer otro').status_code, 404)
+        response = self.client.get(url, REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer secreto-de-prueba')
+        self.assertEqual(response.status_code, 200)
+
+    def test_contadores_de_negocio(self):
+        ventas = self.valor('wtp_ventas_registradas_total')
+        litros = self.valor('wtp_litros_despachados_total', origen='venta')
+        sin_litros = self.valor('wtp_ventas_fallidas_total', motivo='litros_insuficientes')
+        no_coincide = self.valor('wtp_ventas_fallidas_total', motivo='pago_no_coincide')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.registrar_venta([{'codigo': '001', 'cantidad': 30}], [{'metodo_pago': 'Divisa $', 'monto': 3}])
+        self.registrar_venta([{'codigo': '001', 'cantidad': 5000}], [{'metodo_pago': 'Divisa $', 'monto': 500}])
+        self.registrar_venta([{'codigo': '002', 'cantidad': 1}], [{'metodo_pago': 'Divisa $', 'monto': 1}])
+
+        self.assertEqual(self.valor('wtp_ventas_registradas_total'), ventas + 1)
+        self.assertEqual(self.valor('wtp_litros_despachados_total', origen='venta'), litros + 30)
+        self.assertEqual(self.valor('wtp_ventas_fallidas_total', motivo='litros_insuficientes'), sin_litros + 1)
+        self.assertEqual(self.valor('wtp_ventas_fallidas_total', motivo='pago_no_coincide'), no_coincide + 1)
+
+    def test_botellas_canjeadas(self):
+        promo = Promocion.objects.create(nombre='Ana', telefono='0414', cantidad_divisa=Decimal('10.00'), botellas_pagadas=2)
+        canjeadas = self.valor('wtp_botellas_canjeadas_total')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('restar_botella', args=[promo.pk]))
+
+        self.assertEqual(self.valor('wtp_botellas_canjeadas_total'), canjeadas + 1)
+
+    def test_configuracion_de_gunicorn_activa_el_modo_multiproceso(self):
+        # En un proceso nuevo (como el maestro de gunicorn) que todavía no importó prometheus_client;
+        # la configuración se copia para que la carpeta de métricas sea temporal
+        with tempfile.TemporaryDirectory() as carpeta:
+            configuracion = Path(carpeta) / 'gunicorn.conf.py'
+            configuracion.write_text((Path(settings.BASE_DIR) / 'gunicorn.conf.py').read_text())
+            codigo = (
+                "import runpy, sys\n"
+                "runpy.run_path(sys.argv[1])['on_starting'](None)\n"
+                "from core import metricas\n"
+                "metricas.VENTAS_REGISTRADAS.inc()\n"
+                "sys.stdout.write(metricas.exposicion().decode())\n"
+            )
+            entorno = {k: v for k, v in os.environ.items() if k != 'PROMETHEUS_MULTIPROC_DIR'}
+            salida = subprocess.run(
+                [sys.executable, '-c', codigo, str(configuracion)], cwd=settings.BASE_DIR, env=entorno,
+                capture_output=True, text=True, check=True,
+            ).stdout
+
+            self.assertIn('wtp_ventas_registradas_total 1.0', salida)
+            self.assertTrue(list((Path(carpeta) / 'metricas').glob('*.db')))
+
+
+class ImportacionVentasTests(VentasTestMixin, TestCase):
+    ROL = 'dueno'
+
+    def escribir_csv(self, contenido):
+        archivo = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8', newline='')
+        with archivo:
+            archivo.write(contenido)
+        self.addCleanup(os.remove, archivo.name)
+        return archivo.name
+
+    def exportar_y_vaciar(self):
+        response = self.client.get(reverse('exportar_ventas_a_excel'), {'rango': 'semanal'})
+        contenido = b''.join(response.streaming_content).decode()
+        Venta.objects.all().delete()
+        ResumenDiario.objects.all().delete()
+        return self.escribir_csv(contenido)
+
+    def test_importa_lo_exportado(self):
+        self.registrar_venta([{'codigo': '001', 'cantidad': 10}, {'codigo': '002', 'cantidad': 1}],
+                             [{'metodo_pago': 'Divisa $', 'monto': 3}])
+        self.registrar_venta([{'codigo': '002', 'cantidad': 2}], [{'metodo_pago': 'Divisa $', 'monto': 4}])
+        esperado = list(ItemVenta.objects.order_by('id').values_list(
+            'venta__fecha', 'producto__codigo', 'cantidad', 'subtotal_divisa', 'venta__total_venta_divisa'
+        ))
+        resumen = ResumenDiario.objects.values('cantidad_ventas', 'total_divisa', 'litros_vendidos').get()
+        ruta = self.exportar_y_vaciar()
+
+        call_command('importar_ventas', ruta, '--metodo-pago', 'Divisa $', stdout=StringIO())
+
+        importado = list(ItemVenta.objects.order_by('id').values_list(
+            'venta__fecha', 'producto__codigo', 'cantidad', 'subtotal_divisa', 'venta__total_venta_divisa'
+        ))
+        # La exportación guarda la hora sin segundos
+        self.assertEqual([fila[1:] for fila in importado], [fila[1:] for fila in esperado])
+        self.assertEqual([f[0].replace(second=0, microsecond=0) for f in esperado], [f[0] for f in importado])
+        self.assertEqual(PagoVenta.objects.aggregate(total=Sum('monto_recibido'))['total'], Decimal('7.00'))
+        self.assertEqual(ResumenDiario.objects.values('cantidad_ventas', 'total_divisa', 'litros_vendidos').get(), resumen)
+
+    def test_retoma_desde_el_ultimo_lote(self):
+        for _ in range(3):
+            self.registrar_venta([{'codigo': '002', 'cantidad': 1}], [{'metodo_pago': 'Pago Móvil', 'monto': 80}])
+        ruta = self.exportar_y_vaciar()
+        guardar = importaciones._guardar_lote
+        lotes = []
+
+        def fallar_en_el_segundo(importacion, lote):
+            lotes.append(lote)
+            if len(lotes) == 2:
+                raise OSError("disco lleno")
+            guardar(importacion, lote)
+
+        importacion = importaciones.iniciar_importacion(ruta)
+        with mock.patch.object(importaciones, '_guardar_lote', fallar_en_el_segundo):
+            with self.assertRaises(OSError):
+                importaciones.importar_ventas(importacion, metodo_por_defecto='Pago Móvil', filas_por_lote=1)
+        self.assertEqual(Venta.objects.count(), 1)
+
+        importacion = importaciones.iniciar_importacion(ruta)
+        self.assertEqual(importacion.filas_procesadas, 1)
+        importaciones.importar_ventas(importacion, metodo_por_defecto='Pago Móvil', filas_por_lote=1)
+
+        self.assertEqual(Venta.objects.count(), 3)
+        self.assertEqual(PagoVenta.objects.filter(metodo_pago=self.pago_movil).count(), 3)
+        self.assertTrue(ImportacionVentas.objects.get().completada)
+
+    def test_errores_claros(self):
+        ruta = self.escribir_csv(
+            ','.join(exportaciones.COLUMNAS_DETALLE) + ',Método de Pago\n'
+            '7,2024-01-05 10:00,cajero,2.00,80.00,40.00,Botella 5L,1,2.00,Divisa $\n'
+        )
+        with self.assertRaisesMessage(CommandError, "Línea 2: el producto 'Botella 5L' no existe."):
+            call_command('importar_ventas', ruta, stdout=StringIO())
+        self.assertFalse(Venta.objects.exists())
+
+    def csv_ordenado(self, filas):
+        # Como en una exportación real: ventas ordenadas por fecha, una cada 10 minutos
+        inicio = datetime(2022, 1, 1, 7)
+        return self.escribir_csv(''.join(
+            [','.join(exportaciones.COLUMNAS_DETALLE) + '\n'] + [
+                f"{i // 3},{inicio + timedelta(minutes=10 * (i // 3)):%Y-%m-%d %H:%M},cajero,"
+                f"4.00,160.00,40.00,{'Agua por litro' if i % 3 else 'Botella 20L'},{'10' if i % 3 else '1'},"
+                f"{'1.00' if i % 3 else '2.00'}\n"
+                for i in range(filas)
+            ]
+        ))
+
+    def test_varios_lotes_y_sentencias(self):
+        filas = 3 * importaciones.FILAS_POR_SENTENCIA + 30
+        importaciones.importar_ventas(
+            importaciones.iniciar_importacion(self.csv_ordenado(filas)),
+            metodo_por_defecto='Divisa $', filas_por_lote=filas // 2,
+        )
+
+        self.assertEqual(ItemVenta.objects.count(), filas)
+        self.assertEqual(Venta.objects.count(), filas // 3)
+        self.assertEqual(ImportacionVentas.objects.get().filas_procesadas, filas)
+
+    @tag('lento', 'benchmark')
+    @solo_benchmark
+    def test_filas_por_segundo(self):
+        filas = 300000
+        ruta = self.csv_ordenado(filas)
+
+        inicio = time.perf_counter()
+        importaciones.importar_ventas(importaciones.iniciar_importacion(ruta), metodo_por_defecto='Divisa $')
+        por_segundo = filas / (time.perf_counter() - inicio)
+
+        sys.stderr.write(f"\nImportación: {por_segundo:,.0f} filas/s ({connection.vendor})\n")
+        self.assertEqual(ItemVenta.objects.count(), filas)
+        self.assertGreaterEqual(por_segundo, 50000)
+
+
+class ArchivoVentasTests(VentasTestMixin, TestCase):
+    ROL = 'dueno'
+    MES = date(2025, 1, 1)
+
+    def setUp(self):
+        super().setUp()
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        ajustes = override_settings(ARCHIVO_VENTAS_DIR=carpeta.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        # Dos ventas de enero de 2025 (con microsegundos) y una de hoy
+        for dia in (date(2025, 1, 15), date(2025, 1, 31)):
+            self.registrar_venta(
+                [{'codigo': '001', 'cantidad': 10}, {'codigo': '002', 'cantidad': 1}],
+                [{'metodo_pago': 'Divisa $', 'monto': 1}, {'metodo_pago': 'Pago Móvil', 'monto': 80}],
+            )
+            Venta.objects.filter(pk=Venta.objects.latest('id').pk).update(
+                fecha=inicio_del_dia(dia) + timedelta(hours=18, microseconds=123456)
+            )
+        self.registrar_venta([{'codigo': '002', 'cantidad': 1}], [{'metodo_pago': 'Divisa $', 'monto': 2}])
+        call_command('reconstruir_resumenes', stdout=StringIO())
+
+    def detalle(self):
+        return (
+            list(Venta.objects.order_by('id').values_list(
+                'id', 'usuario', 'fecha', 'total_venta_divisa', 'total_venta_bs', 'tasa_cambio_usada', 'tipo_venta'
+            )),
+            list(ItemVenta.objects.order_by('id').values_list('id', 'venta', 'producto', 'cantidad', 'subtotal_divisa', 'subtotal_bs')),
+            list(PagoVenta.objects.order_by('id').values_list('id', 'venta', 'metodo_pago', 'monto_recibido')),
+        )
+
+    def test_archiva_y_restaura_el_mes(self):
+        original = self.detalle()
+        resumenes = list(ResumenDiario.objects.order_by('fecha').values_list('fecha', 'cantidad_ventas', 'total_divisa'))
+
+        call_command('archivar_ventas', meses=1, stdout=StringIO())
+
+        archivo = ArchivoVentas.objects.get()
+        self.assertEqual((archivo.mes, archivo.cantidad_ventas, archivo.cantidad_items), (self.MES, 2, 4))
+        self.assertTrue((Path(settings.ARCHIVO_VENTAS_DIR) / archivo.archivo).is_file())
+        self.assertEqual(Venta.objects.count(), 1)
+        self.assertEqual(ItemVenta.objects.count(), 1)
+        self.assertEqual(
+            sorted(ResumenMensualProducto.objects.values_list('producto__codigo', 'cantidad', 'total_divisa')),
+            [('001', Decimal('20.00'), Decimal('2.00')), ('002', Decimal('2.00'), Decimal('4.00'))],
+        )
+        self.assertEqual(
+            dict(ResumenMensualMetodo.objects.values_list('metodo_pago__nombre', 'total')),
+            {'Divisa $': Decimal('2.00'), 'Pago Móvil': Decimal('160.00')},
+        )
+
+        # Los resúmenes diarios del mes archivado sobreviven a una reconstrucción
+        call_command('reconstruir_resumenes', stdout=StringIO())
+        self.assertEqual(
+            list(ResumenDiario.objects.order_by('fecha').values_list('fecha', 'cantidad_ventas', 'total_divisa')), resumenes
+        )
+        response = self.client.get(reverse('control_manual'), {
+            'rango': 'personalizado', 'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-12-31',
+        })
+        self.assertEqual(response.context['total_ventas_divisa'], Decimal('6.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archivar_ventas', restaurar='2025-01', stdout=StringIO())
+
+        self.assertEqual(self.detalle(), original)
+        self.assertFalse(ArchivoVentas.objects.exists())
+        self.assertFalse(ResumenMensualProducto.objects.exists())
+        self.assertFalse(any(Path(settings.ARCHIVO_VENTAS_DIR).iterdir()))
+
+    def test_productos_de_meses_archivados_antes_de_los_resumenes_por_producto(self):
+        migracion = importlib.import_module('core.migrations.0013_poblar_resumen_diario_producto')
+        call_command('archivar_ventas', meses=1, stdout=StringIO())
+        # Como si el mes se hubiera archivado antes de existir ResumenDiarioProducto
+        ResumenDiarioProducto.objects.all().delete()
+
+        migracion.poblar_resumenes(apps, None)
+
+        # La migración solo resume los ítems que siguen en las tablas
+        self.assertEqual(
+            list(ResumenDiarioProducto.objects.values_list('fecha', 'producto__codigo', 'cantidad')),
+            [(timezone.localdate(), '002', Decimal('1.00'))],
+        )
+
+        def botella(inicio, fin, rango):
+            periodos = comparativas.periodos_de_comparacion(inicio, fin, rango)
+            totales = {p['nombre']: p['total_divisa'] for p in comparativas.productos_comparados(periodos)}
+            return totales.get('Botella 20L', {}).get(comparativas.ANIO_ANTERIOR, Decimal('0.00'))
+
+        # El total mensual cuenta en los periodos que cubren el mes completo
+        self.assertEqual(botella(date(2026, 1, 1), date(2026, 1, 31), 'mensual'), Decimal('4.00'))
+        self.assertEqual(botella(date(2026, 1, 1), date(2026, 12, 31), 'anual'), Decimal('4.00'))
+        # y no se reparte entre los días de un rango que solo cubre parte del mes
+        self.assertEqual(botella(date(2026, 1, 12), date(2026, 1, 18), 'semanal'), Decimal('0.00'))
+
+        # Al restaurar el mes se calculan sus resúmenes diarios desde los ítems
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archivar_ventas', restaurar='2025-01', stdout=StringIO())
+        self.assertEqual(
+            sorted(ResumenDiarioProducto.objects.filter(fecha__month=1, fecha__year=2025).values_list(
+                'fecha', 'producto__codigo', 'cantidad'
+            )),
+            [(date(2025, 1, 15), '001', Decimal('10.00')), (date(2025, 1, 15), '002', Decimal('1.00')),
+             (date(2025, 1, 31), '001', Decimal('10.00')), (date(2025, 1, 31), '002', Decimal('1.00'))],
+        )
+        self.assertEqual(botella(date(2026, 1, 12), date(2026, 1, 18), 'semanal'), Decimal('2.00'))
+
+    def test_meses_archivados_con_resumenes_diarios_no_se_cuentan_dos_veces(self):
+        call_command('archivar_ventas', meses=1, stdout=StringIO())
+
+        periodos = comparativas.periodos_de_comparacion(date(2026, 1, 1), date(2026, 12, 31), 'anual')
+        totales = {p['nombre']: p['total_divisa'] for p in comparativas.productos_comparados(periodos)}
+
+        self.assertEqual(totales['Botella 20L'][comparativas.ANIO_ANTERIOR], Decimal('4.00'))
+
+    def test_no_archiva_el_mes_en_curso_ni_dos_veces(self):
+        with self.assertRaisesMessage(CommandError, "Solo se pueden archivar meses ya cerrados."):
+            call_command('archivar_ventas', mes=timezone.localdate().strftime('%Y-%m'), stdout=StringIO())
+
+        call_command('archivar_ventas', mes='2025-01', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, "El mes 2025-01 ya está archivado."):
+            call_command('archivar_ventas', mes='2025-01', stdout=StringIO())
+        self.assertEqual(Venta.objects.count(), 1)
+
+
+class SembrarDatosTests(TestCase):
+    def test_genera_datos_coherentes(self):
+        creados = sembrar(dias=10, ventas_por_dia=20, semilla=7)
+
+        self.assertEqual(Venta.objects.count(), creados['ventas'])
+        self.assertEqual(ItemVenta.objects.count(), creados['items'])
+        # Los pagos cubren el total de cada venta y los resúmenes coinciden con el detalle
+        venta = Venta.objects.order_by('?').first()
+        pagado = sum(
+            pago.monto_recibido / venta.tasa_cambio_usada if pago.metodo_pago.es_bolivares else pago.monto_recibido
+            for pago in venta.pagos.select_related('metodo_pago')
+        )
+        self.assertAlmostEqual(pagado, venta.total_venta_divisa, delta=Decimal('0.01'))
+        self.assertEqual(
+            ResumenDiario.objects.aggregate(total=Sum('cantidad_ventas'))['total'], creados['ventas']
+        )
+        # Las fechas de registro automáticas se llevan al día histórico
+        self.assertEqual(Delivery.objects.filter(fecha__lt=timezone.localdate() - timedelta(days=9)).count(), 0)
+        self.assertGreater(Delivery.objects.filter(fecha__lt=timezone.localdate()).count(), 0)
+
+    def test_comando_requiere_debug(self):
+        with self.settings(DEBUG=False):
+            with self.assertRaises(CommandError):
+                call_command('sembrar_datos', '--dias', '1')
+
+
+class RendimientoMixin:
+    """
+    Cuenta las consultas de las vistas principales sobre DIAS días de datos sintéticos
+    y, con WTP_BENCHMARK=1, mide además la mediana del tiempo. Falla si alguna vista
+    supera su presupuesto.
+    """
+    DIAS = 30
+    VENTAS_POR_DIA = 120
+    REPETICIONES = 5
+    # vista: (milisegundos, consultas). Las consultas no deben crecer con el histórico.
+    PRESUPUESTOS = {
+        'dashboard': (100, 3),
+        'ventas': (100, 5),
+        'registrar_venta': (100, 11),
+        'control_manual': (200, 5),
+        'exportar_ventas_a_excel': (1000, 1),
+        'restar_botella': (100, 9),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        sembrar(dias=cls.DIAS, ventas_por_dia=cls.VENTAS_POR_DIA, semilla=cls.DIAS)
+        cls.dueno = User.objects.get(username='dueno_demo')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.dueno)
+        self.promo = Promocion.objects.create(
+            nombre='Ana', telefono='0414', cantidad_divisa=Decimal('150.00'), botellas_pagadas=100
+        )
+
+    def medir(self, solicitud):
+        solicitud()  # calentamiento (cachés de catálogos y sesión)
+        tiempos = []
+        for _ in range(self.REPETICIONES if MEDIR_RENDIMIENTO else 1):
+            with CaptureQueriesContext(connection) as consultas:
+                inicio = time.perf_counter()
+                response = solicitud()
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+                tiempos.append(time.perf_counter() - inicio)
+            self.assertLess(response.status_code, 400)
+        return statistics.median(tiempos) * 1000, len(consultas)
+
+    def test_presupuestos(self):
+        venta = {
+            'items': json.dumps([{'codigo': '001', 'cantidad': 20}, {'codigo': '002', 'cantidad': 1}]),
+            'pagos': json.dumps([{'metodo_pago': 'Divisa $', 'monto': 4}]),
+        }
+        solicitudes = {
+            'dashboard': lambda: self.client.get(reverse('dashboard')),
+            'ventas': lambda: self.client.get(reverse('ventas')),
+            'registrar_venta': lambda: self.client.post(reverse('ventas'), venta),
+            'control_manual': lambda: self.client.get(reverse('control_manual'), {'rango': 'anual'}),
+            'exportar_ventas_a_excel': lambda: self.client.get(reverse('exportar_ventas_a_excel'), {'rango': 'mensual'}),
+            'restar_botella': lambda: self.client.post(reverse('restar_botella', args=[self.promo.pk])),
+        }
+        resultados = {nombre: self.medir(solicitud) for nombre, solicitud in solicitudes.items()}
+
+        if MEDIR_RENDIMIENTO:
+            sys.stderr.write(f"\nRendimiento con {self.DIAS} días ({Venta.objects.count()} ventas, {connection.vendor}):\n")
+            for nombre, (ms, consultas) in resultados.items():
+                sys.stderr.write(f"  {nombre:<26} {ms:8.1f} ms {consultas:4d} consultas\n")
+
+        for nombre, (ms, consultas) in resultados.items():
+            limite_ms, limite_consultas = self.PRESUPUESTOS[nombre]
+            with self.subTest(vista=nombre):
+                self.assertLessEqual(consultas, limite_consultas)
+                if MEDIR_RENDIMIENTO:
+                    self.assertLessEqual(ms, limite_ms)
+
+
+class ConsultasPorVistaTests(RendimientoMixin, TestCase):
+    """Solo los presupuestos de consultas, con pocos días de datos."""
+    DIAS = 3
+    VENTAS_POR_DIA = 10
+
+
+@tag('lento', 'benchmark')
+@solo_benchmark
+class RendimientoUnMesTests(RendimientoMixin, TestCase):
+    DIAS = 30
+
+
+@tag('lento', 'benchmark')
+@solo_benchmark
+class RendimientoUnAnioTests(RendimientoMixin, TestCase):
+    DIAS = 365
+
+
+@tag('lento', 'benchmark')
+@solo_benchmark
+class RendimientoTresAniosTests(RendimientoMixin, TestCase):
+    DIAS = 3 * 365
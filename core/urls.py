@@ -1,5 +1,6 @@
 # wtp_admin/urls.py (o tu archivo principal de URLs)
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 
@@ -12,19 +13,30 @@ from django.urls import path
 from core.views_main import (
     login_view, 
     logout_view, 
-    dashboard_view, 
+    dashboard_view,
+    dashboard_async_view, 
     ventas_view, 
+    ventas_hoy_mas_view,
     cisternas_view, 
-    control_manual_view, 
+    cisternas_mas_view,
+    control_manual_view,
+    control_manual_async_view, 
     deliveries_view,
+    deliveries_mas_view,
     tasa_view,
     productos_view,
     eliminar_producto_view,
+    catalogo_productos_view,
     about_us_view,
-    exportar_ventas_a_excel
+    exportar_ventas_a_excel,
+    solicitar_exportacion_view,
+    estado_exportacion_view,
+    descargar_exportacion_view,
+    metricas_view
 )
 # Asumiendo que 'promos' es una subcarpeta dentro de la app 'core'
-from core.views.promos import promos_view, registrar_promocion, restar_botella 
+from core.views.promos import promos_view, promos_mas_view, registrar_promocion, restar_botella, canjear_botellas_view
+from core.views.clientes import buscar_clientes_view
 
 urlpatterns = [
     # URLs del Administrador de Django (Jazzmin)
@@ -39,26 +51,42 @@ urlpatterns = [
     path('logout/', logout_view, name='logout'),
 
     # 2. URLs de Navegación principal
-    path('dashboard/', dashboard_view, name='dashboard'),
+    # Versiones asíncronas solo con VISTAS_ASINCRONAS (ver settings)
+    path('dashboard/', dashboard_async_view if settings.VISTAS_ASINCRONAS else dashboard_view, name='dashboard'),
     path('ventas/', ventas_view, name='ventas'),
+    path('ventas/hoy/mas/', ventas_hoy_mas_view, name='ventas_hoy_mas'),
     path('cisternas/', cisternas_view, name='cisternas'),
-    path('control-manual/', control_manual_view, name='control_manual'),
+    path('cisternas/mas/', cisternas_mas_view, name='cisternas_mas'),
+    path('control-manual/', control_manual_async_view if settings.VISTAS_ASINCRONAS else control_manual_view, name='control_manual'),
     path('deliveries/', deliveries_view, name='deliveries'),
+    path('deliveries/mas/', deliveries_mas_view, name='deliveries_mas'),
     path('acerca-de-nosotros/', about_us_view, name='about_us'),
     
     # 3. URLs de Gestión de Productos
     path('productos/', productos_view, name='productos'),
     path('productos/editar/<int:pk>/', productos_view, name='editar_producto'),
     path('productos/eliminar/<int:pk>/', eliminar_producto_view, name='eliminar_producto'),
+    path('productos/catalogo/', catalogo_productos_view, name='catalogo_productos'),
 
     # 4. URLs de Promociones
     path('promos/', promos_view, name='promos'),
+    path('promos/mas/', promos_mas_view, name='promos_mas'),
     path('promos/registrar/', registrar_promocion, name='registrar_promocion'),
     # CORREGIDO: Se usa un nombre de URL válido ('restar_botella')
     path('promos/restar/<int:promo_id>/', restar_botella, name='restar_botella'), 
+    path('promos/canjear/<int:promo_id>/', canjear_botellas_view, name='canjear_botellas'),
+
+    # Buscador de clientes (promociones y deliveries)
+    path('clientes/buscar/', buscar_clientes_view, name='buscar_clientes'),
 
     # 5. URLs Misceláneas
     path('tasa/', tasa_view, name='tasa'), # Gestión de la tasa de cambio
     # Exportación (ubicada lógicamente bajo control-manual)
     path('control-manual/exportar/', exportar_ventas_a_excel, name='exportar_ventas_a_excel'), 
+    path('control-manual/exportaciones/solicitar/', solicitar_exportacion_view, name='solicitar_exportacion'),
+    path('control-manual/exportaciones/<int:pk>/estado/', estado_exportacion_view, name='estado_exportacion'),
+    path('control-manual/exportaciones/<int:pk>/descargar/', descargar_exportacion_view, name='descargar_exportacion'),
+
+    # Métricas para Prometheus
+    path('metrics', metricas_view, name='metricas'),
 ]
\ No newline at end of file
@@ -1,7 +1,27 @@
-from datetime import datetime
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
 
 def obtener_mes_actual():
     return datetime.now().strftime('%B')
 
 def formatear_fecha(fecha):
     return fecha.strftime('%d/%m/%Y')
+
+def inicio_del_dia(fecha):
+    """Primer instante del día `fecha` en la zona horaria local, con zona horaria."""
+    return datetime.combine(fecha, time.min, tzinfo=timezone.get_current_timezone())
+
+def rango_de_dias(fecha_inicio, fecha_fin):
+    """
+    Devuelve el rango semiabierto [inicio, fin) de datetimes que cubre los días locales
+    de fecha_inicio a fecha_fin, ambos inclusive.
+
+    Filtrar con fecha__gte=inicio, fecha__lt=fin compara la columna directamente y
+    permite usar su índice, a diferencia de fecha__date, que la envuelve en una
+    conversión de zona horaria.
+    """
+    return inicio_del_dia(fecha_inicio), inicio_del_dia(fecha_fin + timedelta(days=1))
+
+def primer_dia_mes_siguiente(fecha):
+    return (fecha.replace(day=1) + timedelta(days=32)).replace(day=1)
@@ -0,0 +1,64 @@
+from urllib.parse import urlencode
+
+from django.db.models import F
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+
+from ..busqueda import MINIMO_CARACTERES, buscar
+from ..decorators import role_required
+from ..models import Delivery, Promocion
+
+# Resultados por tipo de cliente en las sugerencias del buscador
+LIMITE_RESULTADOS = 10
+
+
+def _url(nombre, busqueda):
+    return f"{reverse(nombre)}?{urlencode({'q': busqueda})}"
+
+
+def _promociones(busqueda):
+    promociones = buscar(Promocion.objects.all(), busqueda).annotate(
+        pendientes=F('botellas_pagadas') - F('botellas_retiradas')
+    ).order_by('-id')[:LIMITE_RESULTADOS]
+    return [
+        {
+            'id': promo.id,
+            'nombre': promo.nombre,
+            'telefono': promo.telefono,
+            'botellas_pendientes': promo.pendientes,
+            'url': _url('promos', promo.telefono),
+        }
+        for promo in promociones
+    ]
+
+
+def _deliveries(busqueda):
+    deliveries = buscar(Delivery.objects.all(), busqueda).order_by('-id')[:LIMITE_RESULTADOS]
+    return [
+        {
+            'id': delivery.id,
+            'nombre_cliente': delivery.nombre_cliente,
+            'direccion': delivery.direccion,
+            'fecha': delivery.fecha.isoformat(),
+            'url': _url('deliveries', delivery.nombre_cliente),
+        }
+        for delivery in deliveries
+    ]
+
+
+@role_required()
+@require_GET
+def buscar_clientes_view(request):
+    """
+    Sugerencias del buscador de clientes de las páginas de promociones y deliveries:
+    las coincidencias más recientes por nombre, teléfono o dirección.
+    """
+    busqueda = request.GET.get('q', '').strip()
+    if len(busqueda) < MINIMO_CARACTERES:
+        return JsonResponse({'promociones': [], 'deliveries': []})
+
+    return JsonResponse({
+        'promociones': _promociones(busqueda),
+        'deliveries': _deliveries(busqueda),
+    })
@@ -1,10 +1,10 @@
 from django.shortcuts import render
 from django.http import HttpResponse
 from ..models import Venta, Cisterna
-from django.contrib.auth.decorators import login_required
+from ..decorators import role_required
 from datetime import datetime
 
-@login_required
+@role_required()
 def dashboard(request):
     # Datos de ejemplo, reemplaza con los valores reales de tu base de datos
     litros_disponibles = 5000  # Este valor puede ser calculado dinámicamente desde tu base de datos
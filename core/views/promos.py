@@ -1,32 +1,68 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
+from django.shortcuts import render, redirect
 from django.db import transaction
 from django.db.models import F
-from django.http import JsonResponse
-from decimal import Decimal
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET, require_POST
+from datetime import timedelta
 from django.contrib import messages
 
-from ..models import Promocion, Venta, Cisterna 
+from .. import metricas
+from ..models import Promocion, RedencionPromocion
+from ..busqueda import buscar
+from ..decorators import role_required
 from ..forms import PromocionForm
+from ..promociones import LITROS_POR_BOTELLA, BotellasInsuficientes, LitrosInsuficientes, canjear_botellas
+from ..paginacion import fechas_del_filtro, paginar, parametros_del_filtro, respuesta_cargar_mas
+from ..utils import inicio_del_dia
 
 
-@login_required
+@role_required()
 def promos_view(request):
     """
     Muestra la página de promociones y el formulario de registro.
     """
     promo_form = PromocionForm()
 
-    promociones = Promocion.objects.filter(botellas_pagadas__gt=F('botellas_retiradas')).order_by('-id')
+    promociones, siguiente_cursor = paginar(_promociones_pendientes(request), CAMPOS_PROMOCIONES)
 
     context = {
         'promo_form': promo_form,
         'promociones': promociones,
+        'siguiente_cursor': siguiente_cursor,
+        'filtros': parametros_del_filtro(request),
     }
     return render(request, 'core/promos.html', context)
 
 
-@login_required
+# Orden (descendente) y clave de paginación del listado
+CAMPOS_PROMOCIONES = ('id',)
+
+
+def _promociones_pendientes(request):
+    # Coincide con el índice parcial promocion_pendiente_idx: los filtros siguientes solo
+    # recorren las promociones con botellas pendientes, no todo el histórico
+    promociones = Promocion.objects.filter(botellas_pagadas__gt=F('botellas_retiradas'))
+    # Teléfono o palabras del nombre por prefijo, con el índice de texto (core.busqueda)
+    promociones = buscar(promociones, request.GET.get('q', ''))
+    fecha_inicio, fecha_fin = fechas_del_filtro(request)
+    if fecha_inicio:
+        promociones = promociones.filter(fecha_creacion__gte=inicio_del_dia(fecha_inicio))
+    if fecha_fin:
+        promociones = promociones.filter(fecha_creacion__lt=inicio_del_dia(fecha_fin + timedelta(days=1)))
+    return promociones
+
+
+@role_required()
+@require_GET
+def promos_mas_view(request):
+    """Siguiente página de promociones pendientes (botón "Cargar más")."""
+    return respuesta_cargar_mas(
+        request, 'core/parciales/filas_promos.html', 'promociones',
+        lambda cursor: paginar(_promociones_pendientes(request), CAMPOS_PROMOCIONES, cursor)
+    )
+
+
+@role_required()
 def registrar_promocion(request):
     """
     Procesa el formulario de registro de promociones.
@@ -38,14 +74,13 @@ def registrar_promocion(request):
                 promo = form.save(commit=False)
                 promo.botellas_retiradas = 0
                 promo.save()
-                
-                # Se crea una Venta con total de 0 para registrar la promoción.
-                # Asegúrate de que tu modelo Venta tenga los campos `total_venta_divisa`, `total_venta_bs` y `tipo_venta`.
-                Venta.objects.create(
+
+                # El registro queda en el historial de la promoción, no en Venta
+                RedencionPromocion.objects.create(
+                    promocion=promo,
+                    tipo=RedencionPromocion.REGISTRO,
+                    botellas=promo.botellas_pagadas,
                     usuario=request.user,
-                    total_venta_divisa=Decimal('0.00'),
-                    total_venta_bs=Decimal('0.00'),
-                    tipo_venta='Promocion'
                 )
             messages.success(request, "Promoción registrada correctamente.")
             return redirect('promos')
@@ -56,43 +91,43 @@ def registrar_promocion(request):
     return redirect('promos')
 
 
-@login_required
-@transaction.atomic
+# Máximo de botellas por canje (un cliente retira varias de una vez)
+MAXIMO_BOTELLAS_POR_CANJE = 50
+
+
+def _canjear(request, promo_id, botellas):
+    try:
+        with transaction.atomic():
+            pendientes = canjear_botellas(promo_id, botellas, request.user)
+            metricas.botella_canjeada(botellas * LITROS_POR_BOTELLA, botellas)
+    except Promocion.DoesNotExist:
+        raise Http404("La promoción no existe.")
+    except (BotellasInsuficientes, LitrosInsuficientes) as error:
+        return JsonResponse({'success': False, 'error': str(error)})
+
+    return JsonResponse({'success': True, 'botellas_restantes': pendientes})
+
+
+@role_required()
+@require_POST
 def restar_botella(request, promo_id):
-    promocion = get_object_or_404(Promocion, id=promo_id)
-    pendientes = promocion.botellas_pagadas - promocion.botellas_retiradas
-
-    if pendientes > 0:
-        try:
-            cisterna = Cisterna.objects.latest('id')
-        except Cisterna.DoesNotExist:
-            return JsonResponse({'success': False, 'error': 'No hay cisternas registradas.'})
-
-        litros_a_restar = Decimal('20.00')
-
-        if cisterna.litros_disponibles < litros_a_restar:
-            return JsonResponse({'success': False, 'error': 'No hay suficientes litros disponibles en la cisterna.'})
-
-        promocion.botellas_retiradas = F('botellas_retiradas') + 1
-        promocion.save(update_fields=['botellas_retiradas'])
-
-        cisterna.litros_disponibles = F('litros_disponibles') - litros_a_restar
-        cisterna.save(update_fields=['litros_disponibles'])
-        
-        promocion.refresh_from_db()
-
-        # Se crea una Venta con total de 0 para registrar la botella retirada.
-        # Asegúrate de que tu modelo Venta tenga los campos `total_venta_divisa`, `total_venta_bs` y `tipo_venta`.
-        Venta.objects.create(
-            usuario=request.user,
-            total_venta_divisa=Decimal('0.00'),
-            total_venta_bs=Decimal('0.00'),
-            tipo_venta='Promocion'
-        )
+    """Retira una botella de la promoción."""
+    return _canjear(request, promo_id, 1)
 
-        return JsonResponse({
-            'success': True,
-            'botellas_restantes': promocion.botellas_pagadas - promocion.botellas_retiradas
-        })
-    else:
-        return JsonResponse({'success': False, 'error': 'No hay botellas pendientes'})
+
+@role_required()
+@require_POST
+def canjear_botellas_view(request, promo_id):
+    """
+    Retira varias botellas de una vez (campo POST `botellas`): la promoción y el
+    nivel de agua se actualizan con una sentencia cada uno, sin releer la fila.
+    """
+    try:
+        botellas = int(request.POST.get('botellas', ''))
+    except ValueError:
+        botellas = 0
+    if not 1 <= botellas <= MAXIMO_BOTELLAS_POR_CANJE:
+        return JsonResponse(
+            {'success': False, 'error': f"Indique entre 1 y {MAXIMO_BOTELLAS_POR_CANJE} botellas."}, status=400
+        )
+    return _canjear(request, promo_id, botellas)
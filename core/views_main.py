@@ -1,23 +1,46 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout, get_user_model
-from django.contrib.auth.decorators import login_required
 from django.db import transaction, IntegrityError
 from django.http import JsonResponse #
-from django.db.models import Sum, F, Value, DecimalField
-from django.db.models.functions import TruncDay
+from django.db.models import Sum, Q, Value, DecimalField
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.contrib import messages
 from datetime import timedelta, date
 import json
+import secrets
 from decimal import Decimal
-from django.http import HttpResponse # Necesaria para la respuesta de archivo
-import csv
+from functools import partial
+from django.http import FileResponse, StreamingHttpResponse # Necesarias para la respuesta de archivo
+import tempfile
+from pathlib import Path
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.urls import reverse
 
 # Importa los modelos y formularios
 from .models import (
     Venta, Cisterna, Delivery, Promocion, PagoVenta, TasaCambio,
-    Producto, ItemVenta, MetodoDePago
+    Producto, ItemVenta, MetodoDePago, ResumenDiario, ExportacionVentas
 )
+from . import metricas
+from .busqueda import buscar
+from .decorators import role_required
+from .concurrencia import en_paralelo
+from .comparativas import (
+    ACTUAL, PERIODOS, metodos_comparados, periodos_de_comparacion, productos_comparados, totales_comparados
+)
+from .catalogos import (
+    catalogo_productos, obtener_metodos_pago, obtener_tasa_actual, version_catalogo_productos
+)
+from .exportaciones import csv_en_fragmentos, escribir_xlsx, filas_detalle, meses_del_rango
+from .nivel_agua import descontar_litros, litros_disponibles, reponer_litros
+from .paginacion import fechas_del_filtro, paginar, parametros_del_filtro, respuesta_cargar_mas
+from .resumenes import acumular_venta
+from .utils import rango_de_dias
 from .forms import VentaForm, CisternaForm, TasaCambioForm, ProductoForm, DeliveryForm
 
 User = get_user_model()
@@ -47,66 +70,81 @@ def logout_view(request):
     return redirect('login')
 
 # ---------------------- DASHBOARD ----------------------
-@login_required
-def dashboard_view(request):
-    """
-    Muestra el panel de control con estadísticas clave del día.
-    """
-    hoy = timezone.now().date()
-    
-    try:
-        litros_disponibles = Cisterna.objects.latest('fecha', 'hora').litros_disponibles
-    except Cisterna.DoesNotExist:
-        litros_disponibles = Decimal('0.00')
-
-    # Litros vendidos hoy, filtrando por el producto de "Agua por Litros"
-    ventas_hoy = Venta.objects.filter(fecha__date=hoy)
-    litros_vendidos_hoy_q = ItemVenta.objects.filter(
-        venta__in=ventas_hoy,
-        producto__tipo='agua_litros'
-    ).aggregate(total=Sum('cantidad'))['total'] or Decimal('0.00')
-
-    # Suma total recaudada por método de pago
-    pagos_del_dia = PagoVenta.objects.filter(venta__in=ventas_hoy)
-    total_recaudado_divisa = pagos_del_dia.filter(metodo_pago__es_bolivares=False).aggregate(total=Sum('monto_recibido'))['total'] or Decimal('0.00')
-    total_recaudado_bs = pagos_del_dia.filter(metodo_pago__es_bolivares=True).aggregate(total=Sum('monto_recibido'))['total'] or Decimal('0.00')
-    
-    # Desglose de pagos
-    total_divisa = pagos_del_dia.filter(metodo_pago__nombre='Divisa $').aggregate(total=Sum('monto_recibido'))['total'] or Decimal('0.00')
-    total_bs_efectivo = pagos_del_dia.filter(metodo_pago__nombre='Efectivo BsD').aggregate(total=Sum('monto_recibido'))['total'] or Decimal('0.00')
-    total_pago_movil = pagos_del_dia.filter(metodo_pago__nombre='Pago Móvil').aggregate(total=Sum('monto_recibido'))['total'] or Decimal('0.00')
-    total_transferencia = pagos_del_dia.filter(metodo_pago__nombre='Transferencia').aggregate(total=Sum('monto_recibido'))['total'] or Decimal('0.00')
-    total_debito = pagos_del_dia.filter(metodo_pago__nombre='Tarjeta de Débito BsD').aggregate(total=Sum('monto_recibido'))['total'] or Decimal('0.00')
-    total_credito = pagos_del_dia.filter(metodo_pago__nombre='Tarjeta de Crédito BsD').aggregate(total=Sum('monto_recibido'))['total'] or Decimal('0.00')
+def _recaudacion_del_dia(hoy):
+    # Recaudación del día por método de pago en una sola consulta: cada método del
+    # catálogo aparece (con 0 si no tuvo pagos), incluidos los que se agreguen después.
+    return list(
+        MetodoDePago.objects.annotate(
+            total_hoy=Coalesce(
+                Sum('resumenes_diarios__total', filter=Q(resumenes_diarios__fecha=hoy)),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=16, decimal_places=2),
+            )
+        ).order_by('nombre').values('nombre', 'es_bolivares', 'total_hoy')
+    )
+
+
+def _litros_por_dia(desde, hasta):
+    # Serie diaria (incluye los litros de hoy) en una sola consulta agrupada por día
+    return dict(
+        ResumenDiario.objects.filter(fecha__range=(desde, hasta)).values_list('fecha', 'litros_vendidos')
+    )
+
+
+def _contexto_dashboard(hoy, ultimos_7_dias, totales_por_metodo, litros_por_dia, disponibles):
+    total_recaudado_divisa = sum((m['total_hoy'] for m in totales_por_metodo if not m['es_bolivares']), Decimal('0.00'))
+    total_recaudado_bs = sum((m['total_hoy'] for m in totales_por_metodo if m['es_bolivares']), Decimal('0.00'))
 
-    ultimos_7_dias = [hoy - timedelta(days=i) for i in range(6, -1, -1)]
     ventas_dia_labels = [dia.strftime('%d/%m') for dia in ultimos_7_dias]
-    ventas_dia_data = [
-        float(ItemVenta.objects.filter(
-            venta__fecha__date=dia,
-            producto__tipo='agua_litros'
-        ).aggregate(total=Sum('cantidad'))['total'] or 0)
-        for dia in ultimos_7_dias
-    ]
+    ventas_dia_data = [float(litros_por_dia.get(dia, 0)) for dia in ultimos_7_dias]
 
-    context = {
-        'litros_disponibles': litros_disponibles,
-        'litros_vendidos_hoy': litros_vendidos_hoy_q,
+    return {
+        'litros_disponibles': disponibles,
+        'litros_vendidos_hoy': litros_por_dia.get(hoy, Decimal('0.00')),
         'ventas_dia_labels': json.dumps(ventas_dia_labels),
         'ventas_dia_data': json.dumps(ventas_dia_data),
         'total_recaudado_divisa': total_recaudado_divisa,
         'total_recaudado_bs': total_recaudado_bs,
-        'total_divisa': total_divisa,
-        'total_bs_efectivo': total_bs_efectivo,
-        'total_pago_movil': total_pago_movil,
-        'total_transferencia': total_transferencia,
-        'total_debito': total_debito,
-        'total_credito': total_credito,
+        'totales_por_metodo': totales_por_metodo,
     }
+
+
+@role_required()
+def dashboard_view(request):
+    """
+    Muestra el panel de control con estadísticas clave del día.
+    """
+    hoy = timezone.localdate()
+    ultimos_7_dias = [hoy - timedelta(days=i) for i in range(6, -1, -1)]
+
+    context = _contexto_dashboard(
+        hoy, ultimos_7_dias,
+        _recaudacion_del_dia(hoy),
+        _litros_por_dia(ultimos_7_dias[0], hoy),
+        litros_disponibles(),
+    )
     return render(request, 'dashboard.html', context)
 
+
+@role_required()
+async def dashboard_async_view(request):
+    """
+    Versión asíncrona del dashboard: las tres consultas independientes se ejecutan
+    al mismo tiempo, cada una en su propia conexión.
+    """
+    hoy = timezone.localdate()
+    ultimos_7_dias = [hoy - timedelta(days=i) for i in range(6, -1, -1)]
+
+    totales_por_metodo, litros_por_dia, disponibles = await en_paralelo(
+        partial(_recaudacion_del_dia, hoy),
+        partial(_litros_por_dia, ultimos_7_dias[0], hoy),
+        litros_disponibles,
+    )
+    context = _contexto_dashboard(hoy, ultimos_7_dias, totales_por_metodo, litros_por_dia, disponibles)
+    return await sync_to_async(render)(request, 'dashboard.html', context)
+
 # ---------------------- GESTIÓN DE PRODUCTOS ----------------------
-@login_required
+@role_required()
 def productos_view(request, pk=None):
     """
     Vista unificada para listar, crear y editar productos.
@@ -135,7 +173,7 @@ def productos_view(request, pk=None):
     }
     return render(request, 'core/productos.html', context)
 
-@login_required
+@role_required()
 def eliminar_producto_view(request, pk):
     """
     Elimina un producto existente.
@@ -147,9 +185,29 @@ def eliminar_producto_view(request, pk):
         return redirect('productos')
     return redirect('productos') # Siempre redirigir a la lista de productos
 
+def _etag_catalogo(request):
+    request.catalogo_version = version_catalogo_productos()
+    return request.catalogo_version
+
+@role_required()
+@require_GET
+@condition(etag_func=_etag_catalogo)
+def catalogo_productos_view(request):
+    """
+    Devuelve el catálogo de productos en JSON para el punto de venta.
+    Responde 304 si el ETag enviado por el navegador coincide con la versión actual.
+    """
+    response = JsonResponse({
+        'version': request.catalogo_version,
+        'productos': catalogo_productos(),
+    })
+    # El navegador puede guardarlo, pero debe revalidarlo (If-None-Match) antes de usarlo
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 
 # ---------------------- VENTAS ----------------------
-@login_required
+@role_required()
 @transaction.atomic
 def ventas_view(request):
     """
@@ -166,57 +224,62 @@ def ventas_view(request):
             
             # Validar que al menos haya un producto y un pago en la venta
             if not items_data:
+                metricas.venta_fallida(metricas.SIN_PRODUCTOS)
                 messages.error(request, "No se puede registrar una venta sin productos.")
                 return redirect('ventas')
             if not pagos_data:
+                metricas.venta_fallida(metricas.SIN_PAGOS)
                 messages.error(request, "No se puede registrar una venta sin pagos.")
                 return redirect('ventas')
             
             # 2. Obtener la tasa de cambio actual desde la base de datos
-            try:
-                tasa_cambio_obj = TasaCambio.objects.latest('fecha')
-                tasa_actual = tasa_cambio_obj.tasa_bsd
-            except TasaCambio.DoesNotExist:
+            tasa_cambio_obj = obtener_tasa_actual()
+            if tasa_cambio_obj is None:
+                metricas.venta_fallida(metricas.SIN_TASA)
                 messages.error(request, "No hay una tasa de cambio registrada para hoy. Por favor, regístrela primero.")
                 return redirect('ventas')
+            tasa_actual = tasa_cambio_obj.tasa_bsd
+
+            # 3. Resolver todos los productos con una sola consulta y los métodos de pago desde la caché
+            codigos = [str(item['codigo']) for item in items_data]
+            productos_en_venta = Producto.objects.in_bulk(set(codigos), field_name='codigo')
+            codigos_desconocidos = sorted(set(codigos) - productos_en_venta.keys())
+            if codigos_desconocidos:
+                metricas.venta_fallida(metricas.PRODUCTO_DESCONOCIDO)
+                messages.error(request, f"Productos no encontrados: {', '.join(codigos_desconocidos)}.")
+                return redirect('ventas')
 
-            # 3. Calcular el total de la venta y verificar el stock de agua
+            nombres_metodos = {str(pago['metodo_pago']) for pago in pagos_data}
+            metodos_en_venta = {m.nombre: m for m in obtener_metodos_pago() if m.nombre in nombres_metodos}
+            metodos_desconocidos = sorted(nombres_metodos - metodos_en_venta.keys())
+            if metodos_desconocidos:
+                metricas.venta_fallida(metricas.METODO_DESCONOCIDO)
+                messages.error(request, f"Métodos de pago no encontrados: {', '.join(metodos_desconocidos)}.")
+                return redirect('ventas')
+
+            # 4. Calcular el total de la venta y los litros de agua a despachar
             total_venta_divisa = Decimal('0.00')
             cantidad_litros = Decimal('0.00')
-            productos_en_venta = {}
-            for item in items_data:
-                codigo = item['codigo']
+            lineas = []
+            for codigo, item in zip(codigos, items_data):
+                producto = productos_en_venta[codigo]
                 # Convertir a Decimal con cuidado para evitar errores de precisión
                 cantidad = Decimal(str(item['cantidad']))
-                
-                # Obtener el producto o mostrar un error si no se encuentra
-                producto = get_object_or_404(Producto, codigo=codigo)
-                productos_en_venta[codigo] = producto
-                
                 subtotal_divisa = producto.precio_divisa * cantidad
                 total_venta_divisa += subtotal_divisa
+                lineas.append((producto, cantidad, subtotal_divisa))
                 
                 if producto.tipo == 'agua_litros':
                     cantidad_litros += cantidad
 
-            if cantidad_litros > 0:
-                try:
-                    cisterna_actual = Cisterna.objects.latest('fecha', 'hora')
-                except Cisterna.DoesNotExist:
-                    messages.error(request, "No hay una cisterna registrada. Contacte al administrador.")
-                    return redirect('ventas')
-                if cisterna_actual.litros_disponibles < cantidad_litros:
-                    messages.error(request, f"No hay suficientes litros de agua en la cisterna. Solo quedan {cisterna_actual.litros_disponibles}L.")
-                    return redirect('ventas')
-            
-            # 4. Validar que el monto total de los pagos coincida con el total de la venta
+            # 5. Validar que el monto total de los pagos coincida con el total de la venta
             total_pagado_divisa = Decimal('0.00')
+            pagos = []
             for pago in pagos_data:
                 # Convertir a Decimal con cuidado para evitar errores de precisión
                 monto = Decimal(str(pago['monto']))
-                metodo_nombre = pago['metodo_pago']
-                # Obtener el método de pago por nombre
-                metodo_pago = get_object_or_404(MetodoDePago, nombre=metodo_nombre)
+                metodo_pago = metodos_en_venta[str(pago['metodo_pago'])]
+                pagos.append((metodo_pago, monto))
                 
                 if metodo_pago.es_bolivares:
                     total_pagado_divisa += monto / tasa_actual
@@ -226,98 +289,98 @@ def ventas_view(request):
             # Se usa una tolerancia de 0.01 para evitar problemas de precisión con los decimales.
             if abs(total_venta_divisa - total_pagado_divisa) > Decimal('0.01'):
                 saldo_pendiente = (total_venta_divisa - total_pagado_divisa).quantize(Decimal('0.01'))
+                metricas.venta_fallida(metricas.PAGO_NO_COINCIDE)
                 messages.error(request, f"El monto total de los pagos no coincide con el total de la venta. Saldo pendiente: ${saldo_pendiente}")
                 return redirect('ventas')
             
-            # 5. Guardar la venta y sus ítems
+            # 6. Descontar los litros de la cisterna solo si alcanzan, en una sola sentencia
+            #    atómica, para que ventas concurrentes no puedan vender más agua de la que hay.
+            if cantidad_litros > 0 and descontar_litros(cantidad_litros) is None:
+                metricas.venta_fallida(metricas.LITROS_INSUFICIENTES)
+                messages.error(request, f"No hay suficientes litros de agua en la cisterna. Solo quedan {litros_disponibles()}L.")
+                return redirect('ventas')
+
+            # 7. Guardar la venta, sus ítems y sus pagos (una inserción por tabla)
             venta = Venta.objects.create(
                 usuario=request.user,
                 total_venta_divisa=total_venta_divisa,
                 total_venta_bs=total_venta_divisa * tasa_actual,
                 tasa_cambio_usada=tasa_actual
             )
-            for item in items_data:
-                codigo = item['codigo']
-                cantidad = Decimal(str(item['cantidad']))
-                producto = productos_en_venta[codigo]
-                subtotal_divisa = producto.precio_divisa * cantidad
-                subtotal_bs = subtotal_divisa * tasa_actual
-                
-                ItemVenta.objects.create(
+            ItemVenta.objects.bulk_create([
+                ItemVenta(
                     venta=venta,
                     producto=producto,
                     cantidad=cantidad,
                     subtotal_divisa=subtotal_divisa,
-                    subtotal_bs=subtotal_bs
-                )
-            
-            # 6. Guardar los pagos asociados a la venta
-            for pago in pagos_data:
-                PagoVenta.objects.create(
-                    venta=venta,
-                    monto_recibido=pago['monto'],
-                    metodo_pago=get_object_or_404(MetodoDePago, nombre=pago['metodo_pago'])
+                    subtotal_bs=subtotal_divisa * tasa_actual
                 )
+                for producto, cantidad, subtotal_divisa in lineas
+            ])
+            PagoVenta.objects.bulk_create([
+                PagoVenta(venta=venta, monto_recibido=monto, metodo_pago=metodo_pago)
+                for metodo_pago, monto in pagos
+            ])
             
-            # 7. Descontar litros de la cisterna si aplica
-            if cantidad_litros > 0:
-                cisterna_actual.litros_disponibles = F('litros_disponibles') - cantidad_litros
-                cisterna_actual.save(update_fields=['litros_disponibles'])
+            # 8. Actualizar el resumen diario dentro de la misma transacción
+            acumular_venta(
+                venta,
+                litros=cantidad_litros,
+                pagos=[(metodo_pago.pk, monto) for metodo_pago, monto in pagos],
+                items=[
+                    (producto.pk, cantidad, subtotal_divisa, subtotal_divisa * tasa_actual)
+                    for producto, cantidad, subtotal_divisa in lineas
+                ],
+            )
+            metricas.venta_registrada(cantidad_litros)
             
             messages.success(request, "Venta registrada correctamente.")
             return redirect('ventas')
         
-        except (json.JSONDecodeError, KeyError, ValueError) as e:
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError, ArithmeticError) as e:
+            metricas.venta_fallida(metricas.DATOS_INVALIDOS)
             messages.error(request, f"Error en los datos enviados. Por favor, intente de nuevo. Detalle: {e}")
             return redirect('ventas')
             
     # --- Lógica de la Solicitud GET para cargar la página de ventas ---
     
-    # Obtener la lista de productos
-    productos_qs = Producto.objects.all().values('id', 'codigo', 'nombre', 'precio_divisa', 'precio_bolivares', 'tipo')
-    productos_list = []
-    for p in productos_qs:
-        p['precio_divisa'] = str(p['precio_divisa'])
-        p['precio_bolivares'] = str(p['precio_bolivares'])
-        productos_list.append(p)
-
-    # Crear métodos de pago por defecto si no existen, de forma segura
-    metodos_defecto = [
-        ("Tarjeta de Débito BsD", True),
-        ("Tarjeta de Crédito BsD", True),
-        ("Efectivo BsD", True),
-        ("Divisa $", False),
-        ("Transferencia", True),
-        ("Pago Móvil", True),
+    # El catálogo de productos no se incrusta en la página: ventas.js lo descarga desde
+    # catalogo_productos_view y lo guarda en el navegador mientras la versión no cambie.
+    catalogo_version = version_catalogo_productos()
+
+    # Obtener la lista de métodos de pago (los métodos por defecto se crean en una migración)
+    metodos = [
+        {'id': m.id, 'nombre': m.nombre, 'es_bolivares': m.es_bolivares}
+        for m in obtener_metodos_pago()
     ]
-    for nombre, es_bolivares in metodos_defecto:
-        MetodoDePago.objects.get_or_create(nombre=nombre, defaults={'es_bolivares': es_bolivares})
-    
-    # Obtener la lista de métodos de pago
-    metodos_pago = list(MetodoDePago.objects.all().values('id', 'nombre', 'es_bolivares'))
     
     # Obtener la tasa de cambio actual
-    try:
-        tasa_actual = TasaCambio.objects.latest('fecha').tasa_bsd
-    except TasaCambio.DoesNotExist:
+    tasa_cambio_obj = obtener_tasa_actual()
+    if tasa_cambio_obj is not None:
+        tasa_actual = tasa_cambio_obj.tasa_bsd
+    else:
         messages.warning(request, "No hay una tasa de cambio registrada. Usando una tasa predeterminada de 1.00.")
         tasa_actual = Decimal('1.00')
 
     # Obtener las ventas del día para el resumen
-    ventas_hoy = Venta.objects.filter(fecha__date=timezone.now().date())
+    # Rango semiabierto del día local para aprovechar el índice de Venta.fecha
+    ventas_del_dia = _ventas_de_hoy()
+    # Solo la primera página; el resto se pide con "Cargar más"
+    ventas_hoy, siguiente_cursor = paginar(ventas_del_dia, CAMPOS_VENTAS_HOY)
     
-    # ✅ CORRECCIÓN DE KEYERROR: Se usa 'total' como clave, ya que fue el nombre dado en aggregate()
-    total_divisas_hoy = ventas_hoy.aggregate(total=Sum('total_venta_divisa'))['total'] or Decimal('0.00')
-    total_bs_hoy = ventas_hoy.aggregate(total=Sum('total_venta_bs'))['total'] or Decimal('0.00')
+    totales_hoy = ventas_del_dia.aggregate(divisa=Sum('total_venta_divisa'), bs=Sum('total_venta_bs'))
+    total_divisas_hoy = totales_hoy['divisa'] or Decimal('0.00')
+    total_bs_hoy = totales_hoy['bs'] or Decimal('0.00')
 
     # ✅ CORRECCIÓN DE PYLANCE: Definir 'current_time_stamp' para evitar el error "is not defined"
     current_time_stamp = timezone.now().timestamp()
     
     context = {
-        'productos': json.dumps(productos_list),
-        'metodos_pago': json.dumps(metodos_pago),
+        'catalogo_version': catalogo_version,
+        'metodos_pago': json.dumps(metodos),
         'tasa_actual': json.dumps(str(tasa_actual)),
         'ventas_hoy': ventas_hoy,
+        'siguiente_cursor': siguiente_cursor,
         'total_divisas_hoy': total_divisas_hoy,
         'total_bs_hoy': total_bs_hoy,
         # ✅ Pasar la variable al contexto
@@ -327,8 +390,30 @@ def ventas_view(request):
     return render(request, 'core/ventas.html', context)
 
 
+# Orden (descendente) y clave de paginación de cada listado
+CAMPOS_VENTAS_HOY = ('fecha', 'id')
+CAMPOS_CISTERNAS = ('fecha', 'hora', 'id')
+CAMPOS_DELIVERIES = ('fecha', 'hora', 'id')
+
+
+def _ventas_de_hoy():
+    # Rango semiabierto del día local para aprovechar el índice de Venta.fecha
+    inicio_hoy, fin_hoy = rango_de_dias(timezone.localdate(), timezone.localdate())
+    return Venta.objects.filter(fecha__gte=inicio_hoy, fecha__lt=fin_hoy)
+
+
+@role_required()
+@require_GET
+def ventas_hoy_mas_view(request):
+    """Siguiente página de las ventas de hoy (botón "Cargar más")."""
+    return respuesta_cargar_mas(
+        request, 'core/parciales/filas_ventas_hoy.html', 'ventas_hoy',
+        lambda cursor: paginar(_ventas_de_hoy(), CAMPOS_VENTAS_HOY, cursor)
+    )
+
+
 # ---------------------- CISTERNAS ----------------------
-@login_required
+@role_required()
 def cisternas_view(request):
     """
     Gestiona el registro de la entrada de agua a la cisterna.
@@ -339,25 +424,45 @@ def cisternas_view(request):
             cisterna = form.save(commit=False)
             cisterna.usuario = request.user
             
-            try:
-                # Obtener la última cisterna para sumar el nuevo volumen
-                ultima_cisterna = Cisterna.objects.latest('fecha', 'hora')
-                cisterna.litros_disponibles = ultima_cisterna.litros_disponibles + cisterna.volumen
-            except Cisterna.DoesNotExist:
-                # Si no hay cisternas, el volumen es el total disponible
-                cisterna.litros_disponibles = cisterna.volumen
-            
-            cisterna.save()
+            with transaction.atomic():
+                # Sumar el nuevo volumen al nivel de agua y guardar el nivel resultante en el registro
+                cisterna.litros_disponibles = reponer_litros(cisterna.volumen)
+                cisterna.save()
             messages.success(request, "Cisterna registrada correctamente.")
             return redirect('cisternas')
     else:
         form = CisternaForm()
         
-    cisternas = Cisterna.objects.all().order_by('-fecha', '-hora')
-    return render(request, 'core/cisternas.html', {'form': form, 'cisternas': cisternas})
+    cisternas, siguiente_cursor = paginar(_cisternas_filtradas(request), CAMPOS_CISTERNAS)
+    return render(request, 'core/cisternas.html', {
+        'form': form,
+        'cisternas': cisternas,
+        'siguiente_cursor': siguiente_cursor,
+        'filtros': parametros_del_filtro(request),
+    })
+
+
+def _cisternas_filtradas(request):
+    cisternas = Cisterna.objects.all()
+    fecha_inicio, fecha_fin = fechas_del_filtro(request)
+    if fecha_inicio:
+        cisternas = cisternas.filter(fecha__gte=fecha_inicio)
+    if fecha_fin:
+        cisternas = cisternas.filter(fecha__lte=fecha_fin)
+    return cisternas
+
+
+@role_required()
+@require_GET
+def cisternas_mas_view(request):
+    """Siguiente página del historial de cisternas (botón "Cargar más")."""
+    return respuesta_cargar_mas(
+        request, 'core/parciales/filas_cisternas.html', 'cisternas',
+        lambda cursor: paginar(_cisternas_filtradas(request), CAMPOS_CISTERNAS, cursor)
+    )
 
 # ---------------------- DELIVERIES ----------------------
-@login_required
+@role_required()
 def deliveries_view(request):
     """
     Registra y muestra los detalles de los deliveries.
@@ -373,11 +478,36 @@ def deliveries_view(request):
     else:
         form = DeliveryForm()
         
-    deliveries = Delivery.objects.all().order_by('-fecha')
-    return render(request, 'deliveries.html', {'form': form, 'deliveries': deliveries})
+    deliveries, siguiente_cursor = paginar(_deliveries_filtrados(request), CAMPOS_DELIVERIES)
+    return render(request, 'deliveries.html', {
+        'form': form,
+        'deliveries': deliveries,
+        'siguiente_cursor': siguiente_cursor,
+        'filtros': parametros_del_filtro(request),
+    })
+
+
+def _deliveries_filtrados(request):
+    deliveries = buscar(Delivery.objects.select_related('encargado'), request.GET.get('q', ''))
+    fecha_inicio, fecha_fin = fechas_del_filtro(request)
+    if fecha_inicio:
+        deliveries = deliveries.filter(fecha__gte=fecha_inicio)
+    if fecha_fin:
+        deliveries = deliveries.filter(fecha__lte=fecha_fin)
+    return deliveries
+
+
+@role_required()
+@require_GET
+def deliveries_mas_view(request):
+    """Siguiente página del historial de deliveries (botón "Cargar más")."""
+    return respuesta_cargar_mas(
+        request, 'core/parciales/filas_deliveries.html', 'deliveries',
+        lambda cursor: paginar(_deliveries_filtrados(request), CAMPOS_DELIVERIES, cursor)
+    )
 
 # ---------------------- GESTIÓN DE TASAS DE CAMBIO ----------------------
-@login_required
+@role_required()
 def tasa_view(request):
     """
     Gestiona la creación y actualización de la tasa de cambio diaria.
@@ -442,131 +572,238 @@ def get_date_range_from_request(request):
     # El filtro de Venta.fecha debe ser >= start_date y < end_date + 1 día
     # para incluir el día completo de la fecha final.
     return start_date, end_date, rango
-@login_required
-def control_manual_view(request):
-    """
-    Vista para la página de control manual de ventas, con filtrado y comparación.
-    """
-    
+def _rango_control_manual(request):
     start_date, end_date, rango_seleccionado = get_date_range_from_request(request)
-    
+
     # Asegurarse de que el rango sea válido
     if start_date > end_date:
         messages.error(request, "La fecha de inicio no puede ser posterior a la fecha de fin.")
         # Usar el rango semanal por defecto en caso de error
-        start_date, end_date, rango_seleccionado = get_date_range_from_request({'GET': {'rango': 'semanal'}})
-
-    # 1. Obtener los datos de ventas en el rango
-    ventas_en_rango = Venta.objects.filter(
-        fecha__date__gte=start_date,
-        fecha__date__lte=end_date
-    )
+        end_date = timezone.localdate()
+        start_date, rango_seleccionado = end_date - timedelta(days=6), 'semanal'
+    return start_date, end_date, rango_seleccionado
 
-    # 2. Ventas Agrupadas por Día (para el gráfico de evolución)
-    ventas_por_dia = ventas_en_rango.annotate(
-        dia=TruncDay('fecha')
-    ).values('dia').annotate(
-        total_diario=Sum('total_venta_divisa')
-    ).order_by('dia')
 
-    # --- INICIO DE LA CORRECCIÓN CRÍTICA PARA GRÁFICO ---
-    # 2.1. Mapear los datos existentes a un diccionario {fecha_str: total}
+def _totales_diarios_divisa(start_date, end_date):
+    # Mapear los datos existentes a un diccionario {fecha_str: total}
     # Aseguramos que los valores sean float para JS
-    data_map = {item['dia'].strftime('%Y-%m-%d'): float(item['total_diario']) for item in ventas_por_dia}
-    
-    # 2.2. Generar etiquetas y datos para CADA DÍA del rango (rellenando vacíos)
+    return {
+        fecha.strftime('%Y-%m-%d'): float(total)
+        for fecha, total in ResumenDiario.objects.filter(
+            fecha__range=(start_date, end_date)
+        ).values_list('fecha', 'total_divisa')
+    }
+
+
+def _ultimas_exportaciones(usuario_id):
+    return list(ExportacionVentas.objects.filter(usuario_id=usuario_id).order_by('-id')[:5])
+
+
+def _contexto_control_manual(start_date, end_date, rango_seleccionado, periodos, data_map, totales,
+                             metodos, productos, exportaciones):
+    # Generar etiquetas y datos para CADA DÍA del rango (rellenando vacíos)
     fechas_labels = []
     totales_data = []
-    
+
     current_date = start_date
     while current_date <= end_date:
         date_str = current_date.strftime('%Y-%m-%d')
         fechas_labels.append(date_str)
         # Rellena con el valor de la BD o 0.0 si no hay ventas ese día
-        totales_data.append(data_map.get(date_str, 0.0)) 
+        totales_data.append(data_map.get(date_str, 0.0))
         current_date += timedelta(days=1)
-    # --- FIN DE LA CORRECCIÓN CRÍTICA ---
-
 
-    # 3. Totales Recaudados (Sumarios)
-    total_ventas_divisa = ventas_en_rango.aggregate(Sum('total_venta_divisa'))['total_venta_divisa__sum'] or Decimal('0.00')
-    total_ventas_bs = ventas_en_rango.aggregate(Sum('total_venta_bs'))['total_venta_bs__sum'] or Decimal('0.00')
-
-    # 4. Desglose de Recaudación por Método de Pago
-    pagos_en_rango = PagoVenta.objects.filter(venta__in=ventas_en_rango)
-    recaudacion_por_metodo = pagos_en_rango.values('metodo_pago__nombre').annotate(
-        total_monto=Sum('monto_recibido')
-    ).order_by('-total_monto')
-    
-    # 5. Calcular el total de litros vendidos
-    litros_vendidos = ItemVenta.objects.filter(
-        venta__in=ventas_en_rango,
-        producto__tipo='agua_litros'
-    ).aggregate(total_litros=Sum('cantidad'))['total_litros'] or Decimal('0.00')
+    # El periodo seleccionado sale de las mismas consultas que la comparación
+    recaudacion_por_metodo = [
+        {'metodo_pago__nombre': fila['nombre'], 'total_monto': fila[ACTUAL]} for fila in metodos if fila[ACTUAL]
+    ]
 
-    # Preparar contexto
-    context = {
+    return {
+        'exportaciones': exportaciones,
         'start_date_str': start_date.strftime('%Y-%m-%d'),
         'end_date_str': end_date.strftime('%Y-%m-%d'),
         'rango_seleccionado': rango_seleccionado,
-        'total_ventas_divisa': total_ventas_divisa,
-        'total_ventas_bs': total_ventas_bs,
-        'litros_vendidos': litros_vendidos,
+        'total_ventas_divisa': totales['divisa'][ACTUAL],
+        'total_ventas_bs': totales['bs'][ACTUAL],
+        'litros_vendidos': totales['litros'][ACTUAL],
         'recaudacion_por_metodo': recaudacion_por_metodo,
-        
+
+        # Comparación con el periodo anterior y con el mismo periodo del año anterior
+        'periodos_comparados': [
+            {'clave': clave, 'nombre': nombre, 'inicio': periodos[clave][0], 'fin': periodos[clave][1]}
+            for clave, nombre in PERIODOS
+        ],
+        'comparacion_totales': [
+            ('Total Venta ($)', totales['divisa']),
+            ('Total Venta (Bs)', totales['bs']),
+            ('Litros de Agua Vendidos', totales['litros']),
+            ('Cantidad de Ventas', totales['ventas']),
+        ],
+        'comparacion_metodos': metodos,
+        'comparacion_productos': productos,
+
         # Datos para Chart.js (¡Serializados con json.dumps!)
         'fechas_labels': json.dumps(fechas_labels),
         'totales_data': json.dumps(totales_data),
-        
-        # Datos para el gráfico de métodos de pago 
+
+        # Datos para el gráfico de métodos de pago
         'metodos_labels': json.dumps([r['metodo_pago__nombre'] for r in recaudacion_por_metodo]),
         'metodos_data': json.dumps([float(r['total_monto']) for r in recaudacion_por_metodo]),
     }
-    
+
+
+@role_required()
+def control_manual_view(request):
+    """
+    Vista para la página de control manual de ventas, con filtrado y comparación.
+    """
+    start_date, end_date, rango_seleccionado = _rango_control_manual(request)
+    periodos = periodos_de_comparacion(start_date, end_date, rango_seleccionado)
+
+    # 1. Ventas agrupadas por día (gráfico de evolución), 2. totales (divisa, Bs y litros),
+    # 3. desglose por método de pago y 4. por producto, los tres en el periodo seleccionado,
+    # el anterior y el del año anterior, y 5. últimas exportaciones en segundo plano del usuario
+    context = _contexto_control_manual(
+        start_date, end_date, rango_seleccionado, periodos,
+        _totales_diarios_divisa(start_date, end_date),
+        totales_comparados(periodos),
+        metodos_comparados(periodos),
+        productos_comparados(periodos),
+        _ultimas_exportaciones(request.user.pk),
+    )
     return render(request, 'core/control_manual.html', context)
 
+
+@role_required()
+async def control_manual_async_view(request):
+    """
+    Versión asíncrona del control manual: las cinco consultas independientes se
+    ejecutan al mismo tiempo, cada una en su propia conexión.
+    """
+    start_date, end_date, rango_seleccionado = _rango_control_manual(request)
+    periodos = periodos_de_comparacion(start_date, end_date, rango_seleccionado)
+    # role_required ya resolvió request.user, así que leerlo aquí no consulta la base
+    usuario_id = request.user.pk
+
+    data_map, totales, metodos, productos, exportaciones = await en_paralelo(
+        partial(_totales_diarios_divisa, start_date, end_date),
+        partial(totales_comparados, periodos),
+        partial(metodos_comparados, periodos),
+        partial(productos_comparados, periodos),
+        partial(_ultimas_exportaciones, usuario_id),
+    )
+    context = _contexto_control_manual(
+        start_date, end_date, rango_seleccionado, periodos, data_map, totales, metodos, productos, exportaciones
+    )
+    return await sync_to_async(render)(request, 'core/control_manual.html', context)
+
 #CONTROL MANUAL 
 
-@login_required
+@role_required()
 def exportar_ventas_a_excel(request):
     """
-    Función para exportar los datos de ventas filtrados a un archivo CSV.
+    Función para exportar los datos de ventas filtrados a un archivo CSV,
+    o a un libro de Excel (.xlsx) con ?formato=xlsx.
+    El archivo se genera y envía por partes, así la memoria usada no depende del rango.
     """
     start_date, end_date, _ = get_date_range_from_request(request)
-    
-    response = HttpResponse(content_type='text/csv')
+
+    if request.GET.get('formato') == 'xlsx':
+        # El libro se escribe fila a fila en un archivo temporal que se borra al cerrar la respuesta
+        archivo = tempfile.TemporaryFile()
+        escribir_xlsx(archivo, start_date, end_date)
+        archivo.seek(0)
+        return FileResponse(
+            archivo,
+            as_attachment=True,
+            filename=f"reporte_ventas_{start_date}_{end_date}.xlsx",
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+
+    response = StreamingHttpResponse(
+        csv_en_fragmentos(filas_detalle(start_date, end_date)),
+        content_type='text/csv'
+    )
     response['Content-Disposition'] = f'attachment; filename="reporte_ventas_{start_date}_{end_date}.csv"'
+    return response
 
-    writer = csv.writer(response)
-    
-    # Encabezados del archivo CSV
-    writer.writerow([
-        'ID Venta', 'Fecha', 'Usuario', 'Total $', 'Total Bs', 
-        'Tasa Cambio', 'Producto', 'Cantidad', 'Subtotal $'
-    ])
-
-    # Obtener todas las ventas y sus items en el rango
-    items_vendidos = ItemVenta.objects.select_related('venta', 'producto', 'venta__usuario').filter(
-        venta__fecha__date__gte=start_date,
-        venta__fecha__date__lte=end_date
-    ).order_by('venta__fecha')
-
-    # Escribir los datos
-    for item in items_vendidos:
-        venta = item.venta
-        writer.writerow([
-            venta.id,
-            venta.fecha.strftime('%Y-%m-%d %H:%M'),
-            venta.usuario.username,
-            venta.total_venta_divisa,
-            venta.total_venta_bs,
-            venta.tasa_cambio_usada,
-            item.producto.nombre,
-            item.cantidad,
-            item.subtotal_divisa,
-        ])
+@role_required()
+@require_POST
+def solicitar_exportacion_view(request):
+    """
+    Encola una exportación del rango filtrado para que la procese el worker
+    (manage.py procesar_exportaciones) fuera de la solicitud.
+    """
+    start_date, end_date, _ = get_date_range_from_request(request)
+    formato = request.POST.get('formato', 'csv')
+    url_control = f"{reverse('control_manual')}?{request.GET.urlencode()}"
 
-    return response
+    if formato not in dict(ExportacionVentas.FORMATOS):
+        messages.error(request, "Formato de exportación no válido.")
+        return redirect(url_control)
+    if start_date > end_date:
+        messages.error(request, "La fecha de inicio no puede ser posterior a la fecha de fin.")
+        return redirect(url_control)
+
+    ExportacionVentas.objects.create(
+        usuario=request.user,
+        formato=formato,
+        fecha_inicio=start_date,
+        fecha_fin=end_date,
+        meses_totales=len(meses_del_rango(start_date, end_date)),
+    )
+    messages.success(request, "Exportación en cola. Podrás descargarla aquí cuando termine.")
+    return redirect(url_control)
+
+
+@role_required()
+@require_GET
+def estado_exportacion_view(request, pk):
+    """Progreso de una exportación en segundo plano (consultado desde el control manual)."""
+    exportacion = get_object_or_404(ExportacionVentas, pk=pk, usuario=request.user)
+    return JsonResponse({
+        'estado': exportacion.estado,
+        'estado_display': exportacion.get_estado_display(),
+        'progreso': exportacion.progreso,
+        'meses_procesados': exportacion.meses_procesados,
+        'meses_totales': exportacion.meses_totales,
+        'url_descarga': (
+            reverse('descargar_exportacion', args=[exportacion.pk])
+            if exportacion.estado == ExportacionVentas.COMPLETADA else None
+        ),
+        'error': exportacion.error,
+    })
+
+
+@role_required()
+def descargar_exportacion_view(request, pk):
+    """Descarga el archivo de una exportación terminada."""
+    exportacion = get_object_or_404(
+        ExportacionVentas, pk=pk, usuario=request.user, estado=ExportacionVentas.COMPLETADA
+    )
+    ruta = Path(settings.EXPORTACIONES_DIR) / exportacion.archivo
+    if not ruta.is_file():
+        raise Http404("El archivo de la exportación ya no existe.")
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=ruta.name)
+
+# ---------------------- MÉTRICAS ----------------------
+@require_GET
+def _metricas_autorizadas(request):
+    if settings.METRICAS_TOKEN:
+        recibido = request.headers.get('Authorization', '').encode()
+        return secrets.compare_digest(recibido, f'Bearer {settings.METRICAS_TOKEN}'.encode())
+    return request.META.get('REMOTE_ADDR') in settings.METRICAS_IPS_PERMITIDAS
+
+
+def metricas_view(request):
+    """
+    Métricas en formato Prometheus. Con settings.METRICAS_TOKEN exige ese token
+    (Authorization: Bearer); si no, solo responde a las direcciones de
+    settings.METRICAS_IPS_PERMITIDAS (el recolector corre en el mismo servidor).
+    """
+    if not _metricas_autorizadas(request):
+        raise Http404
+    return HttpResponse(metricas.exposicion(), content_type=metricas.CONTENT_TYPE_LATEST)
 
 # ABOUT US
 def about_us_view(request):
@@ -0,0 +1,24 @@
+# Configuración de gunicorn (la lee automáticamente al iniciar desde esta carpeta)
+import os
+import shutil
+from pathlib import Path
+
+# Cada worker escribe sus métricas en esta carpeta y /metrics suma las de todos.
+# Debe definirse antes de importar prometheus_client en cualquier proceso: el tipo
+# de valor (en memoria o en archivo) se elige al importarlo y los workers heredan
+# los módulos que el proceso principal ya importó.
+METRICAS_DIR = Path(os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', str(Path(__file__).resolve().parent / 'metricas')
+))
+
+
+def on_starting(server):
+    # Los archivos de una ejecución anterior tienen pids que ya no existen
+    shutil.rmtree(METRICAS_DIR, ignore_errors=True)
+    METRICAS_DIR.mkdir(parents=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', 
+    # Consultas y tiempos por solicitud (Server-Timing para staff y registro de solicitudes lentas)
+    'core.instrumentacion.MedicionSolicitudMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -59,7 +61,8 @@ ROOT_URLCONF = 'wtp_admin.urls'
 # TEMPLATES (Sin cambios)
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de render de cada solicitud
+        'BACKEND': 'core.instrumentacion.PlantillasMedidas',
         'DIRS': [BASE_DIR / 'core' / 'templates' / 'core'], 
         'APP_DIRS': True,
         'OPTIONS': {
@@ -94,6 +97,17 @@ if DEBUG or not DB_HOST:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # IMMEDIATE toma el bloqueo de escritura al iniciar la transacción, así varios
+            # workers esperan su turno (hasta 'timeout' segundos) en lugar de fallar con
+            # "database is locked" al registrar ventas al mismo tiempo.
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+            # Base de pruebas en archivo para que las pruebas con hilos compartan la misma base.
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
         }
     }
 # Si DEBUG=False y se encuentran las variables de DB, usa PostgreSQL (producción/Clever Cloud)
@@ -106,6 +120,10 @@ else:
             'PASSWORD': DB_PASSWORD, # Leído del .env
             'HOST': DB_HOST,     # Leído del .env
             'PORT': DB_PORT,     # Leído del .env
+            # Conexiones persistentes: evitan un handshake TLS por solicitud y por cada
+            # hilo de consultas en paralelo de las vistas asíncronas (core.concurrencia)
+            'CONN_MAX_AGE': 60,
+            'CONN_HEALTH_CHECKS': True,
             'OPTIONS': {
                 'sslmode': 'require',
             }
@@ -116,6 +134,32 @@ else:
 # USUARIO PERSONALIZADO (Sin cambios)
 AUTH_USER_MODEL = 'core.User'
 
+# El usuario de cada sesión se lee de la caché (se invalida al guardar el usuario).
+# ModelBackend queda de segundo para las sesiones iniciadas antes de este cambio.
+AUTHENTICATION_BACKENDS = [
+    'core.autenticacion.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# =========================================================
+# CACHÉ Y SESIONES
+# =========================================================
+# Caché en archivos: no depende de servicios externos y la comparten todos los
+# workers de gunicorn del mismo servidor, así una invalidación llega a todos.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get("CACHE_DIR", BASE_DIR / 'cache'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+# Sesiones leídas de la caché y escritas también en la base (sobreviven a un borrado de la caché)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # VALIDADORES DE CONTRASEÑA (Sin cambios)
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -136,6 +180,50 @@ STATICFILES_DIRS = [BASE_DIR / 'core' / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# EXPORTACIONES EN SEGUNDO PLANO
+# Carpeta donde el worker (manage.py procesar_exportaciones) deja los archivos generados
+EXPORTACIONES_DIR = Path(os.environ.get("EXPORTACIONES_DIR", BASE_DIR / 'exportaciones'))
+
+# ARCHIVO DE VENTAS ANTIGUAS
+# Un .jsonl.gz por mes archivado (manage.py archivar_ventas); los meses con ventas más
+# antiguas que ARCHIVO_VENTAS_MESES meses completos se sacan de las tablas de ventas
+ARCHIVO_VENTAS_DIR = Path(os.environ.get("ARCHIVO_VENTAS_DIR", BASE_DIR / 'archivo_ventas'))
+ARCHIVO_VENTAS_MESES = int(os.environ.get("ARCHIVO_VENTAS_MESES", 24))
+
+# VISTAS ASÍNCRONAS
+# Dashboard y control manual con sus consultas en paralelo (core.concurrencia). Solo
+# conviene con un servidor ASGI y una base remota: bajo gunicorn (WSGI) cada solicitud
+# pasa por async_to_sync y el grupo de hilos abre conexiones extra, y con SQLite local
+# la versión síncrona es más rápida.
+VISTAS_ASINCRONAS = os.environ.get("VISTAS_ASINCRONAS", "False").lower() == "true"
+
+# MEDICIÓN DE SOLICITUDES
+# Las solicitudes que tardan al menos esto (en milisegundos) se registran en 'core.rendimiento'
+SOLICITUD_LENTA_MS = int(os.environ.get("SOLICITUD_LENTA_MS", 500))
+
+# Acceso a /metrics. Con METRICAS_TOKEN, Prometheus debe enviar "Authorization: Bearer
+# <token>" (en scrape_config: authorization.credentials) y no se miran las direcciones.
+# Sin token solo se aceptan las direcciones de METRICAS_IPS_PERMITIDAS, comparadas con
+# REMOTE_ADDR: detrás de un proxy inverso esa es la del proxy, así que en ese caso hay
+# que usar el token (o exponer el puerto de gunicorn solo al recolector).
+METRICAS_TOKEN = os.environ.get("METRICAS_TOKEN", "")
+METRICAS_IPS_PERMITIDAS = os.environ.get("METRICAS_IPS_PERMITIDAS", "127.0.0.1,::1").split(',')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.rendimiento': {
+            'handlers': ['consola'],
+            'level': os.environ.get("LOG_RENDIMIENTO_NIVEL", "WARNING"),
+            'propagate': False,
+        },
+    },
+}
+
 # DEFAULT AUTO FIELD (Sin cambios)
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 